@@ -0,0 +1,222 @@
+"""
+Допуск запросов к БД и сброс нагрузки (ADMISSION_CONTROL=1).
+
+Без ограничения при всплеске запросы копятся в очереди пула соединений (DB_POOL_TIMEOUT, по умолчанию 30 с),
+и задержка растёт, пока клиенты не отвалятся по таймауту. AdmissionMiddleware пропускает к обработчикам
+не больше запросов, чем пул может обслужить (DB_POOL_SIZE + DB_MAX_OVERFLOW), остальные ждут в очереди
+своего класса:
+- read - GET/HEAD и POST /books/batch, /categories/batch; не больше ADMISSION_READ_LIMIT одновременно
+  (по умолчанию ёмкость пула минус ADMISSION_RESERVE соединений - их не займут чтения);
+- write - остальные POST, PUT, PATCH, DELETE; не больше ADMISSION_WRITE_LIMIT (по умолчанию вся ёмкость);
+  освободившееся место сначала получают записи, потом чтения.
+Health, метрики и статистика из памяти (EXEMPT_PATHS) очередь не проходят. Запасные соединения нужны
+им и фоновым задачам (индекс подсказок, снимок, проверка реплик), которые берут соединения из пула мимо допуска.
+
+Запрос, прождавший в очереди ADMISSION_QUEUE_TIMEOUT_MS, получает 503 с Retry-After. Если по длине
+очереди и среднему времени обработки видно, что дождаться не успеет, 503 приходит сразу, без ожидания.
+Метрики - admission_* в /metrics, состояние очередей - GET /admission/stats.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict
+
+from fastapi.responses import JSONResponse
+
+from app import metrics
+from app.db.db import DB_POOL_CAPACITY
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "0").lower() in ("1", "true", "yes")
+ADMISSION_RESERVE = int(os.getenv("ADMISSION_RESERVE", "2"))
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", str(max(DB_POOL_CAPACITY - ADMISSION_RESERVE, 1))))
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", str(DB_POOL_CAPACITY)))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "500"))
+# Длиннее очередь не растёт: следующие запросы сразу получают 503
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "1000"))
+ADMISSION_RETRY_AFTER = os.getenv("ADMISSION_RETRY_AFTER", "1")
+
+READ = "read"
+WRITE = "write"
+READ_METHODS = ("GET", "HEAD")
+# POST, который только читает
+READ_POSTS = ("/books/batch", "/categories/batch")
+# Не ходят в БД через пул обработчиков или должны отвечать и при перегрузке
+EXEMPT_PATHS = frozenset((
+    "/", "/health", "/metrics", "/info", "/cache/stats", "/suggest/stats", "/snapshot/stats",
+    "/admission/stats", "/replicas", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json",
+))
+
+# Вес последнего замера в скользящем среднем времени обработки
+_HOLD_SMOOTHING = 0.05
+
+
+def set_enabled(enabled: bool):
+    """Включить или выключить допуск (для сравнения в бенчмарках)"""
+    global ADMISSION_CONTROL
+    ADMISSION_CONTROL = enabled
+
+
+def request_class(method: str, path: str):
+    """read, write или None - запрос проходит без очереди"""
+    if method == "OPTIONS" or path in EXEMPT_PATHS:
+        return None
+    if method in READ_METHODS or (method == "POST" and path.rstrip("/") in READ_POSTS):
+        return READ
+    return WRITE
+
+
+class Lane:
+    """Очередь одного класса запросов: лимит, допущенные и ждущие"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        # Скользящее среднее времени обработки допущенного запроса, секунды
+        self.hold = 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self.waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "hold_ms": round(self.hold * 1000, 2),
+        }
+
+
+class AdmissionControl:
+    """Общая ёмкость на все классы; при освобождении места записи идут раньше чтений"""
+
+    def __init__(self, capacity: int = DB_POOL_CAPACITY, read_limit: int = ADMISSION_READ_LIMIT,
+                 write_limit: int = ADMISSION_WRITE_LIMIT, timeout_ms: float = ADMISSION_QUEUE_TIMEOUT_MS,
+                 max_queue: int = ADMISSION_MAX_QUEUE):
+        self.capacity = capacity
+        self.timeout = timeout_ms / 1000
+        self.max_queue = max_queue
+        self.active = 0
+        # Порядок - приоритет при освобождении места
+        self.lanes = {WRITE: Lane(WRITE, write_limit), READ: Lane(READ, read_limit)}
+
+    def _has_room(self, lane: Lane) -> bool:
+        return self.active < self.capacity and lane.active < lane.limit
+
+    def _enter(self, lane: Lane):
+        self.active += 1
+        lane.active += 1
+        lane.admitted += 1
+        metrics.admission_active.set(lane.active, lane.name)
+
+    def _cannot_wait(self, lane: Lane) -> bool:
+        """Очередь не разойдётся до таймаута: впереди больше, чем лимит успеет обработать"""
+        if len(lane.waiters) >= self.max_queue:
+            return True
+        return lane.hold > 0 and len(lane.waiters) >= lane.limit * self.timeout / lane.hold
+
+    async def acquire(self, name: str):
+        """Дождаться места; None - допущен, иначе причина отказа (queue_full или timeout)"""
+        lane = self.lanes[name]
+        if not lane.waiters and self._has_room(lane):
+            self._enter(lane)
+            return None
+        if self._cannot_wait(lane):
+            return self._shed(lane, "queue_full")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        lane.waiters.append(future)
+        lane.queued += 1
+        metrics.admission_queued.set(len(lane.waiters), name)
+        timer = loop.call_later(self.timeout, self._expire, lane, future)
+        started = time.perf_counter()
+        try:
+            admitted = await future
+        except asyncio.CancelledError:
+            # Клиент ушёл из очереди; если место уже выдано - вернуть его (после _expire места нет:
+            # результат False, а release увёл бы active в минус)
+            if future.done() and not future.cancelled() and future.result() is True:
+                self.release(name, 0.0)
+            elif future in lane.waiters:
+                lane.waiters.remove(future)
+            raise
+        finally:
+            timer.cancel()
+            metrics.admission_queued.set(len(lane.waiters), name)
+        metrics.admission_wait.observe(time.perf_counter() - started, name)
+        return None if admitted else self._shed(lane, "timeout")
+
+    def _expire(self, lane: Lane, future: asyncio.Future):
+        if not future.done():
+            lane.waiters.remove(future)
+            future.set_result(False)
+
+    def _shed(self, lane: Lane, reason: str) -> str:
+        lane.shed += 1
+        metrics.admission_shed.inc(lane.name, reason)
+        return reason
+
+    def release(self, name: str, held: float):
+        """Запрос обработан за held секунд: освободить место и отдать его следующему в очереди"""
+        lane = self.lanes[name]
+        self.active -= 1
+        lane.active -= 1
+        if held:
+            lane.hold = lane.hold + (held - lane.hold) * _HOLD_SMOOTHING if lane.hold else held
+        metrics.admission_active.set(lane.active, name)
+        self._wake()
+
+    def _wake(self):
+        for lane in self.lanes.values():
+            while lane.waiters and self._has_room(lane):
+                future = lane.waiters.popleft()
+                if not future.done():
+                    self._enter(lane)
+                    future.set_result(True)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": ADMISSION_CONTROL,
+            "capacity": self.capacity,
+            "active": self.active,
+            "timeout_ms": round(self.timeout * 1000, 1),
+            "classes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
+
+
+admission = AdmissionControl()
+
+
+class AdmissionMiddleware:
+    """ASGI-middleware: очередь запросов к БД по классам и 503 с Retry-After при перегрузке"""
+
+    def __init__(self, app, control: AdmissionControl = admission):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        name = request_class(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if name is None or not ADMISSION_CONTROL:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await self.control.acquire(name)
+        if reason is not None:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Сервер перегружен, повторите запрос позже"},
+                headers={"Retry-After": ADMISSION_RETRY_AFTER},
+            )
+            await response(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.release(name, time.perf_counter() - started)
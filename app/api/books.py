@@ -1,131 +1,624 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional, Tuple
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import etag, export, ingest, serialization, snapshot, suggest
+from app.cache import book_key, cache
 from app.db.db import get_db
-from app.db import crud
-from app.schemas import Book, BookCreate, BookUpdate
+from app.db import crud, group_commit, models, replicas
+from app.db.pagination import InvalidCursor
+from app.schemas import (
+    BATCH_MAX_IDS, BOOK_FIELDS, BULK_MAX_ERRORS, CHANGES_MAX_LIMIT, BatchRequest, BatchResponse, Book, BookBulkDelete,
+    BookBulkUpdate, BookCreate, BookFacets, BookFilter, BookResponse, BookUpdate, BooksPageResponse, BulkChangeResult,
+    BulkResult, BulkRowError, ChangeFeed, PaginatedResponse, SuggestResponse, book_fields_model, book_fields_page_model
+)
 
 router = APIRouter(prefix="/books", tags=["books"])
 
+FIELDS_DESCRIPTION = f"Вернуть только эти поля через запятую (id добавляется всегда): {', '.join(BOOK_FIELDS)}"
 
-@router.get("/", response_model=List[Book])
-def read_books(
-    skip: int = Query(0, ge=0, description="Пропустить первые N записей"),
+
+def _parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Разобрать fields=title,price в кортеж полей в порядке схемы Book (None - все поля)"""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(BOOK_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестные поля: {', '.join(sorted(unknown))}"
+        )
+    requested.add("id")
+    return tuple(name for name in BOOK_FIELDS if name in requested)
+
+
+def _json(model: BaseModel, headers: dict) -> Response:
+    return Response(model.model_dump_json(), media_type="application/json", headers=headers)
+
+
+# Кто выбрал страницу GET /books: snapshot (снимок каталога, app/snapshot.py) или database
+BOOKS_SOURCE_HEADER = "X-Books-Source"
+
+
+async def _find_page(find, db: AsyncSession, version: int, filters: dict, **options) -> Tuple[list, Optional[str], str]:
+    """
+    Страница книг: id страницы выбирает снимок каталога, если он догнал version,
+    строки читаются из БД по первичному ключу; иначе - обычный SQL-запрос.
+    """
+    book_ids = snapshot.catalog.find_ids(version, **filters)
+    if book_ids is not None:
+        rows, next_cursor = await find(db, book_ids=book_ids, **filters, **options)
+        if len(rows) + (next_cursor is not None) == len(book_ids):
+            return rows, next_cursor, "snapshot"
+        # Книги страницы в БД уже не те (запись без версии, см. app/db/sync_crud.py) - отвечает SQL
+        snapshot.catalog.schedule_catch_up()
+    rows, next_cursor = await find(db, **filters, **options)
+    return rows, next_cursor, "database"
+
+
+# С fields= ответ урезается после проверки схемой: в OpenAPI объявлены оба вида ответа
+@router.get("/", response_model=PaginatedResponse[Book], responses={200: {"model": BooksPageResponse}})
+async def read_books(
+    request: Request,
+    response: Response,
     limit: int = Query(100, ge=1, le=1000, description="Лимит записей"),
-    category_id: Optional[int] = Query(None, description="Фильтр по ID категории"),
-    search: Optional[str] = Query(None, description="Поиск по названию книги"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из прошлого ответа)"),
+    category_id: Optional[List[int]] = Query(None, description="Фильтр по ID категории (можно указать несколько раз)"),
+    price_min: Optional[float] = Query(None, ge=0, description="Минимальная цена"),
+    price_max: Optional[float] = Query(None, ge=0, description="Максимальная цена"),
+    search: Optional[str] = Query(None, description="Поиск по названию и описанию книги"),
+    sort: Optional[Literal[crud.BOOK_SORTS]] = Query(None, description="Сортировка"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(replicas.get_read_db)
+):
+    """
+    Получить список книг. Все фильтры можно сочетать, выборка - одним SQL-запросом.
+    - **category_id**: Фильтр по категории; ?category_id=1&category_id=2 - книги из любой из них
+    - **price_min**, **price_max**: Диапазон цены (включительно)
+    - **search**: Полнотекстовый поиск по названию и описанию
+    - **sort**: id (по умолчанию), newest, price, -price, title, -title, relevance (по умолчанию при search)
+    - **cursor**: Курсор следующей страницы (с теми же фильтрами и сортировкой)
+    - **fields**: Только перечисленные поля, например fields=title,price - из БД читаются только эти колонки;
+      в ответе остаются только они и id (схема BookPartial)
+
+    Поддерживает If-None-Match: если каталог не менялся, возвращается 304 без выборки списка.
+    Читается с реплики, если она догнала X-Catalog-Position клиента (см. app/db/replicas.py).
+    С CATALOG_SNAPSHOT=1 страницу без search и сортировки по title выбирает снимок каталога в памяти.
+    """
+    if price_min is not None and price_max is not None and price_min > price_max:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="price_min не может быть больше price_max"
+        )
+    if sort == "relevance" and not search:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Сортировка relevance доступна только вместе с search"
+        )
+    selected = _parse_fields(fields)
+
+    version = await crud.get_catalog_version(db, models.BOOKS_VERSION)
+    list_etag = etag.list_etag("books", version, request)
+    not_modified = etag.not_modified(request, list_etag)
+    if not_modified is not None:
+        return not_modified
+    response.headers["ETag"] = list_etag
+
+    filters = dict(
+        category_ids=category_id,
+        price_min=price_min,
+        price_max=price_max,
+        search=search,
+        sort=sort,
+        limit=limit,
+        cursor=cursor
+    )
+    try:
+        if selected is None and serialization.FAST_SERIALIZATION:
+            # Быстрый путь: кортежи из БД сразу в JSON, без ORM и проверки схемой ответа
+            rows, next_cursor, source = await _find_page(crud.find_book_rows, db, version, filters)
+            return serialization.books_page_response(
+                rows, limit, next_cursor, {"ETag": list_etag, BOOKS_SOURCE_HEADER: source}
+            )
+        books, next_cursor, source = await _find_page(crud.find_books, db, version, filters, fields=selected)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    response.headers[BOOKS_SOURCE_HEADER] = source
+
+    if selected is not None:
+        # Ответ по урезанной схеме: в JSON только запрошенные поля
+        page = book_fields_page_model(selected).model_validate(
+            {"items": books, "limit": limit, "next_cursor": next_cursor}, from_attributes=True
+        )
+        return _json(page, {"ETag": list_etag, BOOKS_SOURCE_HEADER: source})
+    return {"items": books, "limit": limit, "next_cursor": next_cursor}
+
+
+def _add_error(result: BulkResult, row: int, error: str):
+    result.failed += 1
+    if len(result.errors) < BULK_MAX_ERRORS:
+        result.errors.append(BulkRowError(row=row, error=error))
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+async def _load_chunk(db: AsyncSession, chunk: List[Tuple[int, BookCreate]], result: BulkResult):
+    """Записать пачку книг; если транзакция не прошла - повторить по одной книге"""
+    # Все категории пачки проверяем одним запросом
+    existing = await crud.get_existing_category_ids(
+        db, (book.category_id for _, book in chunk if book.category_id is not None)
+    )
+    rows = []
+    for row, book in chunk:
+        if book.category_id is not None and book.category_id not in existing:
+            _add_error(result, row, f"Категория с ID {book.category_id} не найдена")
+        else:
+            rows.append((row, book.model_dump()))
+
+    try:
+        result.created += await crud.insert_books(db, [data for _, data in rows])
+    except crud.BulkInsertError:
+        for row, data in rows:
+            try:
+                result.created += await crud.insert_books(db, [data])
+            except crud.BulkInsertError as e:
+                _add_error(result, row, str(e))
+
+
+@router.post(
+    "/bulk",
+    response_model=BulkResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string"}},
+                "text/csv": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def bulk_create_books(
+    request: Request,
+    chunk_size: int = Query(1000, ge=1, le=10000, description="Размер пачки (одна транзакция)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Массовая загрузка книг из NDJSON (application/x-ndjson) или CSV (text/csv с заголовком).
+    - Тело читается потоком, записи проверяются схемой BookCreate
+    - Каждая пачка из **chunk_size** книг пишется одной транзакцией
+    - Ошибочные строки не прерывают загрузку: в errors - первые BULK_MAX_ERRORS из них, в failed - сколько всего
+    """
+    fmt = ingest.detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Поддерживаются application/x-ndjson и text/csv"
+        )
+
+    result = BulkResult()
+    chunk: List[Tuple[int, BookCreate]] = []
+    async for row, record in ingest.iter_records(request.stream(), fmt):
+        result.received += 1
+        if isinstance(record, str):
+            _add_error(result, row, record)
+            continue
+        try:
+            chunk.append((row, BookCreate.model_validate(record)))
+        except ValidationError as e:
+            _add_error(result, row, _validation_message(e))
+            continue
+        if len(chunk) >= chunk_size:
+            await _load_chunk(db, chunk, result)
+            chunk = []
+    if chunk:
+        await _load_chunk(db, chunk, result)
+
+    return result
+
+
+def _bulk_conditions(book_filter: BookFilter) -> list:
+    """Условия отбора массовой операции; без единого условия - 400 (защита от изменения всего каталога)"""
+    if (book_filter.price_min is not None and book_filter.price_max is not None
+            and book_filter.price_min > book_filter.price_max):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="price_min не может быть больше price_max"
+        )
+    conditions = crud.book_filter(
+        ids=book_filter.ids,
+        category_ids=book_filter.category_id,
+        price_min=book_filter.price_min,
+        price_max=book_filter.price_max
+    )
+    if not conditions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Укажите хотя бы одно условие в filter"
+        )
+    return conditions
+
+
+@router.post("/bulk-update", response_model=BulkChangeResult)
+async def bulk_update_books(
+    body: BookBulkUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Изменить все книги, подходящие под filter, на стороне БД (без загрузки книг).
+    - **filter**: ids, category_id, price_min, price_max (через И)
+    - **patch**: price, price_factor (умножить цену) и/или category_id (перенести; null - убрать категорию)
+    - **chunk_size**: Книг в одной транзакции - большие изменения идут пачками, не блокируя таблицу надолго
+
+    Пример: {"filter": {"category_id": [5]}, "patch": {"price_factor": 0.9}} - скидка 10% на категорию 5
+    """
+    conditions = _bulk_conditions(body.filter)
+    patch = body.patch.model_dump(exclude_unset=True)
+    if "price" in patch and "price_factor" in patch:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Укажите либо price, либо price_factor"
+        )
+    if patch.get("price", 0) is None or patch.get("price_factor", 0) is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Цена не может быть null"
+        )
+    if not patch:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Укажите хотя бы одно поле в patch"
+        )
+    if "price_factor" in patch:
+        patch["price"] = crud.scaled_price(patch.pop("price_factor"))
+
+    try:
+        affected, chunks = await crud.bulk_update_books(db, conditions, patch, chunk_size=body.chunk_size)
+    except crud.CategoryNotFound:
+        raise _category_not_found(patch["category_id"])
+    return BulkChangeResult(affected=affected, chunks=chunks)
+
+
+@router.post("/bulk-delete", response_model=BulkChangeResult)
+async def bulk_delete_books(
+    body: BookBulkDelete,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Удалить все книги, подходящие под filter (пачками по chunk_size книг в транзакции)
+    """
+    conditions = _bulk_conditions(body.filter)
+    affected, chunks = await crud.bulk_delete_books(db, conditions, chunk_size=body.chunk_size)
+    return BulkChangeResult(affected=affected, chunks=chunks)
+
+
+EXPORT_COLUMNS = ["id", "title", "description", "price", "url", "category_id"]
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {
+        export.MEDIA_TYPES[export.NDJSON]: {},
+        export.MEDIA_TYPES[export.CSV]: {},
+        export.MEDIA_TYPES[export.PARQUET]: {},
+    }}},
+)
+async def export_books(
+    request: Request,
+    fmt: Literal["ndjson", "csv", "parquet"] = Query("ndjson", alias="format", description="Формат выгрузки"),
+    category_id: Optional[int] = Query(None, description="Выгрузить только одну категорию"),
+    batch_size: int = Query(5000, ge=100, le=50000, description="Строк в одной пачке курсора")
+):
+    """
+    Выгрузить весь каталог книг потоком (NDJSON, CSV или Parquet).
+    Строки читаются серверным курсором, память не зависит от размера таблицы.
+    """
+    if fmt == export.PARQUET and not export.parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Для выгрузки в Parquet установите пакет pyarrow"
+        )
+
+    # Сессия открывается внутри генератора: ответ отдаётся уже после выхода из обработчика
+    session_factory = replicas.read_session_factory(request)
+
+    async def batches():
+        async with session_factory() as db:
+            async for batch in crud.stream_books(
+                db, EXPORT_COLUMNS, batch_size=batch_size, category_id=category_id
+            ):
+                yield batch
+
+    return StreamingResponse(
+        export.ENCODERS[fmt](batches(), EXPORT_COLUMNS),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="books.{fmt}"'}
+    )
+
+
+SUGGEST_SOURCE_HEADER = "X-Suggest-Source"
+
+
+@router.get("/suggest", response_model=SuggestResponse)
+async def suggest_books(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Начало названия"),
+    limit: int = Query(10, ge=1, le=suggest.SUGGEST_MAX_LIMIT, description="Число подсказок"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Подсказки для ввода: книги, чьё название начинается с q (без учёта регистра и ё/е), сначала новые.
+    Отвечает индекс в памяти процесса (app/suggest.py) без обращения к БД; пока индекс строится
+    после старта или если он выключен, подсказки ищутся полнотекстовым поиском в БД.
+    Источник - в заголовке X-Suggest-Source (index или database).
+    """
+    if suggest.index.ready:
+        response.headers[SUGGEST_SOURCE_HEADER] = "index"
+        return {"items": [{"id": book_id, "title": title} for book_id, title in suggest.index.suggest(q, limit)]}
+    response.headers[SUGGEST_SOURCE_HEADER] = "database"
+    books, _ = await crud.find_books(db, search=q, sort="newest", limit=limit, fields=("title",))
+    return {"items": [{"id": book.id, "title": book.title} for book in books]}
+
+
+@router.get("/facets", response_model=BookFacets)
+async def read_book_facets(
+    request: Request,
+    response: Response,
+    category_id: Optional[List[int]] = Query(None, description="Фильтр по ID категории (можно указать несколько раз)"),
+    price_min: Optional[float] = Query(None, ge=0, description="Минимальная цена"),
+    price_max: Optional[float] = Query(None, ge=0, description="Максимальная цена"),
+    search: Optional[str] = Query(None, description="Поиск по названию и описанию книги"),
+    db: AsyncSession = Depends(replicas.get_read_db)
+):
+    """
+    Фасеты для боковой панели витрины: по каждой категории число книг, минимальная, максимальная
+    и средняя цена и гистограмма цен, плюс сводка по всем категориям. Фильтры - как у GET /books.
+    Без price_min, price_max и search ответ строится из счётчиков категорий, не обходя книги.
+    """
+    if price_min is not None and price_max is not None and price_min > price_max:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="price_min не может быть больше price_max"
+        )
+    version = await crud.get_catalog_version(db, models.BOOKS_VERSION)
+    list_etag = etag.list_etag("book-facets", version, request)
+    not_modified = etag.not_modified(request, list_etag)
+    if not_modified is not None:
+        return not_modified
+    response.headers["ETag"] = list_etag
+    return await crud.get_book_facets(
+        db, category_ids=category_id, price_min=price_min, price_max=price_max, search=search
+    )
+
+
+@router.get("/changes", response_model=ChangeFeed[Book])
+async def read_book_changes(
+    since: Optional[str] = Query(None, description="Курсор: next_cursor из прошлого ответа; без него - весь каталог"),
+    limit: int = Query(1000, ge=1, le=CHANGES_MAX_LIMIT, description="Изменений в ответе"),
+    db: AsyncSession = Depends(replicas.get_read_db)
+):
+    """
+    Что изменилось в книгах после курсора since: созданные и изменённые книги (upsert)
+    и удалённые (delete) в порядке commit. Клиент хранит next_cursor и передаёт его в следующий раз;
+    при has_more=true следующая страница запрашивается сразу.
+    Изменения категорий (они вложены в книги) - в GET /categories/changes.
+    """
+    try:
+        changes, next_cursor, has_more = await crud.get_changes(db, "book", since, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {
+        "changes": [
+            {"op": op, "id": book_id, "version": version, "item": Book.model_validate(book) if book else None}
+            for op, (version, book_id), book in changes
+        ],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }
+
+
+async def _read_batch(db: AsyncSession, ids: List[int], known) -> dict:
+    """Книги по списку ID: из кэша, промахи - одним запросом к БД"""
+    async def load(missing_ids):
+        books = await crud.get_books_by_ids(db, missing_ids)
+        return {book.id: Book.model_validate(book).model_dump(mode="json") for book in books}
+
+    ids = list(dict.fromkeys(ids))
+    found = await cache.get_many_or_load(ids, book_key, load)
+    return etag.batch_result(ids, found, etag.book_etag, known)
+
+
+@router.get("/batch", response_model=BatchResponse[Book])
+async def read_books_batch(
+    request: Request,
+    ids: List[int] = Query(..., description=f"ID книг: ?ids=1&ids=2 (до {BATCH_MAX_IDS})"),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Получить список всех книг
-    - **category_id**: Фильтр по категории
-    - **search**: Поиск по названию книги
+    Получить несколько книг за один запрос
+    - **ids**: ID книг; ненайденные попадают в missing
+    - **If-None-Match**: ETag книг, которые уже есть у клиента: неизменённые не возвращаются (их ID - в not_modified)
     """
-    if search:
-        books = crud.search_books_by_title(db, search_term=search)
-    elif category_id is not None:
-        books = crud.get_books_by_category(db, category_id=category_id)
-    else:
-        books = crud.get_books(db, skip=skip, limit=limit)
-    
-    return books
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Не больше {BATCH_MAX_IDS} ID за запрос"
+        )
+    return await _read_batch(db, ids, etag.if_none_match_tags(request))
 
 
-@router.get("/{book_id}", response_model=Book)
-def read_book(
+@router.post("/batch", response_model=BatchResponse[Book])
+async def read_books_batch_post(
+    batch: BatchRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    То же, что GET /books/batch, для длинных списков ID: ID и известные клиенту ETag передаются в теле
+    """
+    return await _read_batch(db, batch.ids, etag.if_none_match_tags(request) | set(batch.etags))
+
+
+@router.get("/{book_id}", response_model=Book, responses={200: {"model": BookResponse}})
+async def read_book(
     book_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить книгу по ID
+    - **fields**: Только перечисленные поля, например fields=title,price; в ответе остаются только они и id
+      (схема BookPartial)
     """
-    book = crud.get_book(db, book_id=book_id)
+    selected = _parse_fields(fields)
+
+    async def load():
+        book = await crud.get_book(db, book_id=book_id)
+        return Book.model_validate(book).model_dump(mode="json") if book else None
+
+    book = await cache.get_or_load(book_key(book_id), load)
     if book is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Книга с ID {book_id} не найдена"
         )
+    book_etag = etag.book_etag(book)
+    if selected is not None:
+        book_etag = etag.fields_etag(book_etag, selected)
+    not_modified = etag.not_modified(request, book_etag)
+    if not_modified is not None:
+        return not_modified
+    if selected is not None:
+        # Одна книга берётся из кэша целиком (без SQL), урезается только ответ
+        return _json(book_fields_model(selected).model_validate(book), {"ETag": book_etag})
+    response.headers["ETag"] = book_etag
     return book
 
 
 @router.post("/", response_model=Book, status_code=status.HTTP_201_CREATED)
-def create_book(
+async def create_book(
     book: BookCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Создать новую книгу
+    (с GROUP_COMMIT=1 одновременные создания записываются общей транзакцией, см. app/db/group_commit.py)
     """
-    # Проверяем существование категории, если указана
-    if book.category_id is not None:
-        category = crud.get_category(db, category_id=book.category_id)
-        if category is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Категория с ID {book.category_id} не найдена"
-            )
-    
-    return crud.create_book(
-        db=db,
-        title=book.title,
-        description=book.description,
-        price=book.price,
-        url=book.url,
-        category_id=book.category_id
+    try:
+        if group_commit.GROUP_COMMIT:
+            row = await group_commit.group_commit.create_book(book.model_dump())
+        else:
+            row = await crud.create_book(db, book.model_dump())
+    except crud.CategoryNotFound:
+        raise _category_not_found(book.category_id)
+    return serialization.book_row_to_dict(row)
+
+
+def _category_not_found(category_id: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Категория с ID {category_id} не найдена"
     )
 
 
+def _book_not_found(book_id: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Книга с ID {book_id} не найдена"
+    )
+
+
+def _expected_states(request: Request, book_id: int) -> Optional[List[crud.BookState]]:
+    """Состояния книги из If-Match (None - заголовка нет); чужие и нераспознанные теги не подходят"""
+    tags = etag.if_match_tags(request)
+    if tags is None:
+        return None
+    states = []
+    for tag in tags:
+        parsed = etag.parse_book_etag(tag)
+        if parsed is not None and parsed[0] == book_id:
+            states.append(parsed[1:])
+    return states
+
+
+async def _save_book(db: AsyncSession, request: Request, response: Response, book_id: int, values: dict) -> dict:
+    """UPDATE книги одним запросом с проверкой If-Match; ответ - книга с новым ETag"""
+    try:
+        row = await crud.update_book(db, book_id, values, expected=_expected_states(request, book_id))
+    except crud.VersionConflict:
+        raise etag.precondition_failed()
+    except crud.CategoryNotFound:
+        raise _category_not_found(values["category_id"])
+    if row is None:
+        raise _book_not_found(book_id)
+    data = serialization.book_row_to_dict(row)
+    response.headers["ETag"] = etag.book_etag(data)
+    return data
+
+
 @router.put("/{book_id}", response_model=Book)
-def update_book(
+async def update_book(
     book_id: int,
     book_update: BookUpdate,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Обновить книгу
+    Обновить книгу (поля со значением null не меняются)
+    - **If-Match**: ETag книги; если книга изменилась, вернётся 412
     """
-    book = crud.get_book(db, book_id=book_id)
-    if book is None:
+    values = {name: value for name, value in book_update.model_dump().items() if value is not None}
+    return await _save_book(db, request, response, book_id, values)
+
+
+@router.patch("/{book_id}", response_model=Book)
+async def patch_book(
+    book_id: int,
+    book_update: BookUpdate,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Частично обновить книгу: меняются только переданные поля,
+    null очищает description, url и category_id
+    - **If-Match**: ETag книги; если книга изменилась, вернётся 412
+    """
+    values = book_update.model_dump(exclude_unset=True)
+    required = [name for name in ("title", "price") if name in values and values[name] is None]
+    if required:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Книга с ID {book_id} не найдена"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Поля не могут быть null: {', '.join(required)}"
         )
-    
-    # Проверяем существование категории, если указана
-    if book_update.category_id is not None:
-        category = crud.get_category(db, category_id=book_update.category_id)
-        if category is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Категория с ID {book_update.category_id} не найдена"
-            )
-    
-    return crud.update_book(
-        db=db,
-        book_id=book_id,
-        title=book_update.title,
-        description=book_update.description,
-        price=book_update.price,
-        url=book_update.url,
-        category_id=book_update.category_id
-    )
+    return await _save_book(db, request, response, book_id, values)
 
 
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_book(
+async def delete_book(
     book_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Удалить книгу
+    - **If-Match**: ETag книги; если книга изменилась, вернётся 412
     """
-    book = crud.get_book(db, book_id=book_id)
-    if book is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Книга с ID {book_id} не найдена"
-        )
-    
-    crud.delete_book(db=db, book_id=book_id)
-    return None
\ No newline at end of file
+    try:
+        deleted = await crud.delete_book(db, book_id, expected=_expected_states(request, book_id))
+    except crud.VersionConflict:
+        raise etag.precondition_failed()
+    if not deleted:
+        raise _book_not_found(book_id)
+    return None
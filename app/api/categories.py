@@ -1,118 +1,271 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import etag
+from app.cache import cache, categories_list_key, category_key
 from app.db.db import get_db
-from app.db import crud
-from app.schemas import Category, CategoryCreate, CategoryUpdate
+from app.db import crud, models, replicas
+from app.db.pagination import InvalidCursor
+from app.schemas import (
+    BATCH_MAX_IDS, CHANGES_MAX_LIMIT, BatchRequest, BatchResponse, Category, CategoryCreate, CategoryFacet,
+    CategoryUpdate, ChangeFeed, PaginatedResponse
+)
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 
-@router.get("/", response_model=List[Category])
-def read_categories(
-    skip: int = Query(0, ge=0, description="Пропустить первые N записей"),
+@router.get("/", response_model=PaginatedResponse[Category])
+async def read_categories(
+    request: Request,
+    response: Response,
     limit: int = Query(100, ge=1, le=1000, description="Лимит записей"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из прошлого ответа)"),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить список всех категорий
     """
-    categories = crud.get_categories(db, skip=skip, limit=limit)
-    return categories
+    version = await crud.get_catalog_version(db, models.CATEGORIES_VERSION)
+    list_etag = etag.list_etag("categories", version, request)
+    not_modified = etag.not_modified(request, list_etag)
+    if not_modified is not None:
+        return not_modified
+    response.headers["ETag"] = list_etag
+
+    async def load():
+        categories, next_cursor = await crud.get_categories(db, limit=limit, cursor=cursor)
+        return {
+            "items": [Category.model_validate(c).model_dump(mode="json") for c in categories],
+            "limit": limit,
+            "next_cursor": next_cursor,
+        }
+
+    try:
+        return await cache.get_or_load(categories_list_key(limit, cursor), load)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/stats", response_model=PaginatedResponse[CategoryFacet])
+async def read_category_stats(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Лимит записей"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из прошлого ответа)"),
+    db: AsyncSession = Depends(replicas.get_read_db)
+):
+    """
+    Число книг, минимальная, максимальная и средняя цена и гистограмма цен по каждой категории.
+    Читаются счётчики, которые триггеры БД поддерживают при каждой записи книг - без обхода книг.
+    """
+    # Статистика меняется и с книгами, и с категориями: сумма обеих версий растёт при любом изменении
+    version = (
+        await crud.get_catalog_version(db, models.BOOKS_VERSION)
+        + await crud.get_catalog_version(db, models.CATEGORIES_VERSION)
+    )
+    list_etag = etag.list_etag("category-stats", version, request)
+    not_modified = etag.not_modified(request, list_etag)
+    if not_modified is not None:
+        return not_modified
+    response.headers["ETag"] = list_etag
+    try:
+        items, next_cursor = await crud.get_category_stats(db, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"items": items, "limit": limit, "next_cursor": next_cursor}
+
+
+@router.get("/changes", response_model=ChangeFeed[Category])
+async def read_category_changes(
+    since: Optional[str] = Query(None, description="Курсор: next_cursor из прошлого ответа; без него - все категории"),
+    limit: int = Query(1000, ge=1, le=CHANGES_MAX_LIMIT, description="Изменений в ответе"),
+    db: AsyncSession = Depends(replicas.get_read_db)
+):
+    """
+    Что изменилось в категориях после курсора since (см. GET /books/changes)
+    """
+    try:
+        changes, next_cursor, has_more = await crud.get_changes(db, "category", since, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {
+        "changes": [
+            {"op": op, "id": category_id, "version": version,
+             "item": Category.model_validate(category) if category else None}
+            for op, (version, category_id), category in changes
+        ],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }
+
+
+async def _read_batch(db: AsyncSession, ids: List[int], known) -> dict:
+    """Категории по списку ID: из кэша, промахи - одним запросом к БД"""
+    async def load(missing_ids):
+        categories = await crud.get_categories_by_ids(db, missing_ids)
+        return {c.id: Category.model_validate(c).model_dump(mode="json") for c in categories}
+
+    ids = list(dict.fromkeys(ids))
+    found = await cache.get_many_or_load(ids, category_key, load)
+    return etag.batch_result(ids, found, etag.category_etag, known)
+
+
+@router.get("/batch", response_model=BatchResponse[Category])
+async def read_categories_batch(
+    request: Request,
+    ids: List[int] = Query(..., description=f"ID категорий: ?ids=1&ids=2 (до {BATCH_MAX_IDS})"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Получить несколько категорий за один запрос
+    - **ids**: ID категорий; ненайденные попадают в missing
+    - **If-None-Match**: ETag категорий, которые уже есть у клиента: неизменённые не возвращаются
+    """
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Не больше {BATCH_MAX_IDS} ID за запрос"
+        )
+    return await _read_batch(db, ids, etag.if_none_match_tags(request))
+
+
+@router.post("/batch", response_model=BatchResponse[Category])
+async def read_categories_batch_post(
+    batch: BatchRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    То же, что GET /categories/batch, для длинных списков ID (ID и известные ETag - в теле)
+    """
+    return await _read_batch(db, batch.ids, etag.if_none_match_tags(request) | set(batch.etags))
 
 
 @router.get("/{category_id}", response_model=Category)
-def read_category(
+async def read_category(
     category_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получить категорию по ID
     """
-    category = crud.get_category(db, category_id=category_id)
+    async def load():
+        category = await crud.get_category(db, category_id=category_id)
+        return Category.model_validate(category).model_dump(mode="json") if category else None
+
+    category = await cache.get_or_load(category_key(category_id), load)
     if category is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Категория с ID {category_id} не найдена"
         )
+    category_etag = etag.category_etag(category)
+    not_modified = etag.not_modified(request, category_etag)
+    if not_modified is not None:
+        return not_modified
+    response.headers["ETag"] = category_etag
     return category
 
 
 @router.post("/", response_model=Category, status_code=status.HTTP_201_CREATED)
-def create_category(
+async def create_category(
     category: CategoryCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Создать новую категорию
     """
     # Проверяем, нет ли уже категории с таким названием
-    existing_category = crud.get_category_by_title(db, title=category.title)
+    existing_category = await crud.get_category_by_title(db, title=category.title)
     if existing_category:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Категория с названием '{category.title}' уже существует"
         )
     
-    return crud.create_category(db=db, title=category.title)
+    return await crud.create_category(db=db, title=category.title)
 
 
 @router.put("/{category_id}", response_model=Category)
-def update_category(
+async def update_category(
     category_id: int,
     category_update: CategoryUpdate,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Обновить категорию
+    - **If-Match**: ETag категории; если категория изменилась, вернётся 412
     """
-    category = crud.get_category(db, category_id=category_id)
+    category = await crud.get_category(db, category_id=category_id)
     if category is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Категория с ID {category_id} не найдена"
         )
+    etag.check_if_match(request, etag.category_etag(Category.model_validate(category).model_dump(mode="json")))
     
     # Если пытаемся изменить название, проверяем уникальность
     if category_update.title is not None:
-        existing = crud.get_category_by_title(db, title=category_update.title)
+        existing = await crud.get_category_by_title(db, title=category_update.title)
         if existing and existing.id != category_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Категория с названием '{category_update.title}' уже существует"
             )
     
-    return crud.update_category(
-        db=db, 
-        category_id=category_id, 
-        title=category_update.title
-    )
+    try:
+        category = await crud.update_category(
+            db=db, 
+            category_id=category_id, 
+            title=category_update.title
+        )
+    except crud.VersionConflict:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Категория с ID {category_id} изменена параллельным запросом"
+        )
+    data = Category.model_validate(category).model_dump(mode="json")
+    response.headers["ETag"] = etag.category_etag(data)
+    return data
 
 
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(
+async def delete_category(
     category_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Удалить категорию
+    - **If-Match**: ETag категории; если категория изменилась, вернётся 412
     """
-    category = crud.get_category(db, category_id=category_id)
+    category = await crud.get_category(db, category_id=category_id)
     if category is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Категория с ID {category_id} не найдена"
         )
+    etag.check_if_match(request, etag.category_etag(Category.model_validate(category).model_dump(mode="json")))
     
     # Проверяем, есть ли книги в этой категории
-    books_in_category = crud.get_books_by_category(db, category_id=category_id)
+    books_in_category = await crud.count_books_by_category(db, category_id=category_id)
     if books_in_category:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Невозможно удалить категорию, в которой есть книги. "
-                   f"Сначала удалите {len(books_in_category)} книг(и) из этой категории."
+                   f"Сначала удалите {books_in_category} книг(и) из этой категории."
         )
     
-    crud.delete_category(db=db, category_id=category_id)
+    try:
+        await crud.delete_category(db=db, category_id=category_id)
+    except crud.VersionConflict:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Категория с ID {category_id} изменена параллельным запросом"
+        )
     return None
\ No newline at end of file
@@ -0,0 +1,330 @@
+"""
+Кэш чтения для книг и категорий.
+
+ReadThroughCache стоит перед функциями чтения из app/db/crud.py: при промахе
+значение загружается из БД и кладётся в кэш. Одновременные промахи по одному
+ключу объединяются (single flight) - в БД уходит один запрос, остальные ждут его результат.
+Сбрасывают кэш функции записи crud (create_*, update_*, delete_*),
+а изменения из других воркеров приходят через шину app/db/notify.py.
+
+Хранилище выбирается переменной окружения CACHE_BACKEND:
+- memory (по умолчанию) - LRU с TTL в памяти процесса
+- redis - общий кэш для всех воркеров (CACHE_URL, нужен пакет redis)
+- none - кэш выключен
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "10000"))
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+
+
+# ========== Ключи ==========
+
+BOOK_PREFIX = "book:"
+CATEGORY_PREFIX = "category:"
+CATEGORIES_LIST_PREFIX = "categories:list:"
+
+
+def book_key(book_id: int) -> str:
+    return f"{BOOK_PREFIX}{book_id}"
+
+
+def category_key(category_id: int) -> str:
+    return f"{CATEGORY_PREFIX}{category_id}"
+
+
+def categories_list_key(limit: int, cursor: Optional[str]) -> str:
+    return f"{CATEGORIES_LIST_PREFIX}{limit}:{cursor or ''}"
+
+
+# ========== Хранилища ==========
+
+class MemoryCache:
+    """LRU-кэш с временем жизни записей в памяти процесса"""
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE, ttl: float = CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        item = self._data.get(key)
+        if item is None:
+            return False, None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    async def get_many(self, keys: Sequence[str]) -> List[Tuple[bool, Any]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            del self._data[key]
+
+    async def clear(self):
+        self._data.clear()
+
+    async def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisCache:
+    """Общий кэш в Redis: значения хранятся в JSON, срок жизни задаёт сам Redis"""
+
+    def __init__(self, url: str = CACHE_URL, ttl: float = CACHE_TTL, namespace: str = "octa:", client=None):
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        raw = await self.client.get(self.namespace + key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Tuple[bool, Any]]:
+        # Один MGET вместо запроса на каждый ключ
+        raws = await self.client.mget([self.namespace + key for key in keys])
+        return [(False, None) if raw is None else (True, json.loads(raw)) for raw in raws]
+
+    async def set(self, key: str, value: Any):
+        await self.client.set(self.namespace + key, json.dumps(value), px=int(self.ttl * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.namespace + key for key in keys))
+
+    async def delete_prefix(self, prefix: str):
+        keys = [key async for key in self.client.scan_iter(match=self.namespace + prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def clear(self):
+        await self.delete_prefix("")
+
+    async def stats(self) -> dict:
+        """
+        Те же ключи, что у MemoryCache, но с сервера Redis: вытесняет и удаляет по TTL сам Redis
+        (INFO stats: evicted_keys, expired_keys), size - DBSIZE базы целиком, лимит задаёт maxmemory в байтах
+        """
+        stats = {"size": None, "max_size": None, "evictions": None, "expirations": None}
+        try:
+            info = await self.client.info("stats")
+            stats["size"] = await self.client.dbsize()
+        except Exception as e:
+            print(f"Кэш: не удалось прочитать INFO у Redis: {e!r}")
+            return stats
+        stats["evictions"] = info.get("evicted_keys")
+        stats["expirations"] = info.get("expired_keys")
+        return stats
+
+
+class NullCache:
+    """Кэш выключен: всегда промах"""
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        return False, None
+
+    async def get_many(self, keys: Sequence[str]) -> List[Tuple[bool, Any]]:
+        return [(False, None)] * len(keys)
+
+    async def set(self, key: str, value: Any):
+        pass
+
+    async def delete(self, *keys: str):
+        pass
+
+    async def delete_prefix(self, prefix: str):
+        pass
+
+    async def clear(self):
+        pass
+
+    async def stats(self) -> dict:
+        return {"size": 0, "max_size": 0, "evictions": 0, "expirations": 0}
+
+
+# ========== Read-through ==========
+
+class ReadThroughCache:
+    """Кэш чтения с объединением одновременных промахов по ключу"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight = {}
+        # Растёт при каждом сбросе: загрузка, начатая до сброса, не кладёт устаревшее значение
+        self._generation = 0
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Вернуть значение из кэша или загрузить его через loader (None не кэшируется)"""
+        found, value = await self.backend.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # Запрос-загрузчик отменён (клиент отключился) - загружаем сами
+                return await loader()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+            if value is not None and generation == self._generation:
+                await self.backend.set(key, value)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Ожидающих может не быть - помечаем исключение как полученное
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def get_many_or_load(
+        self,
+        ids: Sequence[int],
+        key: Callable[[int], str],
+        loader: Callable[[List[int]], Awaitable[Dict[int, Any]]]
+    ) -> Dict[int, Any]:
+        """
+        Пакетный вариант get_or_load: значения по списку ID.
+        Промахи загружаются одним вызовом loader(ids) -> {id: значение}; ID, которых нет
+        в результате, в ответ не попадают. Одновременные промахи здесь не объединяются.
+        """
+        values = {}
+        missing = []
+        for item_id, (found, value) in zip(ids, await self.backend.get_many([key(i) for i in ids])):
+            if found:
+                values[item_id] = value
+            else:
+                missing.append(item_id)
+        self.hits += len(values)
+        self.misses += len(missing)
+        if missing:
+            generation = self._generation
+            loaded = await loader(missing)
+            if generation == self._generation:
+                for item_id, value in loaded.items():
+                    await self.backend.set(key(item_id), value)
+            values.update(loaded)
+        return values
+
+    async def invalidate(self, *keys: str):
+        self._generation += 1
+        await self.backend.delete(*keys)
+
+    async def invalidate_prefix(self, *prefixes: str):
+        self._generation += 1
+        for prefix in prefixes:
+            await self.backend.delete_prefix(prefix)
+
+    async def clear(self):
+        self._generation += 1
+        await self.backend.clear()
+
+    async def stats(self) -> dict:
+        """Попадания и промахи считает этот воркер, размер и вытеснения - хранилище"""
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            **await self.backend.stats(),
+        }
+
+
+def _create_backend():
+    if CACHE_BACKEND == "redis":
+        return RedisCache()
+    if CACHE_BACKEND == "none":
+        return NullCache()
+    return MemoryCache()
+
+
+cache = ReadThroughCache(_create_backend())
+
+
+# ========== Сброс при записи ==========
+
+async def on_book_changed(book_id: int):
+    await cache.invalidate(book_key(book_id))
+
+
+async def on_books_changed(book_ids: Sequence[int]):
+    await cache.invalidate(*(book_key(book_id) for book_id in book_ids))
+
+
+async def on_category_changed(category_id: int):
+    # В ответе книги вложена категория, поэтому сбрасываем и книги
+    await cache.invalidate(category_key(category_id))
+    await cache.invalidate_prefix(CATEGORIES_LIST_PREFIX, BOOK_PREFIX)
+
+
+async def on_category_created(category_id: int):
+    await cache.invalidate_prefix(CATEGORIES_LIST_PREFIX)
+
+
+async def apply_change(entity: str, entity_id: Optional[int], action: str):
+    """Сбросить кэш по событию из шины изменений (app/db/notify.py) от другого воркера"""
+    if entity == "book" and entity_id is not None:
+        await on_book_changed(entity_id)
+    elif entity == "book" and action in ("update", "delete"):
+        # Массовое изменение (crud.bulk_update_books): ID не передаются, сбрасываем все книги
+        await cache.invalidate_prefix(BOOK_PREFIX)
+    elif entity == "category" and entity_id is not None:
+        if action == "create":
+            await on_category_created(entity_id)
+        else:
+            await on_category_changed(entity_id)
@@ -1,137 +1,959 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from . import models
+from sqlalchemy import (
+    Float, Integer, Numeric, and_, any_, bindparam, case, cast, delete, exists, false, insert, literal_column, or_, select,
+    update, func
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, raiseload
+from sqlalchemy.orm.exc import StaleDataError
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from app import cache, suggest
+from . import models, replicas
+from .notify import notify_change
+from .pagination import encode_cursor, paginate, split_page
+from .search import search_books_statement
+
+# Страница результатов и курсор следующей страницы (None - страница последняя)
+Page = Tuple[list, Optional[str]]
+
+
+class VersionConflict(Exception):
+    """Запись изменили параллельно: версия в БД уже не та, что была прочитана"""
+
+
+class CategoryNotFound(Exception):
+    """Книга ссылается на несуществующую категорию (нарушение внешнего ключа books.category_id)"""
+
+
+# SQLSTATE foreign_key_violation в PostgreSQL
+_FOREIGN_KEY_VIOLATION = "23503"
+
+
+def _is_foreign_key_violation(e: IntegrityError) -> bool:
+    """Нарушен внешний ключ, а не уникальность или NOT NULL"""
+    # asyncpg (через адаптер SQLAlchemy) - sqlstate, psycopg2 - pgcode
+    code = getattr(e.orig, "sqlstate", None) or getattr(e.orig, "pgcode", None)
+    if code is not None:
+        return code == _FOREIGN_KEY_VIOLATION
+    # SQLite кодов не передаёт: "FOREIGN KEY constraint failed"
+    return "FOREIGN KEY" in str(e.orig).upper()
+
+
+def _version_name(entity: str) -> str:
+    return models.BOOKS_VERSION if entity == "book" else models.CATEGORIES_VERSION
+
+
+async def _bump_versions(db: AsyncSession, entity: str, action: str) -> replicas.Position:
+    """
+    Поднять версии списков в текущей транзакции (для ETag и журнала изменений).
+    UPDATE держит блокировку строк catalog_versions до commit, поэтому записи одного списка
+    получают версии в порядке commit - на этом держится курсор GET /books/changes.
+    Чтобы записать версию в catalog_version изменяемых строк, вызывать до их изменения.
+
+    Цена - записи книг идут друг за другом: потолок - одна транзакция на время от этого UPDATE
+    до конца COMMIT, сколько бы ни было клиентов (benchmarks/bench_version_row.py). Массовые записи
+    берут блокировку один раз на пачку (COPY, пачки bulk-update/delete, групповой commit), поэтому
+    книг в секунду у них в размер пачки больше.
+    """
+    if entity == "book":
+        names = [models.BOOKS_VERSION]
+    elif action == "create":
+        names = [models.CATEGORIES_VERSION]
+    else:
+        # Категория вложена в ответы книг - меняются и списки книг
+        names = [models.CATEGORIES_VERSION, models.BOOKS_VERSION]
+    result = await db.execute(
+        update(models.CatalogVersion)
+        .where(models.CatalogVersion.name.in_(names))
+        .values(version=models.CatalogVersion.version + 1)
+        .returning(models.CatalogVersion.name, models.CatalogVersion.version)
+        .execution_options(synchronize_session=False)
+    )
+    return {name: version for name, version in result.all()}
+
+
+async def _record_change(
+    db: AsyncSession,
+    entity: str,
+    entity_id: Optional[int],
+    action: str,
+    versions: replicas.Position
+):
+    """
+    Отметить изменение в текущей транзакции: запомнить версии, поднятые _bump_versions,
+    и отправить событие другим воркерам. Вызывать до commit.
+    """
+    # Новые версии - позиция для чтения своих записей с реплик (см. app/db/replicas.py)
+    for name, version in versions.items():
+        replicas.record_write(name, version)
+    await notify_change(db, entity, entity_id, action)
+
+
+async def _log_deletions(db: AsyncSession, entity: str, entity_ids: Sequence[int], version: int):
+    """Записать удалённые строки в журнал удалений (для GET /books/changes и /categories/changes)"""
+    await db.execute(
+        insert(models.CatalogDeletion),
+        [{"entity": entity, "entity_id": entity_id, "version": version} for entity_id in entity_ids]
+    )
+
+
+async def _commit(db: AsyncSession):
+    """commit с переводом конфликта версий в VersionConflict"""
+    try:
+        await db.commit()
+    except StaleDataError as e:
+        await db.rollback()
+        raise VersionConflict(str(e)) from e
+
+
+async def get_catalog_version(db: AsyncSession, name: str) -> int:
+    """Текущая версия списка (models.BOOKS_VERSION или models.CATEGORIES_VERSION)"""
+    result = await db.execute(
+        select(models.CatalogVersion.version).filter(models.CatalogVersion.name == name)
+    )
+    return result.scalar() or 0
+
+
+def _by_id(row):
+    """Ключ keyset-пагинации по id"""
+    return [row.id]
 
 
 # ========== CRUD для Category ==========
 
-def create_category(db: Session, title: str) -> models.Category:
+async def create_category(db: AsyncSession, title: str) -> models.Category:
     """Создать категорию"""
-    db_category = models.Category(title=title)
+    versions = await _bump_versions(db, "category", "create")
+    db_category = models.Category(title=title, catalog_version=versions[models.CATEGORIES_VERSION])
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.flush()
+    await _record_change(db, "category", db_category.id, "create", versions)
+    await db.commit()
+    await db.refresh(db_category)
+    await cache.on_category_created(db_category.id)
     return db_category
 
 
-def get_categories(db: Session, skip: int = 0, limit: int = 100) -> List[models.Category]:
-    """Получить все категории с пагинацией"""
-    return db.query(models.Category).offset(skip).limit(limit).all()
+async def get_categories(db: AsyncSession, limit: int = 100, cursor: Optional[str] = None) -> Page:
+    """Получить категории постранично (keyset-пагинация по id)"""
+    stmt = paginate(select(models.Category), [models.Category.id], cursor, limit)
+    result = await db.execute(stmt)
+    return split_page(result.scalars().all(), limit, _by_id)
 
 
-def get_category(db: Session, category_id: int) -> Optional[models.Category]:
+async def get_category(db: AsyncSession, category_id: int) -> Optional[models.Category]:
     """Получить категорию по ID"""
-    return db.query(models.Category).filter(models.Category.id == category_id).first()
+    result = await db.execute(
+        select(models.Category).filter(models.Category.id == category_id)
+    )
+    return result.scalars().first()
+
+
+async def get_categories_by_ids(db: AsyncSession, category_ids: Sequence[int]) -> List[models.Category]:
+    """Категории по списку ID одним запросом (порядок не гарантирован)"""
+    if not category_ids:
+        return []
+    result = await db.execute(
+        select(models.Category).filter(models.Category.id.in_(category_ids))
+    )
+    return result.scalars().all()
 
 
-def get_category_by_title(db: Session, title: str) -> Optional[models.Category]:
+async def get_category_by_title(db: AsyncSession, title: str) -> Optional[models.Category]:
     """Получить категорию по названию"""
-    return db.query(models.Category).filter(models.Category.title == title).first()
+    result = await db.execute(
+        select(models.Category).filter(models.Category.title == title)
+    )
+    return result.scalars().first()
+
+
+async def get_existing_category_ids(db: AsyncSession, category_ids: Iterable[int]) -> Set[int]:
+    """Какие из переданных ID категорий существуют (один запрос на всю пачку)"""
+    category_ids = set(category_ids)
+    if not category_ids:
+        return set()
+    result = await db.execute(
+        select(models.Category.id).filter(models.Category.id.in_(category_ids))
+    )
+    return set(result.scalars().all())
 
 
-def update_category(db: Session, category_id: int, title: str) -> Optional[models.Category]:
+async def update_category(db: AsyncSession, category_id: int, title: str) -> Optional[models.Category]:
     """Обновить название категории"""
-    category = get_category(db, category_id)
+    category = await get_category(db, category_id)
     if category:
+        versions = await _bump_versions(db, "category", "update")
         category.title = title
-        db.commit()
-        db.refresh(category)
+        category.catalog_version = versions[models.CATEGORIES_VERSION]
+        await _record_change(db, "category", category_id, "update", versions)
+        await _commit(db)
+        await db.refresh(category)
+        await cache.on_category_changed(category_id)
     return category
 
 
-def delete_category(db: Session, category_id: int) -> bool:
+async def delete_category(db: AsyncSession, category_id: int) -> bool:
     """Удалить категорию"""
-    category = get_category(db, category_id)
+    category = await get_category(db, category_id)
     if category:
-        db.delete(category)
-        db.commit()
+        versions = await _bump_versions(db, "category", "delete")
+        await db.delete(category)
+        await _log_deletions(db, "category", [category_id], versions[models.CATEGORIES_VERSION])
+        await _record_change(db, "category", category_id, "delete", versions)
+        await _commit(db)
+        await cache.on_category_changed(category_id)
         return True
     return False
 
 
 # ========== CRUD для Book ==========
 
-def create_book(
-    db: Session, 
-    title: str, 
-    price: float, 
-    category_id: Optional[int] = None,
-    description: Optional[str] = None,
-    url: Optional[str] = None
-) -> models.Book:
-    """Создать книгу"""
-    db_book = models.Book(
-        title=title,
-        description=description,
-        price=price,
-        url=url,
-        category_id=category_id
-    )
-    db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
-    return db_book
-
-
-def get_books(
-    db: Session, 
-    skip: int = 0, 
-    limit: int = 100
-) -> List[models.Book]:
-    """Получить все книги с пагинацией"""
-    return db.query(models.Book).offset(skip).limit(limit).all()
-
-
-def get_book(db: Session, book_id: int) -> Optional[models.Book]:
-    """Получить книгу по ID"""
-    return db.query(models.Book).filter(models.Book.id == book_id).first()
+async def create_book(db: AsyncSession, values: dict):
+    """
+    Создать книгу одним INSERT ... RETURNING (категория проверяется внешним ключом).
+    Возвращает строку в формате find_book_rows; CategoryNotFound - категории нет.
+    """
+    versions = await _bump_versions(db, "book", "create")
+    stmt = (
+        insert(models.Book)
+        .values(**values, catalog_version=versions[models.BOOKS_VERSION])
+        .returning(*_book_returning())
+    )
+    row = await _write_book(db, stmt, values)
+    await _record_change(db, "book", row.id, "create", versions)
+    await db.commit()
+    suggest.index.on_book_saved(row.id, row.title, versions[models.BOOKS_VERSION])
+    return row
+
+
+async def create_books(db: AsyncSession, rows: List[dict]) -> list:
+    """
+    Создать несколько книг одной транзакцией (групповой commit, см. app/db/group_commit.py).
+    Для каждой книги возвращает строку в формате find_book_rows или исключение - CategoryNotFound
+    (нарушен внешний ключ категории) либо IntegrityError этой книги, как у crud.create_book:
+    если пачка целиком не прошла, книги вставляются по одной в точках сохранения той же транзакции.
+    """
+    table = models.Book.__table__
+    versions = await _bump_versions(db, "book", "bulk")
+    try:
+        result = await db.execute(
+            insert(table).returning(*_book_returning(), sort_by_parameter_order=True),
+            _with_version(rows, versions)
+        )
+        results = list(result.all())
+    except IntegrityError:
+        await db.rollback()
+        versions = await _bump_versions(db, "book", "bulk")
+        results = []
+        for values in _with_version(rows, versions):
+            try:
+                async with db.begin_nested():
+                    result = await db.execute(insert(table).values(**values).returning(*_book_returning()))
+                    results.append(result.first())
+            except IntegrityError as e:
+                if values.get("category_id") is not None and _is_foreign_key_violation(e):
+                    results.append(CategoryNotFound(values["category_id"]))
+                else:
+                    results.append(e)
+    await _record_change(db, "book", None, "bulk", versions)
+    await db.commit()
+    for row in results:
+        if not isinstance(row, Exception):
+            suggest.index.on_book_saved(row.id, row.title, versions[models.BOOKS_VERSION])
+    return results
+
+
+def _with_version(rows: List[dict], versions: replicas.Position) -> List[dict]:
+    """Строки новых книг с catalog_version (см. _bump_versions)"""
+    version = versions[models.BOOKS_VERSION]
+    return [{**row, "catalog_version": version} for row in rows]
+
+
+_BOOK_COLUMNS = ("title", "description", "price", "url", "category_id", "catalog_version")
+
+
+class BulkInsertError(Exception):
+    """Пачка книг не записана (транзакция откачена)"""
+
+
+async def insert_books(db: AsyncSession, rows: List[dict]) -> int:
+    """
+    Вставить пачку книг в одной транзакции.
+    В PostgreSQL (asyncpg) - через COPY, в остальных СУБД - многострочным INSERT.
+    """
+    if not rows:
+        return 0
+    try:
+        versions = await _bump_versions(db, "book", "bulk")
+        rows = _with_version(rows, versions)
+        if db.bind.dialect.driver == "asyncpg":
+            conn = await db.connection()
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                models.Book.__tablename__,
+                records=[tuple(row.get(c) for c in _BOOK_COLUMNS) for row in rows],
+                columns=_BOOK_COLUMNS
+            )
+        else:
+            await db.execute(insert(models.Book), rows)
+        await _record_change(db, "book", None, "bulk", versions)
+        await db.commit()
+        # id вставленных книг COPY не возвращает - индекс подсказок заберёт их из журнала изменений
+        suggest.index.schedule_catch_up()
+    except Exception as e:
+        # Ошибки COPY приходят от asyncpg напрямую, минуя SQLAlchemy
+        await db.rollback()
+        raise BulkInsertError(str(e)) from e
+    return len(rows)
+
+
+# Сортировки списка книг: "-" - по убыванию; newest - сначала новые (id растёт с добавлением),
+# relevance - по релевантности поиска (только вместе с search)
+BOOK_SORTS = ("id", "newest", "price", "-price", "title", "-title", "relevance")
+
+
+def _book_sort(sort: str, rank) -> Tuple[list, bool]:
+    """Колонки ключа keyset-пагинации (последняя - id) и направление"""
+    if sort == "relevance":
+        return [rank, models.Book.id], True
+    if sort in ("id", "newest"):
+        return [models.Book.id], sort == "newest"
+    field = sort.lstrip("-")
+    return [getattr(models.Book, field), models.Book.id], sort.startswith("-")
+
 
+def _book_load_options(fields: Sequence[str], sort_field: str) -> list:
+    """Загрузить только нужные колонки книги (load_only) и не присоединять категорию без надобности"""
+    names = {name for name in fields if name != "category"} | {"id"}
+    if sort_field in ("price", "title"):
+        names.add(sort_field)
+    options = [load_only(*(getattr(models.Book, name) for name in sorted(names)))]
+    if "category" not in fields:
+        options.append(raiseload(models.Book.category))
+    return options
 
-def get_books_by_category(db: Session, category_id: int) -> List[models.Book]:
-    """Получить книги по категории"""
-    return db.query(models.Book).filter(models.Book.category_id == category_id).all()
 
+# Колонки книги и её категории для выборки без ORM (find_book_rows); порядок - как у полей схем Book и Category
+BOOK_ROW_COLUMNS = (
+    models.Book.title, models.Book.description, models.Book.price, models.Book.url,
+    models.Book.category_id, models.Book.id, models.Book.version,
+    models.Book.created_at, models.Book.updated_at,
+)
+CATEGORY_ROW_COLUMNS = tuple(
+    column.label(f"category__{column.key}")
+    for column in (
+        models.Category.title, models.Category.id, models.Category.version,
+        models.Category.created_at, models.Category.updated_at,
+    )
+)
+
+
+def find_books_statement(
+    dialect: str,
+    category_ids: Optional[Sequence[int]] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    rows: bool = False,
+    book_ids: Optional[Sequence[int]] = None
+) -> Tuple:
+    """
+    Построить запрос списка книг: фильтры складываются через AND, сортировка по умолчанию -
+    relevance при поиске, иначе id. Возвращает (stmt, key): запрос на limit + 1 строку
+    и функцию, строящую ключ курсора из строки результата.
+    Каждой сортировке соответствует индекс (см. migrations/versions/0003_books_sort_indexes.py).
+    fields - выбрать только эти колонки книги (id и поле сортировки загружаются всегда);
+    без "category" в fields категория не присоединяется.
+    rows - выбрать не объекты Book, а кортежи BOOK_ROW_COLUMNS + CATEGORY_ROW_COLUMNS.
+    book_ids - страница уже выбрана снимком каталога (app/snapshot.py): только эти книги по первичному
+    ключу, без сортировки и курсора (порядок восстанавливает _in_order).
+    """
+    rank = None
+    if search:
+        stmt, rank = search_books_statement(dialect, search)
+        if rows:
+            stmt = stmt.with_only_columns(*BOOK_ROW_COLUMNS, *CATEGORY_ROW_COLUMNS, rank)
+    elif rows:
+        stmt = select(*BOOK_ROW_COLUMNS, *CATEGORY_ROW_COLUMNS)
+    else:
+        stmt = select(models.Book)
+    if rows:
+        stmt = stmt.outerjoin(models.Category, models.Category.id == models.Book.category_id)
+    if category_ids:
+        category_ids = list(category_ids)
+        if len(category_ids) == 1:
+            stmt = stmt.filter(models.Book.category_id == category_ids[0])
+        else:
+            stmt = stmt.filter(models.Book.category_id.in_(category_ids))
+    if price_min is not None:
+        stmt = stmt.filter(models.Book.price >= price_min)
+    if price_max is not None:
+        stmt = stmt.filter(models.Book.price <= price_max)
+
+    sort = sort or ("relevance" if search else "id")
+    if sort == "relevance" and rank is None:
+        sort = "id"
+    columns, descending = _book_sort(sort, rank)
+    field = sort.lstrip("-")
+    if fields is not None:
+        stmt = stmt.options(*_book_load_options(fields, field))
+
+    def key(row):
+        book = row if rows else row[0]
+        if field == "relevance":
+            return [row.rank, book.id]
+        if field in ("id", "newest"):
+            return [book.id]
+        return [getattr(book, field), book.id]
 
-def search_books_by_title(db: Session, search_term: str) -> List[models.Book]:
-    """Поиск книг по названию"""
-    return db.query(models.Book).filter(
-        models.Book.title.ilike(f"%{search_term}%")
-    ).all()
+    if book_ids is not None:
+        # Без ORDER BY и LIMIT: иначе план может пойти по индексу сортировки вместо первичного ключа.
+        # В PostgreSQL список id - один параметр-массив: IN из сотни параметров вдвое дольше на стороне клиента
+        if dialect == "postgresql":
+            condition = models.Book.id == any_(bindparam("book_ids", list(book_ids), type_=ARRAY(Integer)))
+        else:
+            condition = models.Book.id.in_(book_ids)
+        return stmt.filter(condition), key
+    return paginate(stmt, columns, cursor, limit, descending=descending), key
 
 
-def update_book(
-    db: Session, 
-    book_id: int, 
-    title: Optional[str] = None,
-    description: Optional[str] = None,
-    price: Optional[float] = None,
-    url: Optional[str] = None,
+def _in_order(rows: Sequence, book_ids: Sequence[int], book_id) -> list:
+    """Строки в порядке book_ids; book_id(row) - id книги строки"""
+    position = {value: i for i, value in enumerate(book_ids)}
+    return sorted(rows, key=lambda row: position[book_id(row)])
+
+
+async def find_books(
+    db: AsyncSession,
+    category_ids: Optional[Sequence[int]] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    book_ids: Optional[Sequence[int]] = None
+) -> Page:
+    """Книги с фильтрами и сортировкой одним SQL-запросом, постранично (см. find_books_statement)"""
+    stmt, key = find_books_statement(
+        db.bind.dialect.name, category_ids, price_min, price_max, search, sort, limit, cursor, fields,
+        book_ids=book_ids
+    )
+    rows = (await db.execute(stmt)).all()
+    if book_ids is not None:
+        rows = _in_order(rows, book_ids, lambda row: row[0].id)
+    rows, next_cursor = split_page(rows, limit, key)
+    return [row[0] for row in rows], next_cursor
+
+
+async def find_book_rows(
+    db: AsyncSession,
+    category_ids: Optional[Sequence[int]] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    book_ids: Optional[Sequence[int]] = None
+) -> Page:
+    """
+    То же, что find_books, но без ORM: страница строк BOOK_ROW_COLUMNS + CATEGORY_ROW_COLUMNS
+    (для быстрой сериализации списков, см. app/serialization.py)
+    """
+    stmt, key = find_books_statement(
+        db.bind.dialect.name, category_ids, price_min, price_max, search, sort, limit, cursor,
+        rows=True, book_ids=book_ids
+    )
+    rows = (await db.execute(stmt)).all()
+    if book_ids is not None:
+        rows = _in_order(rows, book_ids, lambda row: row.id)
+    return split_page(rows, limit, key)
+
+
+async def get_books(
+    db: AsyncSession,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Page:
+    """Получить все книги постранично"""
+    return await find_books(db, limit=limit, cursor=cursor)
+
+
+async def stream_books(
+    db: AsyncSession,
+    columns: Sequence[str],
+    batch_size: int = 5000,
     category_id: Optional[int] = None
-) -> Optional[models.Book]:
-    """Обновить книгу"""
-    book = get_book(db, book_id)
-    if book:
-        if title is not None:
-            book.title = title
-        if description is not None:
-            book.description = description
-        if price is not None:
-            book.price = price
-        if url is not None:
-            book.url = url
-        if category_id is not None:
-            book.category_id = category_id
-        
-        db.commit()
-        db.refresh(book)
-    return book
-
-
-def delete_book(db: Session, book_id: int) -> bool:
-    """Удалить книгу"""
-    book = get_book(db, book_id)
-    if book:
-        db.delete(book)
-        db.commit()
-        return True
-    return False
\ No newline at end of file
+) -> AsyncIterator[list]:
+    """
+    Читать книги серверным курсором пачками по batch_size строк.
+    Выбираются только колонки columns - без ORM-объектов и без JOIN категории.
+    """
+    stmt = select(*(getattr(models.Book, name) for name in columns)).order_by(models.Book.id)
+    if category_id is not None:
+        stmt = stmt.filter(models.Book.category_id == category_id)
+    result = await db.stream(stmt.execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        yield partition
+
+
+async def get_book(db: AsyncSession, book_id: int) -> Optional[models.Book]:
+    """Получить книгу по ID"""
+    result = await db.execute(select(models.Book).filter(models.Book.id == book_id))
+    return result.scalars().first()
+
+
+async def get_books_by_ids(db: AsyncSession, book_ids: Sequence[int]) -> List[models.Book]:
+    """Книги по списку ID одним запросом, категории - JOIN-ом в нём же (порядок не гарантирован)"""
+    if not book_ids:
+        return []
+    result = await db.execute(select(models.Book).filter(models.Book.id.in_(book_ids)))
+    return result.scalars().all()
+
+
+async def get_books_by_category(
+    db: AsyncSession,
+    category_id: int,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Page:
+    """Получить книги по категории постранично"""
+    return await find_books(db, category_ids=[category_id], limit=limit, cursor=cursor)
+
+
+async def count_books_by_category(db: AsyncSession, category_id: int) -> int:
+    """Количество книг в категории - из счётчика category_stats, без обхода книг"""
+    result = await db.execute(
+        select(models.CategoryStats.book_count).filter(models.CategoryStats.category_id == category_id)
+    )
+    return result.scalar() or 0
+
+
+async def search_books(
+    db: AsyncSession,
+    search_term: str,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Page:
+    """Поиск книг по названию и описанию, по убыванию релевантности"""
+    return await find_books(db, search=search_term, limit=limit, cursor=cursor)
+
+
+# Ожидаемое состояние книги из If-Match: (версия книги, ID категории, версия категории)
+BookState = Tuple[int, Optional[int], Optional[int]]
+
+
+def _book_returning() -> list:
+    """
+    Колонки RETURNING для записи книги: те же, что у find_book_rows,
+    категория - подзапросами по первичному ключу в том же запросе
+    """
+    # Ссылка на изменяемую строку - текстом: в RETURNING SQLite SQLAlchemy не ставит имена таблиц,
+    # а INSERT не коррелирует подзапрос сам
+    category_id = literal_column("books.category_id")
+    return [*BOOK_ROW_COLUMNS] + [
+        select(column.element).where(models.Category.id == category_id)
+        .scalar_subquery().label(column.name)
+        for column in CATEGORY_ROW_COLUMNS
+    ]
+
+
+def _book_state_condition(book_id: int, expected: Optional[Sequence[BookState]]):
+    """WHERE для изменения книги: книга существует и (если задано) совпадает с одним из expected"""
+    condition = models.Book.id == book_id
+    if expected is None:
+        return condition
+    states = []
+    for version, category_id, category_version in expected:
+        if category_id is None:
+            states.append(and_(models.Book.version == version, models.Book.category_id.is_(None)))
+        else:
+            states.append(and_(
+                models.Book.version == version,
+                models.Book.category_id == category_id,
+                exists().where(models.Category.id == category_id, models.Category.version == category_version),
+            ))
+    return and_(condition, or_(*states) if states else false())
+
+
+async def _write_book(db: AsyncSession, stmt, values: dict):
+    """Выполнить INSERT/UPDATE книги с RETURNING; нарушение внешнего ключа -> CategoryNotFound"""
+    try:
+        result = await db.execute(stmt.execution_options(synchronize_session=False))
+        return result.first()
+    except IntegrityError as e:
+        await db.rollback()
+        if values.get("category_id") is not None and _is_foreign_key_violation(e):
+            raise CategoryNotFound(values["category_id"]) from e
+        raise
+
+
+async def _not_found_or_conflict(db: AsyncSession, book_id: int, expected) -> None:
+    """Запрос не затронул книгу: её нет (None) или она не совпала с If-Match (VersionConflict)"""
+    await db.rollback()
+    if expected is not None:
+        result = await db.execute(select(models.Book.id).filter(models.Book.id == book_id))
+        if result.first() is not None:
+            raise VersionConflict(f"Книга {book_id} не совпадает с ожидаемой версией")
+    return None
+
+
+async def update_book(
+    db: AsyncSession,
+    book_id: int,
+    values: dict,
+    expected: Optional[Sequence[BookState]] = None
+):
+    """
+    Изменить книгу одним UPDATE ... RETURNING: существование, If-Match (expected)
+    и категория (внешний ключ) проверяются тем же запросом.
+    Возвращает строку в формате find_book_rows или None, если книги нет;
+    VersionConflict - книга не совпала с expected, CategoryNotFound - категории нет.
+    Без values книга не меняется, возвращается текущее состояние.
+    """
+    condition = _book_state_condition(book_id, expected)
+    if not values:
+        result = await db.execute(select(*_book_returning()).filter(condition))
+        row = result.first()
+        return row if row is not None else await _not_found_or_conflict(db, book_id, expected)
+
+    versions = await _bump_versions(db, "book", "update")
+    stmt = (
+        update(models.Book)
+        .where(condition)
+        .values(**values, version=models.Book.version + 1, catalog_version=versions[models.BOOKS_VERSION])
+        .returning(*_book_returning())
+    )
+    row = await _write_book(db, stmt, values)
+    if row is None:
+        return await _not_found_or_conflict(db, book_id, expected)
+    await _record_change(db, "book", book_id, "update", versions)
+    await db.commit()
+    # Без смены названия индекс только сдвигает версию (put с тем же названием ничего не меняет)
+    suggest.index.on_book_saved(book_id, row.title, versions[models.BOOKS_VERSION])
+    await cache.on_book_changed(book_id)
+    return row
+
+
+async def delete_book(db: AsyncSession, book_id: int, expected: Optional[Sequence[BookState]] = None) -> bool:
+    """
+    Удалить книгу одним DELETE ... RETURNING (expected - как в update_book).
+    False - книги нет; VersionConflict - книга не совпала с expected.
+    """
+    versions = await _bump_versions(db, "book", "delete")
+    stmt = delete(models.Book).where(_book_state_condition(book_id, expected)).returning(models.Book.id)
+    result = await db.execute(stmt.execution_options(synchronize_session=False))
+    if result.first() is None:
+        await _not_found_or_conflict(db, book_id, expected)
+        return False
+    await _log_deletions(db, "book", [book_id], versions[models.BOOKS_VERSION])
+    await _record_change(db, "book", book_id, "delete", versions)
+    await db.commit()
+    suggest.index.on_book_deleted(book_id, versions[models.BOOKS_VERSION])
+    await cache.on_book_changed(book_id)
+    return True
+
+
+# ========== Массовые изменения книг ==========
+
+def book_filter(
+    ids: Optional[Sequence[int]] = None,
+    category_ids: Optional[Sequence[int]] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None
+) -> list:
+    """Условия WHERE для массовых операций над книгами (пустой список - без условий)"""
+    conditions = []
+    if ids is not None:
+        conditions.append(models.Book.id.in_(list(ids)))
+    if category_ids is not None:
+        conditions.append(models.Book.category_id.in_(list(category_ids)))
+    if price_min is not None:
+        conditions.append(models.Book.price >= price_min)
+    if price_max is not None:
+        conditions.append(models.Book.price <= price_max)
+    return conditions
+
+
+def scaled_price(factor: float):
+    """Цена, умноженная на factor, с округлением до копеек (round есть только у numeric в PostgreSQL)"""
+    return cast(func.round(cast(models.Book.price * factor, Numeric), 2), Float)
+
+
+async def _bulk_books(db: AsyncSession, conditions: list, chunk_size: int, action: str, make_statement) -> Tuple[int, int]:
+    """
+    Применить изменение пачками по chunk_size книг (по возрастанию id), каждая пачка -
+    один запрос и своя транзакция, чтобы не держать блокировки на всю выборку.
+    make_statement(where, version) строит UPDATE/DELETE ... RETURNING id (version - для catalog_version).
+    Удалённые книги записываются в журнал удалений. Возвращает (книг, пачек).
+    """
+    affected = chunks = 0
+    last_id = None
+    while True:
+        chunk = select(models.Book.id).where(*conditions).order_by(models.Book.id).limit(chunk_size)
+        if last_id is not None:
+            chunk = chunk.where(models.Book.id > last_id)
+        versions = await _bump_versions(db, "book", action)
+        version = versions[models.BOOKS_VERSION]
+        stmt = make_statement(models.Book.id.in_(chunk.scalar_subquery()), version)
+        result = await db.execute(stmt.execution_options(synchronize_session=False))
+        book_ids = result.scalars().all()
+        if not book_ids:
+            await db.rollback()
+            break
+        if action == "delete":
+            await _log_deletions(db, "book", book_ids, version)
+        await _record_change(db, "book", None, action, versions)
+        await db.commit()
+        if action == "delete":
+            for book_id in book_ids:
+                suggest.index.on_book_deleted(book_id, version)
+        else:
+            # Новые названия (если менялись) индекс заберёт из журнала изменений
+            suggest.index.schedule_catch_up()
+        await cache.on_books_changed(book_ids)
+        affected += len(book_ids)
+        chunks += 1
+        if len(book_ids) < chunk_size:
+            break
+        last_id = max(book_ids)
+    return affected, chunks
+
+
+async def bulk_update_books(
+    db: AsyncSession, conditions: list, values: dict, chunk_size: int = 5000
+) -> Tuple[int, int]:
+    """
+    Изменить все книги, подходящие под conditions (см. book_filter), одним UPDATE на пачку.
+    values - значения колонок или SQL-выражения (scaled_price); версия книги растёт.
+    CategoryNotFound - переносят в несуществующую категорию (пачка откатывается).
+    """
+    def make_statement(where, version):
+        return (
+            update(models.Book)
+            .where(where)
+            .values(**values, version=models.Book.version + 1, catalog_version=version)
+            .returning(models.Book.id)
+        )
+
+    try:
+        return await _bulk_books(db, conditions, chunk_size, "update", make_statement)
+    except IntegrityError as e:
+        await db.rollback()
+        if values.get("category_id") is not None and _is_foreign_key_violation(e):
+            raise CategoryNotFound(values["category_id"]) from e
+        raise
+
+
+async def bulk_delete_books(db: AsyncSession, conditions: list, chunk_size: int = 5000) -> Tuple[int, int]:
+    """Удалить все книги, подходящие под conditions, одним DELETE на пачку"""
+    def make_statement(where, version):
+        return delete(models.Book).where(where).returning(models.Book.id)
+
+    return await _bulk_books(db, conditions, chunk_size, "delete", make_statement)
+
+
+# ========== Журнал изменений (GET /books/changes, /categories/changes) ==========
+
+# Изменение: (вид, ключ курсора [версия, id], объект) - вид "upsert" (объект - строка модели)
+# или "delete" (объект - None)
+Change = Tuple[str, list, Optional[object]]
+
+_CHANGE_MODELS = {"book": models.Book, "category": models.Category}
+
+
+async def get_changes(db: AsyncSession, entity: str, cursor: Optional[str], limit: int = 1000) -> Tuple[List[Change], str, bool]:
+    """
+    Изменения книг (entity="book") или категорий ("category") после курсора в порядке commit:
+    текущие строки с catalog_version больше курсора и записи журнала удалений.
+    Ключ курсора - (версия списка, id); без курсора - с начала, то есть весь каталог.
+    Возвращает (изменения, курсор для следующего запроса, есть ли ещё изменения).
+    InvalidCursor - курсор не разобран.
+    """
+    model = _CHANGE_MODELS[entity]
+    # Строки и удаления читаются двумя запросами, и в READ COMMITTED у каждого свой снимок:
+    # запись, закоммиченная между ними, попала бы только во второй, и курсор перескочил бы
+    # через изменение из первого. Поэтому сначала читается версия списка и выдаются только
+    # изменения не новее неё: версия v видна только после commit всех записей с версиями
+    # до v (_bump_versions держит блокировку строки до commit), и обе выборки их увидят.
+    current = await get_catalog_version(db, _version_name(entity))
+    upserts = await db.execute(
+        paginate(select(model).filter(model.catalog_version <= current), [model.catalog_version, model.id], cursor, limit)
+    )
+    deletions = await db.execute(
+        paginate(
+            select(models.CatalogDeletion.version, models.CatalogDeletion.entity_id)
+            .filter(models.CatalogDeletion.entity == entity, models.CatalogDeletion.version <= current),
+            [models.CatalogDeletion.version, models.CatalogDeletion.entity_id], cursor, limit
+        )
+    )
+    changes: List[Change] = [("upsert", [row.catalog_version, row.id], row) for row in upserts.scalars()]
+    changes += [("delete", [version, entity_id], None) for version, entity_id in deletions.all()]
+    # Обе выборки упорядочены по тому же ключу - берём первые limit из объединения
+    changes.sort(key=lambda change: change[1])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        cursor = encode_cursor(changes[-1][1])
+    elif cursor is None:
+        cursor = encode_cursor([0, 0])
+    return changes, cursor, has_more
+
+
+# ========== Статистика категорий и фасеты (GET /categories/stats, /books/facets) ==========
+
+def _price_bucket():
+    """Нижняя граница ценового диапазона книги - как в триггерах миграции 0005"""
+    return case(
+        *((models.Book.price >= bound, bound) for bound in reversed(models.PRICE_BUCKETS[1:])), else_=0
+    )
+
+
+def _bucket_list(counts: Dict[int, int]) -> List[dict]:
+    """{нижняя граница: книг} -> непустые диапазоны по возрастанию цены"""
+    bounds = models.PRICE_BUCKETS
+    return [
+        {
+            "price_from": bound,
+            "price_to": bounds[i + 1] if i + 1 < len(bounds) else None,
+            "book_count": counts[bound],
+        }
+        for i, bound in enumerate(bounds) if counts.get(bound)
+    ]
+
+
+def _facet(book_count: int, price_sum: float, price_min, price_max, buckets: Dict[int, int]) -> dict:
+    return {
+        "book_count": book_count,
+        "price_min": price_min if book_count else None,
+        "price_max": price_max if book_count else None,
+        "price_avg": round(price_sum / book_count, 2) if book_count else None,
+        "price_buckets": _bucket_list(buckets),
+    }
+
+
+async def _stored_buckets(db: AsyncSession, category_ids: Sequence[int]) -> Dict[int, Dict[int, int]]:
+    """Гистограммы цен категорий из category_price_buckets"""
+    if not category_ids:
+        return {}
+    result = await db.execute(
+        select(models.CategoryPriceBucket.category_id, models.CategoryPriceBucket.bucket,
+               models.CategoryPriceBucket.book_count)
+        .filter(models.CategoryPriceBucket.category_id.in_(category_ids), models.CategoryPriceBucket.book_count > 0)
+    )
+    buckets: Dict[int, Dict[int, int]] = {}
+    for category_id, bound, count in result.all():
+        buckets.setdefault(category_id, {})[bound] = count
+    return buckets
+
+
+_STATS_COLUMNS = (
+    models.CategoryStats.book_count, models.CategoryStats.price_sum,
+    models.CategoryStats.price_min, models.CategoryStats.price_max,
+)
+
+
+async def get_category_stats(db: AsyncSession, limit: int = 100, cursor: Optional[str] = None) -> Page:
+    """
+    Число книг, цены и гистограмма цен по каждой категории, постранично по id.
+    Читаются только счётчики category_stats - стоимость не зависит от числа книг.
+    """
+    stmt = paginate(
+        select(models.Category.id, models.Category.title, *_STATS_COLUMNS)
+        .outerjoin(models.CategoryStats, models.CategoryStats.category_id == models.Category.id),
+        [models.Category.id], cursor, limit
+    )
+    result = await db.execute(stmt)
+    rows, next_cursor = split_page(result.all(), limit, _by_id)
+    buckets = await _stored_buckets(db, [row.id for row in rows])
+    return [
+        {
+            "category_id": row.id,
+            "title": row.title,
+            **_facet(row.book_count or 0, row.price_sum or 0.0, row.price_min, row.price_max, buckets.get(row.id, {})),
+        }
+        for row in rows
+    ], next_cursor
+
+
+async def get_book_facets(
+    db: AsyncSession,
+    category_ids: Optional[Sequence[int]] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    search: Optional[str] = None
+) -> dict:
+    """
+    Фасеты списка книг с теми же фильтрами, что у find_books: по каждой категории число книг,
+    цены и гистограмма цен, плюс сводка по всем. Книги без категории не учитываются.
+    Без фильтров по цене и поиска (только категории) читаются счётчики category_stats -
+    O(категорий); иначе книги группируются запросом по фильтру.
+    """
+    if price_min is None and price_max is None and not search:
+        stmt = (
+            select(models.Category.id, models.Category.title, *_STATS_COLUMNS)
+            .join(models.CategoryStats, models.CategoryStats.category_id == models.Category.id)
+            .filter(models.CategoryStats.book_count > 0)
+        )
+        if category_ids:
+            stmt = stmt.filter(models.Category.id.in_(list(category_ids)))
+        rows = (await db.execute(stmt)).all()
+        buckets = await _stored_buckets(db, [row.id for row in rows])
+    else:
+        if search:
+            base, _ = search_books_statement(db.bind.dialect.name, search)
+        else:
+            base = select(models.Book)
+        base = base.filter(
+            models.Book.category_id.is_not(None),
+            *book_filter(category_ids=category_ids, price_min=price_min, price_max=price_max)
+        )
+        price = models.Book.price
+        result = await db.execute(
+            base.with_only_columns(
+                models.Book.category_id.label("id"), models.Category.title, func.count().label("book_count"),
+                func.sum(price).label("price_sum"), func.min(price).label("price_min"),
+                func.max(price).label("price_max")
+            )
+            .join(models.Category, models.Category.id == models.Book.category_id)
+            .group_by(models.Book.category_id, models.Category.title)
+        )
+        rows = result.all()
+        bucket = _price_bucket()
+        result = await db.execute(
+            base.with_only_columns(models.Book.category_id, bucket, func.count())
+            .group_by(models.Book.category_id, bucket)
+        )
+        buckets = {}
+        for category_id, bound, count in result.all():
+            buckets.setdefault(category_id, {})[bound] = count
+
+    categories = [
+        {
+            "category_id": row.id,
+            "title": row.title,
+            **_facet(row.book_count, row.price_sum, row.price_min, row.price_max, buckets.get(row.id, {})),
+        }
+        for row in rows
+    ]
+    categories.sort(key=lambda c: (-c["book_count"], c["category_id"]))
+    # Сводка по всем категориям
+    merged: Dict[int, int] = {}
+    for counts in buckets.values():
+        for bound, count in counts.items():
+            merged[bound] = merged.get(bound, 0) + count
+    total = _facet(
+        sum(row.book_count for row in rows),
+        sum(row.price_sum for row in rows),
+        min((row.price_min for row in rows), default=None),
+        max((row.price_max for row in rows), default=None),
+        merged,
+    )
+    return {**total, "categories": categories}
@@ -1,9 +1,14 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
+from app import metrics
+from . import query_counter
+
 # Загружаем переменные из .env
 load_dotenv()
 
@@ -14,20 +19,154 @@ DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 
-# Формируем строку подключения
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Формируем строку подключения (DATABASE_URL из окружения имеет приоритет)
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+
+def make_async_url(url: str) -> str:
+    """Подставить асинхронный драйвер в строку подключения"""
+    scheme, sep, rest = url.partition("://")
+    if scheme in ("postgresql", "postgresql+psycopg2"):
+        return "postgresql+asyncpg" + sep + rest
+    if scheme == "sqlite":
+        return "sqlite+aiosqlite" + sep + rest
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", make_async_url(DATABASE_URL))
+
+# Пул соединений: постоянные соединения, сколько можно открыть сверх них при пике
+# и сколько секунд запрос ждёт соединение, прежде чем получить ошибку
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Через сколько секунд переоткрывать соединение (-1 - не переоткрывать)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+
+# Больше одновременных запросов к БД пул не выдаст (см. app/admission.py)
+DB_POOL_CAPACITY = DB_POOL_SIZE + max(DB_MAX_OVERFLOW, 0)
+
+
+def pool_options(url: str) -> dict:
+    """Параметры пула для create_engine; у SQLite в памяти пул из одного соединения - без них"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
 
-engine = create_engine(DATABASE_URL, echo=False)
+# Синхронный движок - для init_db.py и служебных скриптов
+engine = create_engine(DATABASE_URL, echo=False, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Асинхронный движок - для обработчиков API
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **pool_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+def enable_sqlite_foreign_keys(sync_engine):
+    """SQLite проверяет внешние ключи только с PRAGMA foreign_keys=ON на каждом соединении"""
+    if sync_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+# Запись книги с несуществующей категорией отклоняет сама БД (см. crud.update_book)
+enable_sqlite_foreign_keys(engine)
+enable_sqlite_foreign_keys(async_engine.sync_engine)
+
+# Считаем SQL-запросы на каждом HTTP-запросе (см. query_counter.py)
+query_counter.install(engine)
+query_counter.install(async_engine.sync_engine)
+
+# Время SQL-запросов и ожидания пула для /metrics (см. app/metrics.py)
+metrics.install_engine(async_engine.sync_engine, "primary")
+
 Base = declarative_base()
 
-def get_db():
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-def create_tables():
-    Base.metadata.create_all(bind=engine)
-    print("Все таблицы созданы!")
\ No newline at end of file
+
+# Схемой БД управляет Alembic (alembic.ini и migrations/ в корне проекта)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config(os.path.join(PROJECT_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "migrations"))
+    return config
+
+
+def upgrade_schema(revision: str = "head"):
+    """Применить миграции (то же, что alembic upgrade head) - для init_db.py и бенчмарков"""
+    from alembic import command
+
+    config = alembic_config()
+    with engine.connect() as conn:
+        config.attributes["connection"] = conn
+        command.upgrade(config, revision)
+        conn.commit()
+    print(f"Схема БД обновлена до {revision}")
+
+
+def downgrade_schema(revision: str):
+    from alembic import command
+
+    config = alembic_config()
+    with engine.connect() as conn:
+        config.attributes["connection"] = conn
+        command.downgrade(config, revision)
+        conn.commit()
+
+
+def _current_revision(conn):
+    from alembic.runtime.migration import MigrationContext
+
+    return MigrationContext.configure(conn).get_current_revision()
+
+
+async def check_schema_version() -> str:
+    """
+    Проверить при старте, что БД в последней версии миграций.
+    Сам старт DDL не выполняет: миграции применяются заранее одной командой alembic upgrade head
+    """
+    from alembic.script import ScriptDirectory
+
+    head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+    async with async_engine.connect() as conn:
+        current = await conn.run_sync(_current_revision)
+    if current != head:
+        raise RuntimeError(
+            f"Схема БД в версии {current}, приложению нужна {head}: выполните alembic upgrade head"
+        )
+    return current
@@ -0,0 +1,129 @@
+"""
+Групповой commit для создания книг (POST /books).
+
+Без него каждый POST /books - отдельная транзакция, и скорость создания упирается
+во время fsync при COMMIT. В режиме группового commit одновременные запросы
+собираются в пачку (до GROUP_COMMIT_MAX_ROWS книг или GROUP_COMMIT_WINDOW_MS миллисекунд
+с первой книги), пачка вставляется одной транзакцией (crud.create_books),
+и каждый запрос получает свою строку с назначенным id.
+Ошибка одной книги (нет категории) не мешает остальным: такие книги вставляются
+по одной в точках сохранения той же транзакции.
+Размер пачек и ожидание запроса от постановки в очередь до commit - в /metrics
+(group_commit_batch_rows, group_commit_wait_seconds).
+
+Включается переменной окружения GROUP_COMMIT=1 (по умолчанию выключен).
+"""
+import asyncio
+import contextvars
+import os
+from typing import List, Optional, Tuple
+
+from app import metrics
+
+from . import crud, replicas
+from .db import AsyncSessionLocal
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "0").lower() in ("1", "true", "yes")
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_ROWS = int(os.getenv("GROUP_COMMIT_MAX_ROWS", "100"))
+
+
+def set_enabled(enabled: bool):
+    """Включить или выключить групповой commit (для сравнения в бенчмарках)"""
+    global GROUP_COMMIT
+    GROUP_COMMIT = enabled
+
+
+class GroupCommit:
+    """Очередь создаваемых книг и фоновая задача, записывающая их пачками"""
+
+    def __init__(self, window_ms: float = GROUP_COMMIT_WINDOW_MS, max_rows: int = GROUP_COMMIT_MAX_ROWS):
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self.batches = 0
+        self.rows = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+
+    async def create_book(self, values: dict):
+        """Поставить книгу в пачку и дождаться commit; возвращает строку как crud.create_book"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((values, future, self._loop.time()))
+        row, written = await future
+        # Позиция для чтения своих записей - в контекст этого запроса (см. app/db/replicas.py)
+        for name, version in written.items():
+            replicas.record_write(name, version)
+        return row
+
+    def _ensure_started(self):
+        # Очередь и задача привязаны к циклу событий, в котором их создали
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            # Пустой контекст: SQL пачки не засчитывается запросу, который запустил задачу (X-Query-Count)
+            self._task = loop.create_task(self._run(), context=contextvars.Context())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.window
+            while len(batch) < self.max_rows:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future, float]]):
+        # Запросы, чьи клиенты уже отключились, не записываем
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+        metrics.group_commit_batch_rows.observe(len(batch))
+        written = replicas.track_writes()
+        try:
+            async with AsyncSessionLocal() as db:
+                results = await crud.create_books(db, [values for values, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        committed = self._loop.time()
+        for (_, future, enqueued), result in zip(batch, results):
+            metrics.group_commit_wait.observe(committed - enqueued)
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result((result, written))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": GROUP_COMMIT,
+            "window_ms": self.window * 1000,
+            "max_rows": self.max_rows,
+            "batches": self.batches,
+            "rows": self.rows,
+        }
+
+
+group_commit = GroupCommit()
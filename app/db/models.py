@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Index, func, text
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -9,8 +9,23 @@ class Category(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(100), unique=True, nullable=False)
     
+    # Версия строки: растёт при каждом изменении, UPDATE проверяет её (оптимистичная блокировка)
+    version = Column(Integer, nullable=False, server_default=text("1"))
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    
+    # Версия списка (catalog_versions), при которой строка изменилась последний раз - позиция
+    # в журнале изменений (GET /categories/changes); 0 - строка не менялась с загрузки каталога
+    catalog_version = Column(Integer, nullable=False, server_default=text("0"))
+    
     # Связь с книгами (одна категория - много книг)
     books = relationship("Book", back_populates="category")
+    
+    __table_args__ = (
+        Index("ix_categories_catalog_version_id", "catalog_version", "id"),
+    )
+    
+    __mapper_args__ = {"version_id_col": version, "eager_defaults": True}
 
 class Book(Base):
     """Таблица книг"""
@@ -25,5 +40,79 @@ class Book(Base):
     # Ссылка на категорию (внешний ключ)
     category_id = Column(Integer, ForeignKey("categories.id"))
     
-    # Связь с категорией
-    category = relationship("Category", back_populates="books")
\ No newline at end of file
+    # Версия строки и время изменения (см. Category)
+    version = Column(Integer, nullable=False, server_default=text("1"))
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    catalog_version = Column(Integer, nullable=False, server_default=text("0"))  # см. Category
+    
+    # Связь с категорией: подгружается JOIN-ом в том же запросе,
+    # чтобы список книг не делал отдельный SELECT на каждую категорию (N+1)
+    category = relationship("Category", back_populates="books", lazy="joined")
+    
+    # Индексы под фильтры и сортировки списка книг (см. migrations/versions/0002, 0003)
+    # и под журнал изменений (0004)
+    __table_args__ = (
+        Index("ix_books_catalog_version_id", "catalog_version", "id"),
+        Index("ix_books_category_id_id", "category_id", "id"),
+        Index("ix_books_category_id_price_id", "category_id", "price", "id"),
+        Index("ix_books_price_id", "price", "id"),
+        Index("ix_books_title_id", "title", "id"),
+    )
+    
+    __mapper_args__ = {"version_id_col": version, "eager_defaults": True}
+
+class CatalogVersion(Base):
+    """Общая версия списка: растёт при любом изменении книг или категорий (для ETag списков)"""
+    __tablename__ = "catalog_versions"
+    
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class CatalogDeletion(Base):
+    """Журнал удалений: для GET /books/changes и /categories/changes удалённые строки - записи о них"""
+    __tablename__ = "catalog_deletions"
+    
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(20), nullable=False)  # "book" или "category"
+    entity_id = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)  # версия списка в момент удаления (как catalog_version)
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_catalog_deletions_entity_version_entity_id", "entity", "version", "entity_id"),
+    )
+
+
+class CategoryStats(Base):
+    """
+    Счётчики книг категории для GET /categories/stats и /books/facets.
+    Поддерживаются триггерами на books (миграция 0005) - приложение их только читает.
+    """
+    __tablename__ = "category_stats"
+    
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    book_count = Column(Integer, nullable=False, server_default=text("0"))
+    price_sum = Column(Float, nullable=False, server_default=text("0"))
+    price_min = Column(Float)
+    price_max = Column(Float)
+
+
+class CategoryPriceBucket(Base):
+    """Число книг категории в ценовом диапазоне (см. PRICE_BUCKETS), поддерживается теми же триггерами"""
+    __tablename__ = "category_price_buckets"
+    
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # нижняя граница диапазона
+    book_count = Column(Integer, nullable=False, server_default=text("0"))
+
+
+# Нижние границы ценовых диапазонов гистограмм; зашиты в триггеры миграции 0005,
+# изменение требует новой миграции
+PRICE_BUCKETS = (0, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+# Имена счётчиков в catalog_versions (строки добавляет миграция 0001)
+BOOKS_VERSION = "books"
+CATEGORIES_VERSION = "categories"
@@ -0,0 +1,146 @@
+"""
+Шина изменений каталога через PostgreSQL LISTEN/NOTIFY.
+
+Функции записи в crud.py вызывают notify_change() внутри своей транзакции -
+PostgreSQL доставит уведомление всем слушателям только после COMMIT.
+Каждый воркер запускает ChangeListener (из lifespan в app/main.py), который
+получает события и передаёт их подписчикам, например кэшу чтения.
+
+Если соединение слушателя оборвалось или он не успевает разбирать события,
+подписчикам вызывается on_flush - полный сброс локального состояния,
+т.к. часть событий могла потеряться.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+CHANNEL = "catalog_changes"
+
+# Сколько событий может ждать разбора и насколько они могут отстать (в секундах),
+# прежде чем слушатель сдастся и сбросит всё
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "10000"))
+NOTIFY_MAX_LAG = float(os.getenv("NOTIFY_MAX_LAG", "5"))
+NOTIFY_PING_INTERVAL = float(os.getenv("NOTIFY_PING_INTERVAL", "10"))
+
+OnChange = Callable[[str, Optional[int], str], Awaitable[None]]
+OnFlush = Callable[[], Awaitable[None]]
+
+
+async def notify_change(db: AsyncSession, entity: str, entity_id: Optional[int], action: str):
+    """
+    Отправить событие об изменении (entity - "book"/"category", action - create/update/delete/bulk).
+    Вызывать до commit: уведомление уйдёт вместе с транзакцией или не уйдёт вовсе.
+    """
+    if db.bind.dialect.name != "postgresql":
+        return
+    payload = json.dumps({"entity": entity, "id": entity_id, "action": action, "ts": time.time()})
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+class ChangeListener:
+    """Фоновый слушатель канала catalog_changes с переподключением"""
+
+    def __init__(self, url: str):
+        # asyncpg принимает обычный DSN без "+asyncpg"
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.subscribers: List[Tuple[OnChange, OnFlush]] = []
+        self.received = 0
+        self.flushes = 0
+        self.reconnects = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+        self._overflow = False
+        self._tasks: List[asyncio.Task] = []
+
+    def subscribe(self, on_change: OnChange, on_flush: OnFlush):
+        self.subscribers.append((on_change, on_flush))
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._dispatch()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "queued": self._queue.qsize(),
+            "flushes": self.flushes,
+            "reconnects": self.reconnects,
+        }
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.received += 1
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self._overflow = True
+
+    async def _flush(self, reason: str):
+        print(f"Сброс локальных кэшей ({reason})")
+        self.flushes += 1
+        for _, on_flush in self.subscribers:
+            await on_flush()
+
+    async def _listen(self):
+        import asyncpg
+
+        backoff = 0.5
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                await conn.add_listener(CHANNEL, self._on_notify)
+                # Пока слушателя не было, события могли пройти мимо
+                await self._flush("подключение слушателя")
+                backoff = 0.5
+                while True:
+                    await asyncio.sleep(NOTIFY_PING_INTERVAL)
+                    await asyncio.wait_for(conn.execute("SELECT 1"), timeout=NOTIFY_PING_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.reconnects += 1
+                print(f"Слушатель {CHANNEL} отключился: {e!r}, повтор через {backoff} с")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if conn is not None:
+                    conn.terminate()
+
+    async def _dispatch(self):
+        while True:
+            payload = await self._queue.get()
+            if self._overflow:
+                # Очередь переполнялась - отдельные события потеряны
+                self._overflow = False
+                while not self._queue.empty():
+                    self._queue.get_nowait()
+                await self._flush("очередь событий переполнена")
+                continue
+            try:
+                event = json.loads(payload)
+                entity, entity_id, action = event["entity"], event.get("id"), event["action"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if time.time() - event.get("ts", time.time()) > NOTIFY_MAX_LAG:
+                while not self._queue.empty():
+                    self._queue.get_nowait()
+                await self._flush("слушатель отстал")
+                continue
+            for on_change, _ in self.subscribers:
+                try:
+                    await on_change(entity, entity_id, action)
+                except Exception as e:
+                    print(f"Ошибка обработки события {payload}: {e!r}")
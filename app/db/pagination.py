@@ -0,0 +1,74 @@
+"""
+Keyset (курсорная) пагинация.
+
+Вместо OFFSET следующая страница выбирается условием (sort_key, id) > (последнее значение),
+поэтому время ответа не зависит от номера страницы - БД сразу переходит по индексу к нужной позиции.
+Курсор для клиента непрозрачен: это base64 от JSON-списка [sort_value, id].
+"""
+import base64
+import json
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    """Курсор не удалось разобрать"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Упаковать значения ключа сортировки в непрозрачную строку"""
+    raw = json.dumps(list(values), separators=(",", ":"), ensure_ascii=False, default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Распаковать курсор, выданный encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor("Некорректный курсор пагинации") from e
+    if not isinstance(values, list) or not values or not isinstance(values[-1], int):
+        raise InvalidCursor("Некорректный курсор пагинации")
+    return values
+
+
+def _matches_type(column, value) -> bool:
+    """Значение из курсора того же типа, что и колонка (курсор от другой сортировки не подойдёт)"""
+    try:
+        expected = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return True
+    if expected is float:
+        expected = (int, float)
+    return isinstance(value, expected) and not isinstance(value, bool)
+
+
+def paginate(stmt, columns: Sequence, cursor: Optional[str], limit: int, descending: bool = False):
+    """
+    Добавить к запросу сортировку по columns и условие "после курсора".
+    Последней колонкой должен идти уникальный id - он разрешает равные значения ключа.
+    Выбирается limit + 1 строка: лишняя строка означает, что есть следующая страница.
+    """
+    if cursor is not None:
+        values = decode_cursor(cursor)
+        if len(values) != len(columns) or not all(map(_matches_type, columns, values)):
+            raise InvalidCursor("Курсор не подходит к выбранной сортировке")
+        key = tuple_(*columns)
+        after = tuple_(*values)
+        stmt = stmt.filter(key < after if descending else key > after)
+    order = [c.desc() for c in columns] if descending else list(columns)
+    return stmt.order_by(*order).limit(limit + 1)
+
+
+def split_page(rows: Sequence, limit: int, key: Callable[[Any], Sequence]) -> Tuple[List, Optional[str]]:
+    """
+    Отрезать лишнюю строку и построить курсор следующей страницы.
+    key(row) возвращает значения ключа сортировки в том же порядке, что и columns в paginate()
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
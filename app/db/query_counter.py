@@ -0,0 +1,52 @@
+"""
+Подсчёт SQL-запросов в рамках одного HTTP-запроса.
+
+Счётчик живёт в ContextVar, поэтому запросы разных клиентов не смешиваются.
+Middleware в app/main.py оборачивает каждый запрос в count_queries() и
+отдаёт результат в заголовке X-Query-Count - на него удобно опираться в тестах.
+Текст запросов запоминается только с QUERY_COUNTER_STATEMENTS=1 (для отладки):
+массовая загрузка выполняет тысячи запросов, и хранить их на каждый HTTP-запрос незачем.
+"""
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+
+QUERY_COUNTER_STATEMENTS = os.getenv("QUERY_COUNTER_STATEMENTS", "0").lower() in ("1", "true", "yes")
+
+
+class QueryCounter:
+    """Количество выполненных SQL-запросов и, если нужно, их текст"""
+
+    def __init__(self, statements: bool = False):
+        self.count = 0
+        self.statements: Optional[List[str]] = [] if statements else None
+
+
+_current_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+@contextmanager
+def count_queries(statements: Optional[bool] = None):
+    """Считать все SQL-запросы, выполненные внутри блока with (statements - запоминать и их текст)"""
+    counter = QueryCounter(QUERY_COUNTER_STATEMENTS if statements is None else statements)
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.count += 1
+        if counter.statements is not None:
+            counter.statements.append(statement)
+
+
+def install(engine):
+    """Подключить счётчик к синхронному движку (для async - engine.sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
@@ -0,0 +1,233 @@
+"""
+Чтение с реплик: списки книг и выгрузка читаются с реплик, записи и всё остальное - с primary.
+
+Реплики задаются переменной REPLICA_DATABASE_URLS (строки подключения через запятую).
+Фоновая проверка (ReplicaSet.start из lifespan) раз в REPLICA_CHECK_INTERVAL секунд читает
+catalog_versions на primary и на каждой реплике. Версии в catalog_versions растут при каждой
+записи, поэтому служат позицией в журнале изменений (как LSN, но одинаково для PostgreSQL и SQLite):
+- реплика, не ответившая за REPLICA_CHECK_TIMEOUT, выводится из ротации до следующей успешной проверки;
+- отставание реплики - сколько секунд назад primary получил первую запись, которой на реплике ещё нет;
+  реплики с отставанием больше REPLICA_MAX_LAG секунд из ротации выводятся.
+
+Чтение своих записей: ответ на запись несёт заголовок и cookie X-Catalog-Position с версиями,
+которые подняла эта запись. Если клиент присылает позицию обратно (заголовком или cookie),
+запрос уходит только на реплику, которая её уже догнала, иначе - на primary.
+
+Для локальной проверки подойдут два файла SQLite (реплика - копия файла primary) или два PostgreSQL.
+"""
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import metrics
+from . import models, query_counter
+from .db import AsyncSessionLocal, make_async_url, pool_options
+
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "1"))
+REPLICA_CHECK_TIMEOUT = float(os.getenv("REPLICA_CHECK_TIMEOUT", "1"))
+
+POSITION_HEADER = "X-Catalog-Position"
+POSITION_COOKIE = "catalog_position"
+SOURCE_HEADER = "X-Read-Source"
+
+Position = Dict[str, int]
+
+
+# ========== Позиция клиента (чтение своих записей) ==========
+
+_written: ContextVar[Optional[Position]] = ContextVar("written_position", default=None)
+
+
+def track_writes() -> Position:
+    """Начать учёт версий, поднятых записями текущего HTTP-запроса (вызывает middleware)"""
+    written: Position = {}
+    _written.set(written)
+    return written
+
+
+def record_write(name: str, version: int):
+    """Запомнить новую версию счётчика catalog_versions (вызывает crud._record_change)"""
+    written = _written.get()
+    if written is not None:
+        written[name] = max(version, written.get(name, 0))
+
+
+def parse_position(value: Optional[str]) -> Position:
+    """"books:12/categories:5" -> {"books": 12, "categories": 5}; нераспознанное игнорируется"""
+    position: Position = {}
+    for part in (value or "").split("/"):
+        name, _, version = part.partition(":")
+        if name and version.isdigit():
+            position[name] = int(version)
+    return position
+
+
+def format_position(position: Position) -> str:
+    return "/".join(f"{name}:{version}" for name, version in sorted(position.items()))
+
+
+def merge_positions(*positions: Position) -> Position:
+    merged: Position = {}
+    for position in positions:
+        for name, version in position.items():
+            merged[name] = max(version, merged.get(name, 0))
+    return merged
+
+
+def _reached(versions: Position, position: Position) -> bool:
+    return all(versions.get(name, 0) >= version for name, version in position.items())
+
+
+async def _read_versions(session_factory) -> Position:
+    async with session_factory() as db:
+        result = await db.execute(select(models.CatalogVersion.name, models.CatalogVersion.version))
+        return {name: version for name, version in result.all()}
+
+
+# ========== Реплики ==========
+
+class Replica:
+    """Движок реплики и её состояние по последней проверке"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_async_engine(make_async_url(url), echo=False, **pool_options(url))
+        self.session = async_sessionmaker(
+            bind=self.engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+        query_counter.install(self.engine.sync_engine)
+        metrics.install_engine(self.engine.sync_engine, name)
+        self.healthy = False
+        self.versions: Position = {}
+        self.lag = 0.0
+        self.error: Optional[str] = None
+        self.reads = 0
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lag_seconds": round(self.lag, 3),
+            "versions": self.versions,
+            "reads": self.reads,
+            "error": self.error,
+        }
+
+
+class ReplicaSet:
+    """Выбор реплики для чтения и фоновая проверка здоровья и отставания"""
+
+    def __init__(self, urls: List[str], max_lag: float = REPLICA_MAX_LAG):
+        self.replicas = [Replica(f"replica{i + 1}", url) for i, url in enumerate(urls)]
+        self.max_lag = max_lag
+        self.primary_reads = 0
+        self._round_robin = itertools.count()
+        # (время, версии primary) по каждому изменению - по ним считается отставание в секундах
+        self._history: deque = deque(maxlen=10000)
+        self._task: Optional[asyncio.Task] = None
+
+    def pick(self, position: Position) -> Optional[Replica]:
+        """Здоровая реплика без большого отставания, догнавшая position; None - читать с primary"""
+        candidates = [
+            replica for replica in self.replicas
+            if replica.healthy and replica.lag <= self.max_lag and _reached(replica.versions, position)
+        ]
+        if not candidates:
+            self.primary_reads += 1
+            return None
+        replica = candidates[next(self._round_robin) % len(candidates)]
+        replica.reads += 1
+        return replica
+
+    async def check(self):
+        """Одна проверка: версии primary и каждой реплики"""
+        now = time.monotonic()
+        primary = await _read_versions(AsyncSessionLocal)
+        if not self._history or self._history[-1][1] != primary:
+            self._history.append((now, primary))
+        for replica in self.replicas:
+            try:
+                replica.versions = await asyncio.wait_for(
+                    _read_versions(replica.session), timeout=REPLICA_CHECK_TIMEOUT
+                )
+            except Exception as e:
+                replica.healthy = False
+                replica.error = repr(e)
+                continue
+            replica.healthy = True
+            replica.error = None
+            replica.lag = self._lag(replica.versions, now)
+
+    def _lag(self, versions: Position, now: float) -> float:
+        # Первое изменение на primary, которого на реплике ещё нет
+        for changed_at, primary in self._history:
+            if not _reached(versions, primary):
+                return now - changed_at
+        return 0.0
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                # primary недоступен: реплики не сравнить - читаем с primary (и получим ту же ошибку)
+                print(f"Проверка реплик не удалась: {e!r}")
+                for replica in self.replicas:
+                    replica.healthy = False
+            await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+
+    async def start(self):
+        if self.replicas and self._task is None:
+            await self.check()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "max_lag_seconds": self.max_lag,
+            "primary_reads": self.primary_reads,
+            "replicas": {replica.name: replica.stats() for replica in self.replicas},
+        }
+
+
+replica_set = ReplicaSet(REPLICA_DATABASE_URLS)
+
+
+def read_session_factory(request: Request):
+    """
+    Фабрика сессий для безопасного GET: реплика, догнавшая позицию клиента, иначе primary.
+    Источник запоминается в request.state.read_source (middleware отдаёт его в X-Read-Source).
+    """
+    position = parse_position(request.headers.get(POSITION_HEADER) or request.cookies.get(POSITION_COOKIE))
+    replica = replica_set.pick(position)
+    request.state.read_source = replica.name if replica else "primary"
+    return replica.session if replica else AsyncSessionLocal
+
+
+async def get_read_db(request: Request):
+    """
+    Вариант get_db для GET без кэша чтения (списки, выгрузка).
+    Ответы из кэша читаются только с primary: иначе отстающая реплика могла бы заново
+    положить в кэш устаревшую запись сразу после её сброса.
+    """
+    async with read_session_factory(request)() as db:
+        yield db
@@ -0,0 +1,74 @@
+"""
+Полнотекстовый и нечёткий поиск книг по названию и описанию.
+
+PostgreSQL: генерируемая колонка books.search_vector (tsvector) с GIN-индексом
+и триграммные GIN-индексы (pg_trgm) по title и description.
+SQLite: виртуальная таблица FTS5 books_fts, которую синхронизируют триггеры.
+Для прочих СУБД остаётся поиск слов в названии через ILIKE.
+Колонка, индексы, таблица и триггеры создаются миграцией migrations/versions/0001_initial.py.
+"""
+import re
+from typing import List, Tuple
+
+from sqlalchemy import and_, false, func, literal, literal_column, or_, select
+from sqlalchemy.sql import column, table
+
+from . import models
+
+# Веса колонок для bm25 в SQLite: совпадение в названии важнее, чем в описании
+_SQLITE_TITLE_WEIGHT = 10.0
+_SQLITE_DESCRIPTION_WEIGHT = 1.0
+
+_books_fts = table("books_fts", column("rowid"))
+
+
+def _tokens(search_term: str) -> List[str]:
+    """Разбить поисковую строку на слова (буквы и цифры, в т.ч. кириллица)"""
+    return re.findall(r"\w+", search_term.lower())
+
+
+def _like_escape(token: str) -> str:
+    """Экранировать спецсимволы LIKE (\\, %, _): слово ищется буквально"""
+    return token.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_books_statement(dialect: str, search_term: str) -> Tuple:
+    """
+    Построить запрос поиска книг.
+    Возвращает (stmt, rank): выборку (Book, rank) и колонку релевантности (больше - лучше),
+    по которой вызывающий код сортирует и пагинирует.
+    """
+    tokens = _tokens(search_term)
+    if dialect == "postgresql" and tokens:
+        # Последнее слово обычно недописано - ищем все слова как префиксы
+        tsquery = func.to_tsquery("russian", " & ".join(f"{t}:*" for t in tokens))
+        vector = literal_column("books.search_vector")
+        term = literal(search_term)
+        rank = func.ts_rank_cd(vector, tsquery) + func.word_similarity(term, models.Book.title)
+        condition = or_(
+            vector.op("@@")(tsquery),
+            term.op("<%")(models.Book.title),
+            term.op("<%")(models.Book.description),
+        )
+        matches = select(models.Book.id, rank.label("rank")).filter(condition)
+    elif dialect == "sqlite" and tokens:
+        fts_query = " ".join(f'"{t}"*' for t in tokens)
+        fts = literal_column("books_fts")
+        # bm25 возвращает отрицательные значения: чем меньше, тем релевантнее
+        rank = -func.bm25(fts, _SQLITE_TITLE_WEIGHT, _SQLITE_DESCRIPTION_WEIGHT)
+        matches = (
+            select(_books_fts.c.rowid.label("id"), rank.label("rank"))
+            .select_from(_books_fts)
+            .filter(fts.op("MATCH")(fts_query))
+        )
+    elif tokens:
+        # Все слова - подстроки названия; _ входит в \w и в LIKE означал бы любой символ
+        matches = select(models.Book.id, literal(0.0).label("rank")).filter(and_(
+            *(models.Book.title.ilike(f"%{_like_escape(t)}%", escape="\\") for t in tokens)
+        ))
+    else:
+        matches = select(models.Book.id, literal(0.0).label("rank")).filter(false())
+
+    matches = matches.subquery("matches")
+    stmt = select(models.Book, matches.c.rank).join(matches, matches.c.id == models.Book.id)
+    return stmt, matches.c.rank
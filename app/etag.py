@@ -0,0 +1,110 @@
+"""
+ETag и условные запросы (If-None-Match для GET, If-Match для PUT/DELETE).
+
+ETag одной записи строится из её версии (для книги - ещё и из версии вложенной категории),
+ETag списка - из общей версии каталога (таблица catalog_versions) и параметров запроса,
+поэтому проверить его можно одним коротким запросом, не выбирая сам список.
+"""
+import hashlib
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+
+
+def category_etag(category: dict) -> str:
+    return f'"c{category["id"]}.{category["version"]}"'
+
+
+def book_etag(book: dict) -> str:
+    category = book.get("category")
+    category_version = f'{category["id"]}.{category["version"]}' if category else "-"
+    return f'"b{book["id"]}.{book["version"]}.{category_version}"'
+
+
+def parse_book_etag(tag: str) -> Optional[Tuple[int, int, Optional[int], Optional[int]]]:
+    """Разобрать ETag книги в (id, версия, id категории, версия категории); None - это не ETag книги"""
+    parts = tag.strip('"').removeprefix("b").split(".")
+    try:
+        if len(parts) == 3 and parts[2] == "-":
+            return int(parts[0]), int(parts[1]), None, None
+        if len(parts) == 4:
+            return int(parts[0]), int(parts[1]), int(parts[2]), int(parts[3])
+    except ValueError:
+        pass
+    return None
+
+
+def fields_etag(tag: str, fields) -> str:
+    """ETag представления с выборочными полями отличается от ETag полного ответа"""
+    return f'{tag[:-1]};{"+".join(fields)}"'
+
+
+def list_etag(kind: str, version: int, request: Request) -> str:
+    """Одинаковые параметры при неизменной версии каталога дают тот же ответ"""
+    query = hashlib.sha1(str(request.query_params).encode("utf-8")).hexdigest()[:16]
+    return f'"{kind}.{version}.{query}"'
+
+
+def _parse(header: Optional[str], weak: bool):
+    if not header:
+        return None
+    tags = [tag.strip() for tag in header.split(",")]
+    # If-None-Match сравнивает теги слабо (W/ игнорируется), If-Match - строго
+    return [tag.removeprefix("W/") for tag in tags] if weak else tags
+
+
+def if_none_match_tags(request: Request) -> Set[str]:
+    return set(_parse(request.headers.get("if-none-match"), weak=True) or ())
+
+
+def batch_result(
+    ids: Sequence[int], found: Dict[int, dict], make_etag: Callable[[dict], str], known: Iterable[str]
+) -> dict:
+    """
+    Ответ пакетного чтения: записи в порядке ids, ненайденные ID - в missing.
+    Записи, чей ETag уже есть у клиента (known), не возвращаются - их ID попадают в not_modified.
+    """
+    known = {tag.removeprefix("W/") for tag in known}
+    result = {"items": [], "missing": [], "not_modified": [], "etags": {}}
+    for item_id in ids:
+        item = found.get(item_id)
+        if item is None:
+            result["missing"].append(item_id)
+            continue
+        tag = make_etag(item)
+        result["etags"][item_id] = tag
+        if tag in known:
+            result["not_modified"].append(item_id)
+        else:
+            result["items"].append(item)
+    return result
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Вернуть ответ 304, если клиент прислал совпадающий If-None-Match"""
+    tags = _parse(request.headers.get("if-none-match"), weak=True)
+    if tags and ("*" in tags or etag in tags):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+
+def if_match_tags(request: Request) -> Optional[List[str]]:
+    """Теги из If-Match; None - заголовка нет или в нём "*" (подходит любая версия)"""
+    tags = _parse(request.headers.get("if-match"), weak=False)
+    if not tags or "*" in tags:
+        return None
+    return tags
+
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Запись изменилась: ETag не совпадает с If-Match"
+    )
+
+
+def check_if_match(request: Request, etag: str):
+    """412, если If-Match передан и не совпадает с текущим ETag записи"""
+    tags = if_match_tags(request)
+    if tags is not None and etag not in tags:
+        raise precondition_failed()
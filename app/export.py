@@ -0,0 +1,98 @@
+"""
+Потоковая выгрузка каталога книг (GET /books/export) в NDJSON, CSV и Parquet.
+
+Строки читаются из БД серверным курсором пачками и сразу кодируются,
+поэтому расход памяти не зависит от размера таблицы.
+"""
+import csv
+import io
+import json
+from typing import AsyncIterator, List, Sequence
+
+NDJSON = "ndjson"
+CSV = "csv"
+PARQUET = "parquet"
+
+MEDIA_TYPES = {
+    NDJSON: "application/x-ndjson",
+    CSV: "text/csv; charset=utf-8",
+    PARQUET: "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    """Parquet - опциональный формат, нужен пакет pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def encode_ndjson(batches: AsyncIterator[Sequence], columns: List[str]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in batch
+        ).encode("utf-8")
+
+
+async def encode_csv(batches: AsyncIterator[Sequence], columns: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Файлоподобный приёмник: копит записанные байты, пока их не заберут"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def encode_parquet(batches: AsyncIterator[Sequence], columns: List[str]) -> AsyncIterator[bytes]:
+    """Каждая пачка строк - отдельная row group; байты отдаются по мере записи"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("price", pa.float64()),
+        ("url", pa.string()),
+        ("category_id", pa.int64()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    async for batch in batches:
+        table = pa.Table.from_pylist([dict(zip(columns, row)) for row in batch], schema=schema)
+        writer.write_table(table)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+ENCODERS = {
+    NDJSON: encode_ndjson,
+    CSV: encode_csv,
+    PARQUET: encode_parquet,
+}
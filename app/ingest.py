@@ -0,0 +1,96 @@
+"""
+Потоковый разбор NDJSON и CSV для массовой загрузки книг (POST /books/bulk).
+
+Тело запроса читается по частям и сразу превращается в записи,
+поэтому файл поставщика любого размера не держится в памяти целиком.
+"""
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Optional, Tuple, Union
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+_CONTENT_TYPES = {
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "text/csv": CSV,
+}
+
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    """Определить формат по заголовку Content-Type"""
+    if not content_type:
+        return None
+    return _CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Разбить поток байтов на строки (UTF-8, без символа перевода строки)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    tail = ""
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+async def _iter_csv_lines(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Склеить строки так, чтобы поле в кавычках с переводом строки не разрывалось"""
+    pending = None
+    async for line in lines:
+        pending = line if pending is None else pending + "\n" + line
+        if pending.count('"') % 2 == 0:
+            yield pending
+            pending = None
+    if pending is not None:
+        yield pending
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes],
+    fmt: str
+) -> AsyncIterator[Tuple[int, Union[dict, str]]]:
+    """
+    Выдавать (номер записи, запись). Если запись не удалось разобрать,
+    вместо словаря выдаётся текст ошибки - загрузка при этом продолжается.
+    Пустые строки пропускаются, нумерация записей начинается с 1.
+    """
+    lines = iter_lines(chunks)
+    row = 0
+    if fmt == NDJSON:
+        async for line in lines:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, f"Некорректный JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row, "Ожидался JSON-объект"
+                continue
+            yield row, record
+        return
+
+    header = None
+    async for line in _iter_csv_lines(lines):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, f"Ожидалось {len(header)} полей, получено {len(values)}"
+            continue
+        # Пустое поле CSV означает отсутствие значения
+        yield row, {name: (value if value != "" else None) for name, value in zip(header, values)}
@@ -1,15 +1,16 @@
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Корень проекта - чтобы пакет app импортировался так же, как при запуске сервера
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from db.db import SessionLocal, create_tables
-from db.crud import create_category, create_book
+from app.db.db import SessionLocal, upgrade_schema
+from app.db.sync_crud import create_category, create_books
 
 def main():
     print(" Начинаем инициализацию базы данных...")
     
-    # 1. Создаем таблицы
-    create_tables()
+    # 1. Создаем таблицы (применяем миграции)
+    upgrade_schema()
     
     # 2. Создаем сессию для работы с БД
     db = SessionLocal()
@@ -24,26 +25,30 @@ def main():
         
         print(" Добавляем книги в первую категорию...")
         
-        # 4. Добавляем 3 книги в первую категорию
-        create_book(db, "Война и мир", 1200.50, cat1.id, 
-                   "Роман Льва Толстого", "https://example.com/book1")
-        create_book(db, "Преступление и наказание", 850.00, cat1.id,
-                   "Роман Достоевского", "https://example.com/book2")
-        create_book(db, "Мастер и Маргарита", 950.00, cat1.id,
-                   "Роман Булгакова", "https://example.com/book3")
+        # 4. Добавляем 3 книги в первую категорию (одним запросом)
+        create_books(db, [
+            {"title": "Война и мир", "price": 1200.50, "category_id": cat1.id,
+             "description": "Роман Льва Толстого", "url": "https://example.com/book1"},
+            {"title": "Преступление и наказание", "price": 850.00, "category_id": cat1.id,
+             "description": "Роман Достоевского", "url": "https://example.com/book2"},
+            {"title": "Мастер и Маргарита", "price": 950.00, "category_id": cat1.id,
+             "description": "Роман Булгакова", "url": "https://example.com/book3"},
+        ])
         print(" Добавлено 3 книги в первую категорию")
         
         print(" Добавляем книги во вторую категорию...")
         
         # 5. Добавляем 4 книги во вторую категорию
-        create_book(db, "Python для начинающих", 1500.00, cat2.id,
-                   "Учебник по Python", "https://example.com/book4")
-        create_book(db, "Чистый код", 1800.00, cat2.id,
-                   "Книга о программировании", "https://example.com/book5")
-        create_book(db, "Алгоритмы", 2000.00, cat2.id,
-                   "Книга об алгоритмах", "https://example.com/book6")
-        create_book(db, "Базы данных", 1700.00, cat2.id,
-                   "Учебник по SQL", "https://example.com/book7")
+        create_books(db, [
+            {"title": "Python для начинающих", "price": 1500.00, "category_id": cat2.id,
+             "description": "Учебник по Python", "url": "https://example.com/book4"},
+            {"title": "Чистый код", "price": 1800.00, "category_id": cat2.id,
+             "description": "Книга о программировании", "url": "https://example.com/book5"},
+            {"title": "Алгоритмы", "price": 2000.00, "category_id": cat2.id,
+             "description": "Книга об алгоритмах", "url": "https://example.com/book6"},
+            {"title": "Базы данных", "price": 1700.00, "category_id": cat2.id,
+             "description": "Учебник по SQL", "url": "https://example.com/book7"},
+        ])
         print(" Добавлено 4 книги во вторую категорию")
         
         print("\n Инициализация завершена успешно!")
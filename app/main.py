@@ -1,19 +1,53 @@
-from fastapi import FastAPI
+import asyncio
+import os
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+from sqlalchemy import text
 
-from app.db.db import create_tables
+from app.db.db import ASYNC_DATABASE_URL, check_schema_version, async_engine
+from app.db.group_commit import group_commit
+from app.db import replicas
+from app.db.notify import ChangeListener
+from app.db.query_counter import count_queries
+from app.cache import apply_change, cache
+from app import admission, metrics, snapshot, suggest
 from app.api import books, categories
 from app.schemas import HealthCheck
 
-# Создаем таблицы при старте приложения
+# При старте только сверяем версию схемы: миграции применяются заранее (alembic upgrade head)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Запуск приложения...")
-    create_tables()
-    print("Таблицы созданы/проверены")
+    revision = await check_schema_version()
+    print(f"Версия схемы БД: {revision}")
+
+    # Слушаем изменения от других воркеров (только PostgreSQL + asyncpg)
+    listener = None
+    if async_engine.dialect.driver == "asyncpg":
+        listener = ChangeListener(ASYNC_DATABASE_URL)
+        listener.subscribe(apply_change, cache.clear)
+        listener.subscribe(suggest.index.on_change, suggest.index.on_flush)
+        listener.subscribe(snapshot.catalog.on_change, snapshot.catalog.on_flush)
+        await listener.start()
+        app.state.change_listener = listener
+    # Проверка здоровья и отставания реплик (если заданы REPLICA_DATABASE_URLS)
+    await replicas.replica_set.start()
+    # Индекс подсказок строится в фоне: приложение принимает запросы сразу
+    await suggest.index.start()
+    # Снимок каталога для списков книг (CATALOG_SNAPSHOT=1) - тоже в фоне
+    await snapshot.catalog.start()
     yield
     print("Выключение приложения...")
+    await snapshot.catalog.stop()
+    await suggest.index.stop()
+    await group_commit.stop()
+    await replicas.replica_set.stop()
+    if listener is not None:
+        await listener.stop()
+    await async_engine.dispose()
 
 # Создаем экземпляр FastAPI
 app = FastAPI(
@@ -23,6 +57,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Допуск запросов к БД по ёмкости пула, 503 при перегрузке (ADMISSION_CONTROL=1, см. app/admission.py).
+# Внутри CORS: отказ тоже несёт CORS-заголовки
+app.add_middleware(admission.AdmissionMiddleware)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -32,11 +70,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Время ответа и запросы в обработке по маршрутам (см. app/metrics.py)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Количество SQL-запросов на каждый HTTP-запрос - в заголовке ответа
+@app.middleware("http")
+async def query_count_header(request: Request, call_next):
+    with count_queries() as counter:
+        response = await call_next(request)
+    response.headers["X-Query-Count"] = str(counter.count)
+    return response
+
+# Позиция для чтения своих записей с реплик и источник чтения (см. app/db/replicas.py)
+@app.middleware("http")
+async def catalog_position(request: Request, call_next):
+    written = replicas.track_writes()
+    response = await call_next(request)
+    if written:
+        client = replicas.parse_position(
+            request.headers.get(replicas.POSITION_HEADER) or request.cookies.get(replicas.POSITION_COOKIE)
+        )
+        position = replicas.format_position(replicas.merge_positions(client, written))
+        response.headers[replicas.POSITION_HEADER] = position
+        response.set_cookie(replicas.POSITION_COOKIE, position, httponly=True)
+    source = getattr(request.state, "read_source", None)
+    if source is not None:
+        response.headers[replicas.SOURCE_HEADER] = source
+    return response
+
 # Подключаем роутеры
 app.include_router(categories.router)
 app.include_router(books.router)
 
 
+# Сколько секунд ждать ответа БД в /health
+HEALTH_DB_TIMEOUT = float(os.getenv("HEALTH_DB_TIMEOUT", "2"))
+
+
+async def _ping_db():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
 # Health check endpoint
 @app.get("/", tags=["health"])
 @app.get("/health", tags=["health"])
@@ -44,7 +119,72 @@ async def health_check():
     """
     Проверка работоспособности API и подключения к БД
     """
-    return HealthCheck()
+    try:
+        await asyncio.wait_for(_ping_db(), timeout=HEALTH_DB_TIMEOUT)
+    except asyncio.TimeoutError:
+        database = "timeout"
+    except Exception as e:
+        print(f"Health check: БД недоступна: {e!r}")
+        database = "unavailable"
+    else:
+        return HealthCheck()
+    health = HealthCheck(status="ERROR", database=database)
+    return JSONResponse(status_code=503, content=health.model_dump(mode="json"))
+
+
+# Метрики в формате Prometheus
+@app.get("/metrics", tags=["info"], response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Гистограммы времени ответа и SQL-запросов, состояние пула соединений и кэша чтения
+    """
+    body = metrics.render(await cache.stats())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Статистика кэша чтения
+@app.get("/cache/stats", tags=["info"])
+async def cache_stats():
+    """
+    Попадания, промахи, объединённые промахи и вытеснения кэша
+    """
+    stats = await cache.stats()
+    listener = getattr(app.state, "change_listener", None)
+    if listener is not None:
+        stats["notify"] = listener.stats()
+    return stats
+
+
+@app.get("/suggest/stats", tags=["info"])
+async def suggest_stats():
+    """
+    Индекс подсказок: готовность, число книг, время построения, версия журнала изменений
+    """
+    return suggest.index.stats()
+
+
+@app.get("/snapshot/stats", tags=["info"])
+async def snapshot_stats():
+    """
+    Снимок каталога: готовность, число книг, память, версия журнала изменений, ответы из снимка и промахи
+    """
+    return snapshot.catalog.stats()
+
+
+@app.get("/admission/stats", tags=["info"])
+async def admission_stats():
+    """
+    Допуск запросов к БД: ёмкость, лимиты, запросы в обработке и в очереди, отклонённые по классам
+    """
+    return admission.admission.stats()
+
+
+@app.get("/replicas", tags=["info"])
+async def replicas_stats():
+    """
+    Состояние реплик: здоровье, отставание, версии каталога и число чтений
+    """
+    return replicas.replica_set.stats()
 
 
 # Информация о API
@@ -61,6 +201,12 @@ async def api_info():
             "categories": "/categories",
             "books": "/books",
             "health": "/health",
+            "cache": "/cache/stats",
+            "metrics": "/metrics",
+            "replicas": "/replicas",
+            "suggest": "/suggest/stats",
+            "snapshot": "/snapshot/stats",
+            "admission": "/admission/stats",
             "docs": "/docs",
             "redoc": "/redoc"
         }
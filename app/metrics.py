@@ -0,0 +1,306 @@
+"""
+Метрики приложения в текстовом формате Prometheus (GET /metrics).
+
+- http_request_duration_seconds - гистограмма времени ответа по маршруту, методу и статусу
+- http_requests_in_flight - запросы, обрабатываемые прямо сейчас, по методу
+- db_statement_duration_seconds - время SQL-запросов по типу (SELECT/INSERT/...),
+  собирается событиями движка before/after_cursor_execute
+- db_pool_checkout_wait_seconds - сколько запрос ждал соединение из пула
+- db_pool_* - размер пула и занятые соединения на момент опроса
+- admission_* - запросы к БД в обработке и в очереди, ожидание в очереди и отклонённые
+  с 503 запросы по классу (read/write), см. app/admission.py
+- group_commit_* - размер пачек группового commit и ожидание книги до commit (app/db/group_commit.py)
+- cache_* - попадания, промахи, размер и вытеснения кэша чтения (app/cache.py) по хранилищу
+
+Маршрут берётся шаблоном ("/books/{book_id}"), а не фактическим путём,
+чтобы число рядов метрик не росло с числом книг.
+Выключить сбор можно переменной окружения METRICS_ENABLED=0.
+"""
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Границы корзин в секундах
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+POOL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+QUEUE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Границы корзин размера пачки группового commit, строк
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ========== Типы метрик ==========
+
+class Histogram:
+    """Гистограмма с метками: по каждому набору меток - счётчики корзин, сумма и количество"""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...], buckets: Iterable[float]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счётчики по корзинам (последняя - +Inf), сумма]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_str = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {total}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Значение, которое может расти и уменьшаться"""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Counter(Gauge):
+    """Только растущий счётчик"""
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} counter"
+        return lines
+
+
+# ========== Реестр ==========
+
+http_duration = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ("method", "route", "status"), HTTP_BUCKETS
+)
+http_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP-запросы в обработке", ("method",)
+)
+sql_duration = Histogram(
+    "db_statement_duration_seconds", "Время выполнения SQL-запроса",
+    ("engine", "operation"), SQL_BUCKETS
+)
+sql_errors = Counter(
+    "db_statement_errors_total", "SQL-запросы, завершившиеся ошибкой", ("engine", "operation")
+)
+pool_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Ожидание соединения из пула", ("engine",), POOL_BUCKETS
+)
+admission_active = Gauge(
+    "admission_requests_active", "Допущенные запросы к БД в обработке", ("class",)
+)
+admission_queued = Gauge(
+    "admission_requests_queued", "Запросы к БД, ждущие допуска", ("class",)
+)
+admission_wait = Histogram(
+    "admission_queue_wait_seconds", "Ожидание допуска до обработки", ("class",), QUEUE_BUCKETS
+)
+admission_shed = Counter(
+    "admission_shed_total", "Запросы, отклонённые с 503 при перегрузке", ("class", "reason")
+)
+group_commit_batch_rows = Histogram(
+    "group_commit_batch_rows", "Книг в одной транзакции группового commit", (), BATCH_BUCKETS
+)
+group_commit_wait = Histogram(
+    "group_commit_wait_seconds", "Ожидание книги в групповом commit: от постановки в очередь до commit",
+    (), QUEUE_BUCKETS
+)
+
+METRICS = [
+    http_duration, http_in_flight, sql_duration, sql_errors, pool_wait,
+    admission_active, admission_queued, admission_wait, admission_shed,
+    group_commit_batch_rows, group_commit_wait,
+]
+
+# Пулы, состояние которых снимается при каждом опросе /metrics: имя -> engine
+_engines: Dict[str, object] = {}
+
+
+def _pool_gauges() -> List[str]:
+    size = Gauge("db_pool_size", "Постоянный размер пула соединений", ("engine",))
+    checked_out = Gauge("db_pool_checked_out", "Соединения, выданные из пула", ("engine",))
+    overflow = Gauge("db_pool_overflow", "Соединения сверх постоянного размера пула", ("engine",))
+    for name, engine in sorted(_engines.items()):
+        pool = engine.pool
+        # У StaticPool/NullPool (например, SQLite в памяти) этих счётчиков нет
+        if hasattr(pool, "checkedout"):
+            size.set(pool.size(), name)
+            checked_out.set(pool.checkedout(), name)
+            overflow.set(max(pool.overflow(), 0), name)
+    return size.render() + checked_out.render() + overflow.render()
+
+
+def _cache_gauges(stats: dict) -> List[str]:
+    """Счётчики кэша чтения из cache.stats(); значения, которых хранилище не знает (None), пропускаются"""
+    backend = stats["backend"]
+    lines = []
+    for key, metric in (
+        ("hits", Counter("cache_hits_total", "Попадания в кэш чтения (этого воркера)", ("backend",))),
+        ("misses", Counter("cache_misses_total", "Промахи кэша чтения (этого воркера)", ("backend",))),
+        ("coalesced", Counter("cache_coalesced_total", "Промахи, дождавшиеся чужой загрузки", ("backend",))),
+        ("size", Gauge("cache_size", "Записей в хранилище кэша", ("backend",))),
+        ("evictions", Counter("cache_evictions_total", "Записи, вытесненные из-за лимита", ("backend",))),
+        ("expirations", Counter("cache_expirations_total", "Записи, удалённые по TTL", ("backend",))),
+    ):
+        if stats.get(key) is not None:
+            metric.set(stats[key], backend)
+        lines.extend(metric.render())
+    return lines
+
+
+def render(cache_stats: Optional[dict] = None) -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(_pool_gauges())
+    if cache_stats is not None:
+        lines.extend(_cache_gauges(cache_stats))
+    return "\n".join(lines) + "\n"
+
+
+# ========== SQL и пул ==========
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip()[:10].split(None, 1)
+    operation = word[0].upper() if word else ""
+    return operation if operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+def install_engine(engine, name: str = "primary"):
+    """Подключить сбор SQL-метрик к синхронному движку (для async - engine.sync_engine)"""
+    _engines[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if METRICS_ENABLED:
+            conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_started")
+        if started:
+            sql_duration.observe(time.perf_counter() - started.pop(), name, _operation(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("metrics_started") if context.connection else None
+        if started:
+            started.pop()
+            sql_errors.inc(name, _operation(context.statement or ""))
+
+    # У пула нет события "начал ждать соединение", поэтому засекаем время вокруг pool.connect().
+    # engine.dispose() создаёт новый пул - его вызывает только lifespan при остановке
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        if not METRICS_ENABLED:
+            return connect()
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            pool_wait.observe(time.perf_counter() - started, name)
+
+    pool.connect = timed_connect
+
+
+# ========== HTTP ==========
+
+class MetricsMiddleware:
+    """ASGI-middleware: время ответа по маршрутам и число запросов в обработке"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        # Маршрут станет известен только после того, как роутер разберёт запрос
+        http_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(method)
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            http_duration.observe(time.perf_counter() - started, method, route, str(status_code))
+
+
+def set_enabled(enabled: bool):
+    """Включить/выключить сбор (используется бенчмарком накладных расходов)"""
+    global METRICS_ENABLED
+    METRICS_ENABLED = enabled
+
+
+def reset():
+    for metric in METRICS:
+        if isinstance(metric, Histogram):
+            metric._series.clear()
+        else:
+            metric._values.clear()
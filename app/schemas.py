@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, RootModel, create_model
+from functools import lru_cache
+from typing import Dict, Generic, List, Literal, Optional, Tuple, Type, TypeVar, Union
 from datetime import datetime
 
 # ========== Схемы для Category ==========
@@ -19,7 +20,9 @@ class CategoryUpdate(BaseModel):
 class Category(CategoryBase):
     """Схема ответа для категории"""
     id: int
+    version: Optional[int] = None
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -50,13 +53,63 @@ class BookUpdate(BaseModel):
 class Book(BookBase):
     """Схема ответа для книги"""
     id: int
+    version: Optional[int] = None
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
     category: Optional[Category] = None  # Вложенная категория
     
     class Config:
         from_attributes = True
 
 
+class BulkRowError(BaseModel):
+    """Ошибка в одной строке массовой загрузки"""
+    row: int = Field(..., description="Номер записи в файле (с 1, без заголовка CSV)")
+    error: str
+
+# Сколько ошибочных строк массовой загрузки перечислять в ответе: файл из одних ошибок
+# не должен превращаться в такой же огромный список в памяти и в ответе
+BULK_MAX_ERRORS = 100
+
+class BulkResult(BaseModel):
+    """Итог массовой загрузки книг"""
+    received: int = 0
+    created: int = 0
+    failed: int = Field(0, description="Сколько строк не загружено (всего, не только перечисленные в errors)")
+    errors: List[BulkRowError] = Field([], description=f"Первые {BULK_MAX_ERRORS} ошибочных строк")
+
+class BookFilter(BaseModel):
+    """Отбор книг для массового изменения и удаления (условия объединяются через И)"""
+    ids: Optional[List[int]] = Field(None, max_length=10000, description="ID книг")
+    category_id: Optional[List[int]] = Field(None, description="Книги из любой из этих категорий")
+    price_min: Optional[float] = Field(None, ge=0, description="Минимальная цена (включительно)")
+    price_max: Optional[float] = Field(None, ge=0, description="Максимальная цена (включительно)")
+
+class BookBulkPatch(BaseModel):
+    """Что изменить у отобранных книг (только переданные поля)"""
+    price: Optional[float] = Field(None, gt=0, description="Новая цена")
+    price_factor: Optional[float] = Field(
+        None, gt=0, description="Умножить цену (0.9 - скидка 10%), результат округляется до копеек"
+    )
+    category_id: Optional[int] = Field(None, description="Перенести в категорию (null - убрать категорию)")
+
+class BookBulkUpdate(BaseModel):
+    """Массовое изменение книг: POST /books/bulk-update"""
+    filter: BookFilter
+    patch: BookBulkPatch
+    chunk_size: int = Field(5000, ge=1, le=50000, description="Книг в одной транзакции")
+
+class BookBulkDelete(BaseModel):
+    """Массовое удаление книг: POST /books/bulk-delete"""
+    filter: BookFilter
+    chunk_size: int = Field(5000, ge=1, le=50000, description="Книг в одной транзакции")
+
+class BulkChangeResult(BaseModel):
+    """Итог массового изменения или удаления"""
+    affected: int = Field(..., description="Сколько книг изменено или удалено")
+    chunks: int = Field(..., description="Сколько транзакций понадобилось (по chunk_size книг)")
+
+
 # ========== Схемы для ответов API ==========
 
 class HealthCheck(BaseModel):
@@ -65,9 +118,122 @@ class HealthCheck(BaseModel):
     database: str = "connected"
     timestamp: datetime = Field(default_factory=datetime.now)
 
-class PaginatedResponse(BaseModel):
-    """Схема для пагинированного ответа"""
-    total: int
-    page: int
-    per_page: int
-    items: list
\ No newline at end of file
+T = TypeVar("T")
+
+class PaginatedResponse(BaseModel, Generic[T]):
+    """Схема для пагинированного ответа (keyset-пагинация)"""
+    items: List[T]
+    limit: int = Field(..., description="Размер страницы")
+    next_cursor: Optional[str] = Field(
+        None, description="Курсор следующей страницы; null - страница последняя"
+    )
+
+
+# ========== Пакетное чтение (GET/POST /books/batch, /categories/batch) ==========
+
+BATCH_MAX_IDS = 1000
+
+class BatchRequest(BaseModel):
+    """Тело POST-запроса пакетного чтения"""
+    ids: List[int] = Field(..., min_length=1, max_length=BATCH_MAX_IDS, description="ID записей")
+    etags: List[str] = Field(
+        [], description="ETag записей, которые уже есть у клиента: неизменённые записи не возвращаются"
+    )
+
+class BatchResponse(BaseModel, Generic[T]):
+    """Ответ пакетного чтения"""
+    items: List[T] = Field(..., description="Найденные и изменённые записи в порядке запроса")
+    missing: List[int] = Field(..., description="ID, которых нет в БД")
+    not_modified: List[int] = Field(..., description="ID записей, чей ETag клиент уже передал")
+    etags: Dict[int, str] = Field(..., description="Текущий ETag каждой найденной записи")
+
+
+# ========== Журнал изменений (GET /books/changes, /categories/changes) ==========
+
+CHANGES_MAX_LIMIT = 5000
+
+class Change(BaseModel, Generic[T]):
+    """Одно изменение: запись создана или изменена (upsert) либо удалена (delete)"""
+    op: Literal["upsert", "delete"]
+    id: int
+    version: int = Field(..., description="Версия списка, при которой произошло изменение")
+    item: Optional[T] = Field(None, description="Текущее состояние записи (для upsert)")
+
+class ChangeFeed(BaseModel, Generic[T]):
+    """Страница журнала изменений"""
+    changes: List[Change[T]] = Field(..., description="Изменения в порядке commit")
+    next_cursor: str = Field(..., description="Передать в since следующего запроса")
+    has_more: bool = Field(..., description="Есть ещё изменения - запросить сразу, не дожидаясь расписания")
+
+
+# ========== Статистика категорий и фасеты (GET /categories/stats, /books/facets) ==========
+
+class PriceBucket(BaseModel):
+    """Ценовой диапазон гистограммы [price_from, price_to)"""
+    price_from: float
+    price_to: Optional[float] = Field(None, description="null - без верхней границы")
+    book_count: int
+
+class Facet(BaseModel):
+    """Число книг и цены"""
+    book_count: int
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    price_avg: Optional[float] = None
+    price_buckets: List[PriceBucket] = Field(..., description="Непустые ценовые диапазоны по возрастанию цены")
+
+class CategoryFacet(Facet):
+    """Число книг и цены одной категории"""
+    category_id: int
+    title: str
+
+class BookFacets(Facet):
+    """Фасеты списка книг: сводка по всем категориям и по каждой (по убыванию числа книг)"""
+    categories: List[CategoryFacet]
+
+
+# ========== Подсказки (GET /books/suggest) ==========
+
+class BookSuggestion(BaseModel):
+    """Подсказка: книга, чьё название начинается с введённого текста"""
+    id: int
+    title: str
+
+class SuggestResponse(BaseModel):
+    items: List[BookSuggestion] = Field(..., description="Сначала новые книги")
+
+
+# ========== Выборочные поля (sparse fieldsets) ==========
+
+# Поля книги, которые можно запросить параметром fields= (в порядке схемы Book)
+BOOK_FIELDS = tuple(Book.model_fields)
+
+@lru_cache(maxsize=None)
+def book_fields_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Схема книги только с выбранными полями (fields - в порядке BOOK_FIELDS)"""
+    return create_model(
+        "BookFields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (Book.model_fields[name].annotation, Book.model_fields[name]) for name in fields}
+    )
+
+@lru_cache(maxsize=None)
+def book_fields_page_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    return PaginatedResponse[book_fields_model(fields)]
+
+# Книга в ответе с fields=: id есть всегда, остальных полей может не быть (только для схемы OpenAPI)
+BookPartial = create_model(
+    "BookPartial",
+    __doc__="Книга с fields=: только запрошенные поля и id",
+    id=(int, ...),
+    **{
+        name: (Book.model_fields[name].annotation, Field(None, description=Book.model_fields[name].description))
+        for name in BOOK_FIELDS if name != "id"
+    }
+)
+
+class BookResponse(RootModel[Union[Book, BookPartial]]):
+    """Ответ GET /books/{id}: книга целиком, а с fields= - только запрошенные поля"""
+
+class BooksPageResponse(RootModel[Union[PaginatedResponse[Book], PaginatedResponse[BookPartial]]]):
+    """Ответ GET /books: книги целиком, а с fields= - только запрошенные поля"""
@@ -0,0 +1,90 @@
+"""
+Быстрая сериализация списка книг (GET /books без fields).
+
+Страница собирается из кортежей SQL (crud.find_book_rows) сразу в словари в порядке полей
+схемы Book и кодируется orjson, без объектов ORM и без проверки pydantic-моделью ответа.
+JSON побайтно совпадает с ответом через PaginatedResponse[Book] (tests/test_serialization.py,
+на данных каталога - benchmarks/bench_serialization.py),
+схема OpenAPI не меняется: маршрут по-прежнему объявляет response_model.
+Числа с плавающей точкой orjson и json записывают как pydantic только при 1e-4 <= |x| < 1e16
+(иначе 1e16 вместо 1e+16, 1e-05 вместо 1e-5): страницу с такой ценой кодирует pydantic.
+
+orjson - опциональная зависимость: без него используется json из стандартной библиотеки.
+Отключить быстрый путь: FAST_SERIALIZATION=0.
+"""
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Sequence
+
+from fastapi import Response
+
+from app.schemas import Book, PaginatedResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "1").lower() not in ("0", "false", "no")
+
+BOOK_KEYS = ("title", "description", "price", "url", "category_id", "id", "version", "created_at", "updated_at")
+CATEGORY_KEYS = ("title", "id", "version", "created_at", "updated_at")
+# Диапазон |x|, в котором float записывается одинаково orjson, json и pydantic
+FLOAT_PLAIN_RANGE = (1e-4, 1e16)
+
+
+def set_enabled(enabled: bool):
+    """Включить или выключить быстрый путь (для сравнения в бенчмарках)"""
+    global FAST_SERIALIZATION
+    FAST_SERIALIZATION = enabled
+
+
+def _default(value):
+    # Как pydantic: UTC записывается как Z, остальные смещения - как есть
+    if isinstance(value, datetime):
+        if value.utcoffset() is not None and not value.utcoffset():
+            return value.replace(tzinfo=None).isoformat() + "Z"
+        return value.isoformat()
+    # Decimal (Numeric) в полях float pydantic записывает числом
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def dumps(data) -> bytes:
+    """Компактный JSON в UTF-8 - тот же формат, что у model_dump_json (float - в FLOAT_PLAIN_RANGE)"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def book_row_to_dict(row) -> dict:
+    """Строка crud.find_book_rows -> словарь в порядке полей схемы Book"""
+    data = dict(zip(BOOK_KEYS, row))
+    # price - float в схеме; значения из Numeric/целые приводим так же, как pydantic
+    data["price"] = float(data["price"])
+    if row.category__id is None:
+        data["category"] = None
+    else:
+        data["category"] = dict(zip(CATEGORY_KEYS, row[len(BOOK_KEYS):len(BOOK_KEYS) + len(CATEGORY_KEYS)]))
+    return data
+
+
+def _plain_float(value: float) -> bool:
+    low, high = FLOAT_PLAIN_RANGE
+    return value == 0 or low <= abs(value) < high
+
+
+def books_page_body(items: list, limit: int, next_cursor: Optional[str]) -> bytes:
+    """JSON страницы из словарей book_row_to_dict, побайтно как PaginatedResponse[Book]"""
+    page = {"items": items, "limit": limit, "next_cursor": next_cursor}
+    if all(_plain_float(book["price"]) for book in items):
+        return dumps(page)
+    return PaginatedResponse[Book].model_validate(page).model_dump_json().encode("utf-8")
+
+
+def books_page_response(rows: Sequence, limit: int, next_cursor: Optional[str], headers: dict) -> Response:
+    body = books_page_body([book_row_to_dict(row) for row in rows], limit, next_cursor)
+    return Response(body, media_type="application/json", headers=headers)
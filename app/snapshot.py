@@ -0,0 +1,515 @@
+"""
+Снимок каталога в памяти процесса для фильтров и сортировок GET /books.
+
+Колонки книг - массивы NumPy (id, category_id, цена, признак живой строки), упорядоченные по id;
+дополнительно хранится перестановка позиций по (цена, id) - результат argsort цен. Запрос списка
+без search с сортировкой id, newest, price или -price решается векторно: нужный порядок
+просматривается от курсора (и от границы цены) кусками растущей длины, маска фильтров отбирает
+limit + 1 книгу. Из БД затем читаются только строки страницы - по первичному ключу
+(crud.find_books_statement с book_ids), поэтому ответ и курсоры побайтно те же, что у SQL.
+Сортировки по title остаются в SQL: их порядок задаёт правило сравнения строк БД.
+
+Снимок строится при старте в фоне потоковым чтением books и дальше догоняет журнал изменений
+(catalog_version и catalog_deletions, см. crud.get_changes); порядок по цене после изменений
+пересчитывается в фоновом потоке, до тех пор сортировки по цене считаются по маске всех книг.
+Отвечает снимок, только если его версия совпадает с версией каталога, прочитанной запросом;
+иначе запрос идёт в SQL, а снимок догоняет журнал.
+
+Память - около 55 байт на книгу. Включить: CATALOG_SNAPSHOT=1 (нужен пакет numpy).
+"""
+import asyncio
+import contextvars
+import os
+import time
+from functools import reduce
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import models
+from app.db.db import AsyncSessionLocal
+from app.db.pagination import InvalidCursor, decode_cursor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", "0").lower() in ("1", "true", "yes")
+
+# Сортировки, которые решает снимок (title и relevance - только в SQL)
+SNAPSHOT_SORTS = ("id", "newest", "price", "-price")
+# category_id NULL в колонке категорий
+NO_CATEGORY = -1
+# Первый кусок просмотра порядка; каждый следующий вдвое длиннее
+FIRST_CHUNK = 1024
+# Сколько позиций порядка по цене просмотреть до перехода к маске всех книг: при редком фильтре
+# (маленькая категория) чтение вразброс по порядку цен дольше последовательной маски
+PRICE_WALK_LIMIT = 32768
+# Категории фильтра с числом книг не больше этого выбираются по порядку категорий, без просмотра всех книг
+CATEGORY_SELECT_LIMIT = 32768
+
+
+def set_enabled(enabled: bool):
+    """Отвечать из снимка или только из SQL (для сравнения в бенчмарках)"""
+    global CATALOG_SNAPSHOT
+    CATALOG_SNAPSHOT = enabled
+
+
+def _cursor_matches(sort: str, values: list) -> bool:
+    """Курсор от той же сортировки: [id] или [цена, id] (как проверка типов в pagination.paginate)"""
+    if sort in ("id", "newest"):
+        return len(values) == 1
+    return len(values) == 2 and isinstance(values[0], (int, float)) and not isinstance(values[0], bool)
+
+
+def _category_mask(categories, category_ids: Sequence[int]):
+    # Несколько сравнений быстрее np.isin, которому нужна сортировка
+    if len(category_ids) > 16:
+        return np.isin(categories, category_ids)
+    return reduce(np.logical_or, (categories == category_id for category_id in category_ids))
+
+
+async def _books_version(db: AsyncSession) -> int:
+    """Версия списка книг: все записи с версией не больше неё уже закоммичены (см. crud._bump_versions)"""
+    result = await db.execute(
+        select(models.CatalogVersion.version).filter(models.CatalogVersion.name == models.BOOKS_VERSION)
+    )
+    return result.scalar() or 0
+
+
+class CatalogSnapshot:
+    """Колонки книг в массивах NumPy и id страницы по фильтрам и сортировке"""
+
+    def __init__(self):
+        self._size = 0  # занятые позиции колонок (включая удалённые книги)
+        self._dead = 0
+        self._ids = self._categories = self._prices = self._alive = None
+        # Позиция книги в колонках по id (-1 - книги нет)
+        self._positions = None
+        # Позиции по (цена, id) и по (категория, id) и значения в этих порядках; None - порядки устарели
+        self._by_price = self._sorted_prices = None
+        self._by_category = self._sorted_categories = None
+        self._generation = 0  # меняется при каждом изменении колонок, кроме удаления
+        self.ready = False
+        self.version = 0  # версия списка книг, до которой применён журнал изменений
+        self.build_seconds = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._task: Optional[asyncio.Task] = None
+        self._catch_up: Optional[asyncio.Task] = None
+        self._pending = False
+
+    def __len__(self) -> int:
+        return self._size - self._dead
+
+    # ---------- Чтение ----------
+
+    def find_ids(
+        self,
+        version: int,
+        category_ids: Optional[Sequence[int]] = None,
+        price_min: Optional[float] = None,
+        price_max: Optional[float] = None,
+        search: Optional[str] = None,
+        sort: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Optional[List[int]]:
+        """
+        id книг страницы (до limit + 1, в порядке сортировки) для параметров crud.find_books.
+        None - ответить должен SQL: снимок выключен, не построен или отстал от version, либо есть search
+        или сортировка по title.
+        """
+        sort = sort or ("relevance" if search else "id")
+        if not CATALOG_SNAPSHOT or not self.ready or search or sort not in SNAPSHOT_SORTS:
+            return None
+        if version != self.version:
+            self.misses += 1
+            if version > self.version:
+                self.schedule_catch_up()
+            return None
+        self.hits += 1
+
+        after = None
+        if cursor is not None:
+            after = decode_cursor(cursor)
+            if not _cursor_matches(sort, after):
+                raise InvalidCursor("Курсор не подходит к выбранной сортировке")
+        category_ids = list(category_ids) if category_ids else None
+
+        def match(index):
+            conditions = [self._alive[index]]
+            if category_ids:
+                conditions.append(_category_mask(self._categories[index], category_ids))
+            if price_min is not None:
+                conditions.append(self._prices[index] >= price_min)
+            if price_max is not None:
+                conditions.append(self._prices[index] <= price_max)
+            return reduce(np.logical_and, conditions)
+
+        descending = sort in ("newest", "-price")
+        by_price = sort in ("price", "-price")
+        count = limit + 1
+        positions = None
+        if category_ids and self._by_category is not None:
+            # Книги нескольких небольших категорий - отрезки порядка по категориям, их выбирать целиком
+            segments = self._category_segments(category_ids)
+            if sum(len(segment) for segment in segments) <= CATEGORY_SELECT_LIMIT:
+                positions = self._select(np.concatenate(segments), after, by_price, descending, count, match)
+        if positions is None and not by_price:
+            positions = self._walk_by_id(after, descending, count, match)
+        if positions is None and self._by_price is not None:
+            positions = self._walk_by_price(after, price_min, price_max, descending, count, match)
+        if positions is None:
+            positions = self._select(slice(0, self._size), after, by_price, descending, count, match)
+        return self._ids[positions].tolist()
+
+    def _walk(self, order, lo: int, hi: int, descending: bool, count: int, match, limit: Optional[int] = None):
+        """
+        Позиции первых count подходящих книг на отрезке [lo, hi) порядка order (None - порядок id).
+        None - просмотрено больше limit позиций, а книг ещё не хватает.
+        """
+        found = []
+        step = FIRST_CHUNK
+        scanned = 0
+        while lo < hi and count > 0:
+            if limit is not None:
+                if scanned >= limit:
+                    return None
+                step = min(step, limit - scanned)
+            if descending:
+                start, stop = max(lo, hi - step), hi
+                hi = start
+            else:
+                start, stop = lo, min(hi, lo + step)
+                lo = stop
+            index = slice(start, stop) if order is None else order[start:stop]
+            matched = match(index)
+            hits = np.flatnonzero(matched) + start if order is None else index[matched]
+            if descending:
+                hits = hits[::-1]
+            found.append(hits[:count])
+            count -= len(found[-1])
+            scanned += stop - start
+            step *= 2
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def _walk_by_id(self, after, descending: bool, count: int, match):
+        lo, hi = 0, self._size
+        if after is not None:
+            # Колонки упорядочены по id - позиция курсора двоичным поиском
+            if descending:
+                hi = int(np.searchsorted(self._ids[:self._size], after[0], side="left"))
+            else:
+                lo = int(np.searchsorted(self._ids[:self._size], after[0], side="right"))
+        return self._walk(None, lo, hi, descending, count, match)
+
+    def _walk_by_price(self, after, price_min, price_max, descending: bool, count: int, match):
+        prices = self._sorted_prices
+        lo, hi = 0, len(prices)
+        if price_min is not None:
+            lo = int(np.searchsorted(prices, price_min, side="left"))
+        if price_max is not None:
+            hi = int(np.searchsorted(prices, price_max, side="right"))
+        if after is not None:
+            price, book_id = after
+            # Книги с ценой курсора идут по возрастанию id - граница внутри них по id курсора
+            first = int(np.searchsorted(prices, price, side="left"))
+            last = int(np.searchsorted(prices, price, side="right"))
+            tie_ids = self._ids[self._by_price[first:last]]
+            if descending:
+                hi = min(hi, first + int(np.searchsorted(tie_ids, book_id, side="left")))
+            else:
+                lo = max(lo, first + int(np.searchsorted(tie_ids, book_id, side="right")))
+        return self._walk(self._by_price, lo, hi, descending, count, match, PRICE_WALK_LIMIT)
+
+    def _category_segments(self, category_ids: Sequence[int]) -> list:
+        """Позиции книг каждой категории - отрезки порядка по категориям"""
+        # Искомые значения того же типа, что колонка: иначе searchsorted приводит весь массив
+        wanted = np.unique(np.asarray(category_ids, dtype=self._sorted_categories.dtype))
+        starts = self._sorted_categories.searchsorted(wanted, side="left")
+        stops = self._sorted_categories.searchsorted(wanted, side="right")
+        return [self._by_category[start:stop] for start, stop in zip(starts, stops)]
+
+    def _select(self, index, after, by_price: bool, descending: bool, count: int, match):
+        """Маска по позициям index (срез или массив) и выбор count лучших по ключу сортировки (argpartition)"""
+        mask = match(index)
+        if after is not None:
+            ids = self._ids[index]
+            book_id = after[-1]
+            after_id = ids < book_id if descending else ids > book_id
+            if by_price:
+                prices, price = self._prices[index], after[0]
+                after_id = ((prices < price) if descending else (prices > price)) | ((prices == price) & after_id)
+            # Без фильтров mask - представление колонки живых строк: не изменять на месте
+            mask = mask & after_id
+        positions = np.flatnonzero(mask) + index.start if isinstance(index, slice) else index[mask]
+        # Позиции растут вместе с id: сортировка по позиции - это сортировка по id
+        sign = -1 if descending else 1
+        keys = self._prices[positions] * sign if by_price else positions * sign
+        if len(positions) > count:
+            # Все книги с ключом не дальше count-го - включая равные ему, порядок среди них решит id
+            kth = np.partition(keys, count - 1)[count - 1]
+            keep = keys <= kth
+            positions, keys = positions[keep], keys[keep]
+        return positions[np.lexsort((positions * sign, keys))[:count]]
+
+    # ---------- Изменения ----------
+
+    def put(self, book_id: int, category_id: Optional[int], price: float):
+        """Добавить книгу или обновить её колонки"""
+        if not self.ready:
+            return
+        position = self._position(book_id)
+        if position < 0:
+            position = self._slot(book_id)
+        self._categories[position] = NO_CATEGORY if category_id is None else category_id
+        self._prices[position] = price
+        self._orders_changed()
+
+    def remove(self, book_id: int):
+        position = self._position(book_id) if self.ready else -1
+        if position < 0:
+            return
+        # Позиция остаётся в колонках и в порядках, маска живых строк её отбрасывает
+        self._alive[position] = False
+        self._positions[book_id] = -1
+        self._dead += 1
+        if self._dead > 1024 and self._dead * 2 > self._size:
+            self._compact()
+
+    def _position(self, book_id: int) -> int:
+        if book_id >= len(self._positions):
+            return -1
+        return int(self._positions[book_id])
+
+    def _slot(self, book_id: int) -> int:
+        """Позиция для новой книги с сохранением порядка по id"""
+        size = self._size
+        if size and book_id <= self._ids[size - 1]:
+            position = int(np.searchsorted(self._ids[:size], book_id))
+            if self._ids[position] == book_id:
+                # id удалённой книги занят снова (SQLite повторно выдаёт наибольший id)
+                self._dead -= 1
+            else:
+                # id меньше последнего (редко: вставка с явным id) - сдвиг колонок
+                self._set_columns(*(
+                    np.insert(column[:size], position, value) for column, value in (
+                        (self._ids, book_id), (self._categories, NO_CATEGORY), (self._prices, 0), (self._alive, True)
+                    )
+                ))
+        else:
+            if size == len(self._ids):
+                self._grow(max(1024, 2 * size))
+            position = size
+            self._size += 1
+            self._ids[position] = book_id
+            if book_id >= len(self._positions):
+                grown = np.full(max(book_id + 1, 2 * len(self._positions)), -1, dtype=np.int64)
+                grown[:len(self._positions)] = self._positions
+                self._positions = grown
+        self._alive[position] = True
+        self._positions[book_id] = position
+        return position
+
+    def _grow(self, capacity: int):
+        def grown(column):
+            result = np.empty(capacity, dtype=column.dtype)
+            result[:self._size] = column[:self._size]
+            return result
+
+        self._ids, self._categories, self._prices, self._alive = map(
+            grown, (self._ids, self._categories, self._prices, self._alive)
+        )
+
+    def _compact(self):
+        """Убрать удалённые книги из колонок"""
+        alive = self._alive[:self._size]
+        self._set_columns(*(column[:self._size][alive] for column in (self._ids, self._categories, self._prices, alive)))
+
+    def _set_columns(self, ids, categories, prices, alive):
+        self._ids, self._categories, self._prices, self._alive = ids, categories, prices, alive
+        self._size = len(ids)
+        self._dead = self._size - int(np.count_nonzero(alive))
+        self._positions = np.full(int(ids.max(initial=0)) + 1, -1, dtype=np.int64)
+        self._positions[ids[alive]] = np.flatnonzero(alive)
+        self._orders_changed()
+
+    def _orders_changed(self):
+        self._generation += 1
+        self._by_price = self._sorted_prices = None
+        self._by_category = self._sorted_categories = None
+
+    @staticmethod
+    def _sort(prices, categories):
+        # Устойчивая сортировка: равные значения остаются в порядке позиций, то есть по id
+        return np.argsort(prices, kind="stable"), np.argsort(categories, kind="stable")
+
+    def sort_orders(self):
+        """Пересчитать порядки по цене и по категории (блокирует - в приложении sort_orders_async)"""
+        self._install_orders(self._generation, *self._sort(self._prices[:self._size], self._categories[:self._size]))
+
+    async def sort_orders_async(self):
+        """Пересчитать порядки в фоновом потоке (NumPy сортирует, отпустив GIL)"""
+        generation = self._generation
+        prices, categories = self._prices[:self._size].copy(), self._categories[:self._size].copy()
+        self._install_orders(generation, *await asyncio.to_thread(self._sort, prices, categories))
+
+    def _install_orders(self, generation: int, by_price, by_category):
+        # Колонки изменились, пока шла сортировка, - порядки уже неверны
+        if generation == self._generation:
+            self._by_price, self._sorted_prices = by_price, self._prices[by_price]
+            self._by_category, self._sorted_categories = by_category, self._categories[by_category]
+
+    # ---------- Построение и журнал изменений ----------
+
+    def load(self, ids, categories, prices, version: int = 0):
+        """Заменить содержимое снимка колонками книг (порядки по цене и категории не считаются - см. sort_orders)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        self._set_columns(
+            ids[order],
+            np.asarray(categories, dtype=np.int32)[order],
+            np.asarray(prices, dtype=np.float64)[order],
+            np.ones(len(ids), dtype=bool),
+        )
+        self.version = version
+        self.ready = True
+
+    async def build(self, batch_size: int = 50000):
+        """Построить снимок потоковым чтением books, затем догнать изменения, прошедшие за это время"""
+        start = time.perf_counter()
+        ids, categories, prices = [], [], []
+        async with AsyncSessionLocal() as db:
+            # Версия читается до выборки: всё с версией не больше неё выборка уже видит
+            version = await _books_version(db)
+            result = await db.stream(
+                select(models.Book.id, models.Book.category_id, models.Book.price)
+                .execution_options(yield_per=batch_size)
+            )
+            # Каждая пачка сразу в массивы: кортежи всего каталога в памяти не накапливаются
+            try:
+                async for partition in result.partitions():
+                    ids.append(np.fromiter((row[0] for row in partition), np.int64, len(partition)))
+                    categories.append(np.fromiter(
+                        (NO_CATEGORY if row[1] is None else row[1] for row in partition), np.int32, len(partition)
+                    ))
+                    prices.append(np.fromiter((row[2] for row in partition), np.float64, len(partition)))
+            finally:
+                # При отмене (stop) курсор иначе остаётся открытым: в SQLite он держит блокировку чтения
+                await result.close()
+        self.load(*(np.concatenate(chunks) if chunks else [] for chunks in (ids, categories, prices)), version)
+        await self.sort_orders_async()
+        self.build_seconds = time.perf_counter() - start
+        print(f"Снимок каталога построен: {len(self)} книг за {self.build_seconds:.1f} с")
+        self.schedule_catch_up()
+
+    async def catch_up(self):
+        """
+        Применить изменения книг с версией больше self.version (см. crud.get_changes).
+        Как и журнал изменений, читает только изменения не новее версии списка, прочитанной первой:
+        строки и удаления - два запроса с разными снимками, и запись, закоммиченная между ними,
+        иначе попала бы только во второй, а self.version ушла бы дальше неё
+        """
+        async with AsyncSessionLocal() as db:
+            current = await _books_version(db)
+            if current <= self.version:
+                return
+            upserts = await db.execute(
+                select(models.Book.catalog_version, models.Book.id, models.Book.category_id, models.Book.price)
+                .filter(models.Book.catalog_version > self.version, models.Book.catalog_version <= current)
+            )
+            deletions = await db.execute(
+                select(models.CatalogDeletion.version, models.CatalogDeletion.entity_id)
+                .filter(
+                    models.CatalogDeletion.entity == "book",
+                    models.CatalogDeletion.version > self.version,
+                    models.CatalogDeletion.version <= current,
+                )
+            )
+            changes = [tuple(row) for row in upserts.all()]
+            changes += [(version, book_id, None, None) for version, book_id in deletions.all()]
+        for version, book_id, category_id, price in sorted(changes, key=lambda change: change[0]):
+            if price is None:
+                self.remove(book_id)
+            else:
+                self.put(book_id, category_id, price)
+        self.version = current
+
+    def schedule_catch_up(self):
+        """Догнать журнал изменений в фоне; вызовы во время догона объединяются в один следующий"""
+        if not self.ready:
+            return
+        if self._catch_up is not None and not self._catch_up.done():
+            self._pending = True
+            return
+        # Пустой контекст: SQL догона не засчитывается запросу, который его вызвал (X-Query-Count)
+        self._catch_up = asyncio.get_running_loop().create_task(self._run_catch_up(), context=contextvars.Context())
+
+    async def _run_catch_up(self):
+        while True:
+            self._pending = False
+            try:
+                await self.catch_up()
+                if self._by_price is None and not self._pending:
+                    await self.sort_orders_async()
+            except Exception as e:
+                print(f"Снимок каталога не догнал журнал изменений: {e!r}")
+            if not self._pending:
+                return
+
+    async def on_change(self, entity: str, entity_id: Optional[int], action: str):
+        """Подписчик ChangeListener: изменения книг в этом и других воркерах"""
+        if entity == "book":
+            self.schedule_catch_up()
+
+    async def on_flush(self):
+        self.schedule_catch_up()
+
+    async def start(self):
+        if not CATALOG_SNAPSHOT or self._task is not None:
+            return
+        if np is None:
+            print("Снимок каталога выключен: не установлен numpy")
+            return
+        self._task = asyncio.create_task(self._build())
+
+    async def _build(self):
+        try:
+            await self.build()
+        except Exception as e:
+            print(f"Снимок каталога не построен, списки книг читаются из SQL: {e!r}")
+
+    async def stop(self):
+        for task in (self._task, self._catch_up):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._catch_up = None
+
+    def stats(self) -> Dict:
+        memory = 0
+        if self.ready:
+            columns = [self._ids, self._categories, self._prices, self._alive, self._positions]
+            if self._by_price is not None:
+                columns += [self._by_price, self._sorted_prices, self._by_category, self._sorted_categories]
+            memory = sum(column.nbytes for column in columns)
+        return {
+            "enabled": CATALOG_SNAPSHOT,
+            "ready": self.ready,
+            "books": len(self),
+            "version": self.version,
+            "sorted": self._by_price is not None,
+            "build_seconds": round(self.build_seconds, 3),
+            "memory_bytes": memory,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+catalog = CatalogSnapshot()
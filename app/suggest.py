@@ -0,0 +1,361 @@
+"""
+Подсказки по началу названия книги (GET /books/suggest) из индекса в памяти процесса.
+
+Индекс - отсортированный список ключей "нормализованное название \\0 исходное название" в UTF-8
+(порядок байтов UTF-8 совпадает с порядком символов, поэтому префикс строки - префикс байтов)
+и параллельный массив id; книги с названием на префикс - непрерывный диапазон, его границы
+находит bisect. Нормализация - NFKC, casefold (корректно для кириллицы), ё -> е, схлопнутые пробелы.
+Подсказки ранжируются по новизне: сначала книги с большим id. Для префиксов с длинным
+диапазоном первые SUGGEST_MAX_LIMIT id запоминаются и обновляются при записи.
+
+Индекс строится при старте в фоне потоковым чтением books (до готовности подсказки
+ищутся в БД). Дальше его обновляют:
+- create/update/delete книг в app/db/crud.py - сразу после commit (автор сразу видит свою книгу);
+  запись несёт свою версию списка книг, и если это следующая версия после self.version,
+  индекс просто сдвигает версию без запросов к БД;
+- журнал изменений (catalog_version и catalog_deletions, см. crud.get_changes) - в фоне,
+  если версия записи показала пропуск (параллельные записи, изменения категорий), после массовых
+  записей и по событиям воркеров (app/db/notify.py). Журнал упорядочен по commit, поэтому догон
+  исправляет и гонки между записями, и массовые изменения, и потерянные события.
+
+Вставка и удаление одной книги сдвигают отсортированные массивы - O(n) (около 1 ms на 1 млн книг).
+Догон с большим числом изменений (массовая загрузка) пересобирает массивы одним проходом в потоке
+и подменяет их целиком.
+
+Память - около 210 байт на книгу (см. benchmarks/bench_suggest.py). Выключить: SUGGEST_INDEX=0.
+"""
+import asyncio
+import contextvars
+import os
+import re
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import models
+from app.db.db import AsyncSessionLocal
+
+SUGGEST_INDEX = os.getenv("SUGGEST_INDEX", "1").lower() not in ("0", "false", "no")
+SUGGEST_MAX_LIMIT = 20
+# Нормализованное название в ключе обрезается: длиннее подсказки не ищут
+SUGGEST_KEY_CHARS = int(os.getenv("SUGGEST_KEY_CHARS", "64"))
+# Диапазоны длиннее этого не перебираются на каждый запрос - их первые id запоминаются
+TOP_CACHE_MIN_RANGE = 256
+TOP_CACHE_SIZE = 50000
+# С этого числа изменений догон пересобирает массивы целиком, а не вставляет по одной книге
+BATCH_MIN_CHANGES = 1000
+
+_SEPARATOR = b"\x00"
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Ключ сравнения: регистр, ё/е, юникодные варианты символов и пробелы не важны"""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+    return _SPACES.sub(" ", text).strip()
+
+
+def _key(title: str) -> bytes:
+    return normalize(title)[:SUGGEST_KEY_CHARS].encode("utf-8") + _SEPARATOR + title.encode("utf-8")
+
+
+async def _books_version(db: AsyncSession) -> int:
+    """Версия списка книг: все записи с версией не больше неё уже закоммичены (см. crud._bump_versions)"""
+    result = await db.execute(
+        select(models.CatalogVersion.version).filter(models.CatalogVersion.name == models.BOOKS_VERSION)
+    )
+    return result.scalar() or 0
+
+
+def _arrays(rows: List[Tuple[bytes, int]]) -> Tuple[List[bytes], array, Dict[int, bytes]]:
+    """Массивы индекса из отсортированных пар (ключ, id)"""
+    keys = [key for key, _ in rows]
+    ids = array("q", (book_id for _, book_id in rows))
+    return keys, ids, {book_id: key for key, book_id in rows}
+
+
+def _merge(keys: List[bytes], ids: array, titles: Dict[int, Optional[str]]):
+    """
+    Массивы индекса после пачки изменений: неизменённые книги одним проходом сливаются с новыми
+    ключами (Timsort сливает два отсортированных куска за линейное время). Выполняется в потоке
+    """
+    rows = [(key, book_id) for key, book_id in zip(keys, ids) if book_id not in titles]
+    rows += sorted((_key(title), book_id) for book_id, title in titles.items() if title is not None)
+    rows.sort()
+    return _arrays(rows)
+
+
+class SuggestIndex:
+    """Префиксный индекс названий книг (отсортированный массив + bisect)"""
+
+    def __init__(self):
+        self._keys: List[bytes] = []
+        self._ids = array("q")
+        # Ключ книги по id: словарь, а не список по id - id бывают редкими и большими
+        self._by_id: Dict[int, bytes] = {}
+        # Префикс -> первые SUGGEST_MAX_LIMIT id по убыванию (для длинных диапазонов)
+        self._top: "OrderedDict[bytes, List[int]]" = OrderedDict()
+        self.ready = False
+        self.version = 0  # версия списка книг, до которой применён журнал изменений
+        self.build_seconds = 0.0
+        self.lookups = 0
+        self._task: Optional[asyncio.Task] = None
+        self._catch_up: Optional[asyncio.Task] = None
+        self._pending = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # ---------- Чтение ----------
+
+    def suggest(self, query: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """До limit книг (id, название), чьё нормализованное название начинается с query"""
+        self.lookups += 1
+        prefix = normalize(query)[:SUGGEST_KEY_CHARS].encode("utf-8")
+        if not prefix:
+            return []
+        ids = self._top_ids(prefix)[:limit]
+        return [(book_id, self._title(book_id)) for book_id in ids]
+
+    def _range(self, prefix: bytes) -> Tuple[int, int]:
+        # 0xff не встречается в UTF-8 - все ключи с префиксом меньше prefix + 0xff
+        return bisect_left(self._keys, prefix), bisect_left(self._keys, prefix + b"\xff")
+
+    def _top_ids(self, prefix: bytes) -> List[int]:
+        cached = self._top.get(prefix)
+        if cached is not None:
+            self._top.move_to_end(prefix)
+            return cached
+        lo, hi = self._range(prefix)
+        ids = sorted(self._ids[lo:hi], reverse=True)[:SUGGEST_MAX_LIMIT]
+        if hi - lo >= TOP_CACHE_MIN_RANGE:
+            self._top[prefix] = ids
+            if len(self._top) > TOP_CACHE_SIZE:
+                self._top.popitem(last=False)
+        return ids
+
+    def _title(self, book_id: int) -> str:
+        return self._by_id[book_id].partition(_SEPARATOR)[2].decode("utf-8")
+
+    # ---------- Изменения ----------
+
+    def on_book_saved(self, book_id: int, title: str, version: int):
+        """Книга создана или изменена записью с версией списка version (вызывает crud после commit)"""
+        if version < self.version:
+            return  # догон уже применил состояние книги не старше этого
+        self.put(book_id, title)
+        self._advance(version)
+
+    def on_book_deleted(self, book_id: int, version: int):
+        if version < self.version:
+            return
+        self.remove(book_id)
+        self._advance(version)
+
+    def _advance(self, version: int):
+        """Запись применена: без пропуска версий индекс актуален на её версию, иначе - догнать журнал"""
+        if not self.ready:
+            return  # build прочитает версию сам и догонит журнал
+        if version == self.version + 1:
+            self.version = version
+        elif version > self.version:
+            self.schedule_catch_up()
+
+    def put(self, book_id: int, title: str):
+        """
+        Добавить книгу или сменить её название (повторный вызов с тем же названием ничего не меняет).
+        list.insert сдвигает хвост массива - O(n); много изменений сразу применяет apply
+        """
+        if not self.ready:
+            return
+        key = _key(title)
+        if self._by_id.get(book_id) == key:
+            return
+        self.remove(book_id)
+        position = bisect_left(self._keys, key)
+        self._keys.insert(position, key)
+        self._ids.insert(position, book_id)
+        self._by_id[book_id] = key
+        for prefix in self._cached_prefixes(key):
+            top = self._top[prefix]
+            if len(top) < SUGGEST_MAX_LIMIT or book_id > top[-1]:
+                # top по убыванию - вставляем в отрицательных значениях
+                negated = [-i for i in top]
+                insort(negated, -book_id)
+                self._top[prefix] = [-i for i in negated[:SUGGEST_MAX_LIMIT]]
+
+    def remove(self, book_id: int):
+        if not self.ready or book_id not in self._by_id:
+            return
+        key = self._by_id.pop(book_id)
+        position = bisect_left(self._keys, key)
+        while self._ids[position] != book_id:
+            position += 1  # одинаковые названия - рядом, ключ книги в индексе есть всегда
+        del self._keys[position]
+        del self._ids[position]
+        for prefix in self._cached_prefixes(key):
+            if book_id in self._top[prefix]:
+                # Следующую по новизне книгу не знаем - диапазон пересчитается при запросе
+                del self._top[prefix]
+
+    async def apply(self, titles: Dict[int, Optional[str]]):
+        """
+        Применить пачку изменений {id: название или None - книга удалена}.
+        Большую пачку сливает с индексом поток по копии массивов, затем массивы подменяются:
+        put/remove, сделанные тем временем, теряются - догон в этом случае повторяется (см. catch_up)
+        """
+        if not self.ready:
+            return
+        if len(titles) < BATCH_MIN_CHANGES:
+            for book_id, title in titles.items():
+                if title is None:
+                    self.remove(book_id)
+                else:
+                    self.put(book_id, title)
+            return
+        # Копии - миллисекунды; слияние и сортировка - секунды, их цикл событий не ждёт
+        keys, ids, by_id = await asyncio.to_thread(_merge, list(self._keys), array("q", self._ids), titles)
+        self._keys, self._ids, self._by_id = keys, ids, by_id
+        self._top.clear()
+
+    def _cached_prefixes(self, key: bytes) -> Iterable[bytes]:
+        normalized = key.partition(_SEPARATOR)[0]
+        return [
+            normalized[:end] for end in range(1, len(normalized) + 1) if normalized[:end] in self._top
+        ]
+
+    # ---------- Построение и журнал изменений ----------
+
+    def load(self, books: Iterable[Tuple[int, str]], version: int = 0):
+        """Заменить содержимое индекса книгами (id, название)"""
+        self._keys, self._ids, self._by_id = _arrays(sorted((_key(title), book_id) for book_id, title in books))
+        self._top.clear()
+        self.version = version
+        self.ready = True
+
+    async def build(self, batch_size: int = 20000):
+        """Построить индекс потоковым чтением books, затем догнать изменения, прошедшие за это время"""
+        start = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            # Версия читается до выборки: всё с версией не больше неё выборка уже видит
+            version = await _books_version(db)
+            books = []
+            result = await db.stream(
+                select(models.Book.id, models.Book.title).execution_options(yield_per=batch_size)
+            )
+            try:
+                async for partition in result.partitions():
+                    books += partition
+            finally:
+                # При отмене (stop) курсор иначе остаётся открытым: в SQLite он держит блокировку чтения
+                await result.close()
+        # Сортировка миллиона ключей - секунды: в потоке, чтобы не останавливать обработку запросов
+        await asyncio.to_thread(self.load, books, version)
+        self.build_seconds = time.perf_counter() - start
+        print(f"Индекс подсказок построен: {len(self)} книг за {self.build_seconds:.1f} с")
+        self.schedule_catch_up()
+
+    async def catch_up(self):
+        """
+        Применить изменения книг с версией больше self.version (см. crud.get_changes).
+        Читаются только изменения не новее версии списка, прочитанной первой: строки и удаления -
+        два запроса с разными снимками, и запись, закоммиченная между ними, иначе была бы пропущена
+        """
+        since = self.version
+        async with AsyncSessionLocal() as db:
+            current = await _books_version(db)
+            if current <= since:
+                return
+            upserts = await db.execute(
+                select(models.Book.catalog_version, models.Book.id, models.Book.title)
+                .filter(models.Book.catalog_version > since, models.Book.catalog_version <= current)
+            )
+            deletions = await db.execute(
+                select(models.CatalogDeletion.version, models.CatalogDeletion.entity_id)
+                .filter(
+                    models.CatalogDeletion.entity == "book",
+                    models.CatalogDeletion.version > since,
+                    models.CatalogDeletion.version <= current,
+                )
+            )
+            changes = [(version, book_id, title) for version, book_id, title in upserts.all()]
+            changes += [(version, book_id, None) for version, book_id in deletions.all()]
+        # Последнее состояние каждой книги (None - удалена)
+        titles: Dict[int, Optional[str]] = {}
+        for version, book_id, title in sorted(changes, key=lambda change: change[0]):
+            titles[book_id] = title
+        await self.apply(titles)
+        if self.version != since:
+            # Пока шли запросы и слияние, on_book_saved применил более новые записи - прочитанные
+            # строки или подмена массивов могли их перезаписать; следующий догон применит их снова
+            self._pending = True
+        self.version = current
+
+    def schedule_catch_up(self):
+        """Догнать журнал изменений в фоне; вызовы во время догона объединяются в один следующий"""
+        if not self.ready:
+            return
+        if self._catch_up is not None and not self._catch_up.done():
+            self._pending = True
+            return
+        # Пустой контекст: SQL догона не засчитывается запросу, который его вызвал (X-Query-Count)
+        self._catch_up = asyncio.get_running_loop().create_task(self._run_catch_up(), context=contextvars.Context())
+
+    async def _run_catch_up(self):
+        while True:
+            self._pending = False
+            try:
+                await self.catch_up()
+            except Exception as e:
+                print(f"Индекс подсказок не догнал журнал изменений: {e!r}")
+            if not self._pending:
+                return
+
+    async def on_change(self, entity: str, entity_id: Optional[int], action: str):
+        """Подписчик ChangeListener: изменения книг в других воркерах"""
+        if entity == "book":
+            self.schedule_catch_up()
+
+    async def on_flush(self):
+        # События могли потеряться, но журнал изменений в БД полон - достаточно догнать его
+        self.schedule_catch_up()
+
+    async def start(self):
+        if SUGGEST_INDEX and self._task is None:
+            self._task = asyncio.create_task(self._build())
+
+    async def _build(self):
+        try:
+            await self.build()
+        except Exception as e:
+            print(f"Индекс подсказок не построен, подсказки ищутся в БД: {e!r}")
+
+    async def stop(self):
+        for task in (self._task, self._catch_up):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._catch_up = None
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": SUGGEST_INDEX,
+            "ready": self.ready,
+            "books": len(self),
+            "version": self.version,
+            "build_seconds": round(self.build_seconds, 3),
+            "cached_prefixes": len(self._top),
+            "lookups": self.lookups,
+        }
+
+
+index = SuggestIndex()
@@ -0,0 +1,165 @@
+"""
+Допуск запросов к БД (app/admission.py) под перегрузкой: задержка с допуском и без.
+
+Сначала измеряется, сколько чтений (поиск GET /books?search=) в секунду сервер обслуживает, затем
+чтения приходят вдвое чаще (--overload), не дожидаясь ответов на прежние, рядом - записи (PATCH /books/{id})
+и проба GET /health каждые 100 мс. Один и тот же прогон выполняется без допуска и с ним
+(ADMISSION_CONTROL переключается на лету, сервер тот же). Задержка считается по всем ответам, включая 503:
+без допуска запросы копятся в очереди пула и задержка растёт со временем, с допуском лишние быстро
+получают 503, а допущенные укладываются в ADMISSION_QUEUE_TIMEOUT_MS плюс время обработки.
+Код 1, если при допуске health или запись получили 503 или у 503 нет Retry-After.
+
+Запуск (пул поменьше, чтобы перегрузку было легко создать):
+    DB_POOL_SIZE=5 DB_MAX_OVERFLOW=0 DB_POOL_TIMEOUT=5 python -m benchmarks.bench_admission --seed 100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+from sqlalchemy import func, select
+
+from app import admission
+from app.db import models
+from app.db.db import DB_POOL_CAPACITY, SessionLocal, upgrade_schema
+from app.main import app
+from benchmarks.common import percentile, run_server
+from benchmarks.data import VOCABULARY, count_books, seed_books
+
+
+def timings(results: list) -> dict:
+    latencies = [latency * 1000 for latency, _ in results]
+    shed = [status for _, status in results if status == 503]
+    return {
+        "requests": len(results),
+        "ok": sum(1 for _, status in results if status < 500),
+        "shed": len(shed),
+        "other_errors": sum(1 for _, status in results if status >= 500 and status != 503),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies, default=0.0), 2),
+    }
+
+
+async def overload(base_url: str, rate: float, write_rate: float, duration: float, book_ids: tuple) -> dict:
+    """
+    Открытая нагрузка: чтения и записи приходят с заданной частотой, не дожидаясь ответов на прежние
+    (как независимые пользователи), поэтому при частоте выше пропускной способности очередь растёт
+    """
+    results = {"read": [], "write": [], "health": []}
+    missing_retry_after = 0
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=1000)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        tasks = []
+
+        async def call(kind: str, request):
+            nonlocal missing_retry_after
+            start = time.perf_counter()
+            try:
+                response = await request
+                status = response.status_code
+                if status == 503 and kind != "health" and "Retry-After" not in response.headers:
+                    missing_retry_after += 1
+            except httpx.HTTPError:
+                status = 599
+            results[kind].append((time.perf_counter() - start, status))
+
+        async def arrivals(kind: str, per_second: float, make_request, seed: int):
+            rng = random.Random(seed)
+            sent = 0
+            while time.perf_counter() < deadline:
+                tasks.append(asyncio.create_task(call(kind, make_request(rng))))
+                sent += 1
+                await asyncio.sleep(max(started + sent / per_second - time.perf_counter(), 0))
+
+        def read(rng):
+            return client.get("/books/", params={"search": rng.choice(VOCABULARY), "limit": 20})
+
+        def write(rng):
+            return client.patch(f"/books/{rng.randint(*book_ids)}", json={"price": rng.randint(100, 5000)})
+
+        def health(rng):
+            return client.get("/health")
+
+        await asyncio.gather(
+            arrivals("read", rate, read, 1), arrivals("write", write_rate, write, 2), arrivals("health", 10, health, 3)
+        )
+        await asyncio.gather(*tasks)
+    summary = {kind: timings(values) for kind, values in results.items()}
+    summary["missing_retry_after"] = missing_retry_after
+    return summary
+
+
+def throughput(base_url: str, seconds: float = 5.0) -> float:
+    """Сколько чтений в секунду сервер обслуживает при 20 клиентах без очереди"""
+    async def run():
+        served = 0
+        deadline = time.perf_counter() + seconds
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            async def worker(n: int):
+                nonlocal served
+                rng = random.Random(n)
+                while time.perf_counter() < deadline:
+                    response = await client.get("/books/", params={"search": rng.choice(VOCABULARY), "limit": 20})
+                    served += response.status_code < 500
+            await asyncio.gather(*(worker(n) for n in range(20)))
+        return served / seconds
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--overload", type=float, default=2.0,
+                        help="Частота чтений - во столько раз выше измеренной пропускной способности")
+    parser.add_argument("--write-rate", type=float, default=5.0, help="Записей в секунду")
+    parser.add_argument("--duration", type=float, default=15.0, help="Секунд на один прогон")
+    args = parser.parse_args()
+
+    upgrade_schema()
+    if args.seed:
+        seed_books(args.seed)
+    print(f"Книг в таблице: {count_books()}, ёмкость пула: {DB_POOL_CAPACITY}")
+    with SessionLocal() as db:
+        book_ids = db.execute(select(func.min(models.Book.id), func.max(models.Book.id))).one()
+
+    results = {}
+    with run_server(app) as base_url:
+        capacity = throughput(base_url)
+        rate = round(capacity * args.overload, 1)
+        results["throughput_rps"] = round(capacity, 1)
+        results["read_rate"] = rate
+        print(f"Пропускная способность: {capacity:.1f} чтений/с, нагрузка: {rate} чтений/с и {args.write_rate} записей/с")
+        for mode in ("off", "on"):
+            admission.set_enabled(mode == "on")
+            results[mode] = asyncio.run(overload(base_url, rate, args.write_rate, args.duration, book_ids))
+            for kind in ("read", "write", "health"):
+                stats = results[mode][kind]
+                print(f"admission={mode:3} {kind:6} ok={stats['ok']:<6} 503={stats['shed']:<6} "
+                      f"p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms")
+        results["admission_stats"] = httpx.get(f"{base_url}/admission/stats").json()
+    admission.set_enabled(False)
+
+    on = results["on"]
+    problems = []
+    if on["health"]["shed"] or on["health"]["other_errors"]:
+        problems.append("health отвечал ошибкой при допуске")
+    if on["write"]["shed"]:
+        problems.append("записи получили 503 при допуске")
+    if on["missing_retry_after"]:
+        problems.append("503 без Retry-After")
+    results["contract_ok"] = not problems
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Сравнение синхронного и асинхронного пути к БД.
+
+Один и тот же запрос (страница книг) обслуживается двумя обработчиками:
+- /sync/books  - обычный def + SessionLocal (выполняется в пуле потоков)
+- /async/books - async def + AsyncSession
+
+Запуск (БД должна быть заполнена, см. app/init_db.py):
+    python -m benchmarks.bench_async --duration 10 --concurrency 50 200 1000
+"""
+import argparse
+import json
+
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import crud, sync_crud
+from app.db.db import get_db, get_sync_db
+from app.schemas import Book
+from benchmarks.common import run_load, run_server
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/sync/books", response_model=list[Book])
+def sync_books(limit: int = 20, db: Session = Depends(get_sync_db)):
+    return sync_crud.get_books(db, limit=limit)
+
+
+@bench_app.get("/async/books", response_model=list[Book])
+async def async_books(limit: int = 20, db: AsyncSession = Depends(get_db)):
+    items, _ = await crud.get_books(db, limit=limit)
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд на один замер")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--limit", type=int, default=20, help="Размер страницы")
+    args = parser.parse_args()
+
+    results = []
+    with run_server(bench_app) as base_url:
+        for path in ("/sync/books", "/async/books"):
+            for concurrency in args.concurrency:
+                async def make_request(client, i, path=path):
+                    return await client.get(path, params={"limit": args.limit})
+
+                stats = run_load(base_url, make_request, concurrency, args.duration)
+                stats.update(path=path, concurrency=concurrency)
+                results.append(stats)
+                print(f"{path:14} c={concurrency:<5} rps={stats['rps']:<9} "
+                      f"p99={stats['p99_ms']}ms errors={stats['errors']}")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
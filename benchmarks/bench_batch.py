@@ -0,0 +1,103 @@
+"""
+Пакетное чтение: 50 запросов GET /books/{id} против одного GET /books/batch (и POST /books/batch).
+
+Каждый раунд берёт случайные ID и замеряет время до получения всех книг и число SQL-запросов
+(заголовок X-Query-Count). Замер идёт с холодным кэшем (сбрасывается перед раундом) и с тёплым.
+
+Запуск:
+    python -m benchmarks.bench_batch --seed 100000 --ids 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+from sqlalchemy import func, select
+
+from app.cache import cache
+from app.db import models
+from app.db.db import SessionLocal, upgrade_schema
+from app.main import app
+from benchmarks.common import percentile, run_server
+from benchmarks.data import count_books, seed_catalog
+
+
+def single(client: httpx.Client, ids) -> int:
+    queries = 0
+    for book_id in ids:
+        response = client.get(f"/books/{book_id}")
+        response.raise_for_status()
+        queries += int(response.headers["x-query-count"])
+    return queries
+
+
+def batch_get(client: httpx.Client, ids) -> int:
+    response = client.get("/books/batch", params={"ids": ids})
+    response.raise_for_status()
+    return int(response.headers["x-query-count"])
+
+
+def batch_post(client: httpx.Client, ids) -> int:
+    response = client.post("/books/batch", json={"ids": ids})
+    response.raise_for_status()
+    return int(response.headers["x-query-count"])
+
+
+MODES = {"single": single, "batch_get": batch_get, "batch_post": batch_post}
+
+
+def measure(base_url: str, id_sets, warm: bool) -> dict:
+    results = {}
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        for name, run in MODES.items():
+            latencies, queries = [], []
+            for ids in id_sets:
+                if warm:
+                    run(client, ids)
+                else:
+                    # Кэш в памяти сервера (тот же процесс); для Redis сбрасывается общий кэш
+                    asyncio.run(cache.clear())
+                start = time.perf_counter()
+                queries.append(run(client, ids))
+                latencies.append((time.perf_counter() - start) * 1000)
+            results[name] = {
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p95_ms": round(percentile(latencies, 95), 2),
+                "sql_queries": round(sum(queries) / len(queries), 1),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--ids", type=int, default=50, help="Книг в одном раунде")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    upgrade_schema()
+    if args.seed:
+        seed_catalog(args.seed, categories=100)
+    with SessionLocal() as db:
+        low, high = db.execute(select(func.min(models.Book.id), func.max(models.Book.id))).one()
+    if low is None:
+        raise SystemExit("Каталог пуст - сначала заполните его: --seed или python -m benchmarks.generate")
+    print(f"Книг в таблице: {count_books()}")
+
+    rng = random.Random(0)
+    id_sets = [[rng.randint(low, high) for _ in range(args.ids)] for _ in range(args.rounds)]
+    results = {}
+    with run_server(app) as base_url:
+        results["cold"] = measure(base_url, id_sets, warm=False)
+        results["warm"] = measure(base_url, id_sets, warm=True)
+
+    for cache_state, stats in results.items():
+        for name, mode in stats.items():
+            print(f"{cache_state:5} {name:11} p50={mode['p50_ms']}ms p95={mode['p95_ms']}ms SQL={mode['sql_queries']}")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Журнал изменений (GET /books/changes): сколько байт и времени стоит синхронизация каталога.
+
+Сравниваются:
+- full - клиент заново выкачивает весь GET /books постранично (как индексатор по расписанию);
+- changes - после --updates изменений и --deletes удалений клиент забирает только
+  GET /books/changes?since=<курсор прошлой синхронизации>.
+Проверяется, что в журнал попали все изменённые и удалённые книги, иначе выход с кодом 1.
+
+Запуск:
+    python -m benchmarks.bench_changes --seed 100000 --updates 100 --deletes 10
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import httpx
+
+from app.db.db import upgrade_schema
+from app.main import app
+from benchmarks.common import run_server
+from benchmarks.data import count_books, seed_catalog
+
+
+def pull(client: httpx.Client, path: str, params: dict, cursor_param: str, done) -> dict:
+    """Пройти все страницы; done(body) - последняя ли страница"""
+    pages = size = 0
+    items = []
+    start = time.perf_counter()
+    while True:
+        response = client.get(path, params=params)
+        response.raise_for_status()
+        body = response.json()
+        pages += 1
+        size += len(response.content)
+        items += body["items"] if "items" in body else body["changes"]
+        if done(body):
+            break
+        params = {**params, cursor_param: body["next_cursor"]}
+    return {
+        "pages": pages,
+        "bytes": size,
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+        "items": items,
+        "next_cursor": body.get("next_cursor"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--updates", type=int, default=100, help="Изменить столько книг между синхронизациями")
+    parser.add_argument("--deletes", type=int, default=10, help="Удалить столько книг между синхронизациями")
+    args = parser.parse_args()
+
+    upgrade_schema()
+    if args.seed:
+        seed_catalog(args.seed, categories=100)
+    print(f"Книг в таблице: {count_books()}")
+
+    with run_server(app) as base_url, httpx.Client(base_url=base_url, timeout=120) as client:
+        # Первая синхронизация: весь журнал - курсор для следующих
+        initial = pull(client, "/books/changes", {"limit": 5000}, "since", lambda body: not body["has_more"])
+        book_ids = [change["id"] for change in initial["items"] if change["op"] == "upsert"]
+        if len(book_ids) < args.updates + args.deletes:
+            raise SystemExit("Каталог слишком мал - сначала заполните его: --seed или python -m benchmarks.generate")
+        full = pull(client, "/books/", {"limit": 1000}, "cursor", lambda body: body["next_cursor"] is None)
+
+        rng = random.Random(0)
+        chosen = rng.sample(book_ids, args.updates + args.deletes)
+        updated, deleted = set(chosen[:args.updates]), set(chosen[args.updates:])
+        for book_id in updated:
+            client.patch(f"/books/{book_id}", json={"price": rng.randint(100, 5000)}).raise_for_status()
+        for book_id in deleted:
+            client.delete(f"/books/{book_id}").raise_for_status()
+
+        changes = pull(
+            client, "/books/changes", {"limit": 5000, "since": initial["next_cursor"]}, "since",
+            lambda body: not body["has_more"]
+        )
+        steady = pull(
+            client, "/books/changes", {"since": changes["next_cursor"]}, "since", lambda body: not body["has_more"]
+        )
+
+    seen_updated = {change["id"] for change in changes["items"] if change["op"] == "upsert"}
+    seen_deleted = {change["id"] for change in changes["items"] if change["op"] == "delete"}
+    results = {
+        name: {key: value for key, value in stats.items() if key not in ("items", "next_cursor")}
+        for name, stats in (("initial", initial), ("full", full), ("changes", changes), ("steady", steady))
+    }
+    results["contract_ok"] = seen_updated == updated and seen_deleted == deleted and not steady["items"]
+    for name in ("full", "changes", "steady"):
+        stats = results[name]
+        print(f"{name:8} {stats['bytes']:>12} байт  {stats['pages']:>4} запросов  {stats['ms']} ms")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if not results["contract_ok"]:
+        print("В журнале не те изменения: "
+              f"изменены {len(seen_updated)}/{len(updated)}, удалены {len(seen_deleted)}/{len(deleted)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
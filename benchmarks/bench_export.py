@@ -0,0 +1,71 @@
+"""
+Скорость и память потоковой выгрузки GET /books/export.
+
+Сервер запускается в этом же процессе, поэтому пиковый RSS процесса
+показывает и расход памяти на выгрузку. Клиент читает ответ потоком и только считает строки.
+
+Запуск:
+    python -m benchmarks.bench_export --seed 5000000 --formats ndjson csv parquet
+"""
+import argparse
+import json
+import resource
+import time
+
+import httpx
+
+from app.main import app
+from benchmarks.common import run_server
+from benchmarks.data import count_books, seed_books
+
+
+def peak_rss_mb() -> float:
+    # В Linux ru_maxrss - в килобайтах
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def export(base_url: str, fmt: str, batch_size: int) -> dict:
+    rows = 0
+    size = 0
+    start = time.perf_counter()
+    with httpx.stream(
+        "GET", f"{base_url}/books/export",
+        params={"format": fmt, "batch_size": batch_size}, timeout=None
+    ) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            size += len(chunk)
+            rows += chunk.count(b"\n")
+    elapsed = time.perf_counter() - start
+    return {
+        "format": fmt,
+        # Для parquet число строк по переводам строк не считается
+        "rows": rows if fmt != "parquet" else None,
+        "mb": round(size / 1024 / 1024, 1),
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(count_books() / elapsed),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--formats", nargs="+", default=["ndjson", "csv"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_books(args.seed)
+    print(f"Книг в таблице: {count_books()}, RSS до выгрузки: {peak_rss_mb()} МБ")
+
+    results = []
+    with run_server(app) as base_url:
+        for fmt in args.formats:
+            results.append(export(base_url, fmt, args.batch_size))
+            print(results[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Фасеты и статистика категорий: счётчики category_stats против подсчёта по книгам.
+
+GET /books/facets без фильтров по цене читает счётчики (O(категорий)); с price_min=0 тот же
+ответ строится группировкой всех книг (O(книг)). Замеряются оба пути и GET /categories/stats;
+ответы обоих путей фасетов сравниваются - при расхождении выход с кодом 1.
+
+Запуск:
+    python -m benchmarks.bench_facets --seed 1000000 --categories 5000
+"""
+import argparse
+import json
+import sys
+import time
+
+import httpx
+
+from app.db.db import upgrade_schema
+from app.main import app
+from benchmarks.common import percentile, run_server
+from benchmarks.data import count_books, seed_catalog
+
+ROUTES = {
+    "facets_counters": ("/books/facets", {}),
+    "facets_scan": ("/books/facets", {"price_min": 0}),
+    "category_stats": ("/categories/stats", {"limit": 1000}),
+}
+
+
+def measure(client: httpx.Client, path: str, params: dict, rounds: int) -> dict:
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = client.get(path, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return {
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "bytes": len(response.content),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--categories", type=int, default=100, help="Категорий при --seed")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    upgrade_schema()
+    if args.seed:
+        seed_catalog(args.seed, categories=args.categories)
+    print(f"Книг в таблице: {count_books()}")
+
+    results = {}
+    with run_server(app) as base_url, httpx.Client(base_url=base_url, timeout=120) as client:
+        counters = client.get("/books/facets").json()
+        scan = client.get("/books/facets", params={"price_min": 0}).json()
+        for name, (path, params) in ROUTES.items():
+            results[name] = measure(client, path, params, args.rounds)
+            stats = results[name]
+            print(f"{name:16} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms {stats['bytes']} байт")
+
+    # Суммы цен накапливаются триггерами в другом порядке - средние сравниваются с допуском
+    def normalized(facets):
+        return json.loads(json.dumps(facets), parse_float=lambda value: round(float(value), 1))
+
+    results["contract_ok"] = normalized(counters) == normalized(scan)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if not results["contract_ok"]:
+        print("Фасеты из счётчиков не совпали с подсчётом по книгам")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Размер ответа и время сериализации страницы из 1000 книг: все поля против fields=.
+
+Для каждого набора полей замеряются:
+- время запроса к БД (crud.find_books) и сериализации страницы в JSON - в этом процессе
+- размер тела и задержка GET /books через HTTP
+
+Запуск (описания книг по ~20 слов, см. benchmarks/data.py):
+    python -m benchmarks.bench_fields --seed 100000 --limit 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.db import crud
+from app.db.db import AsyncSessionLocal, async_engine, upgrade_schema
+from app.main import app
+from app.schemas import Book, PaginatedResponse, book_fields_page_model
+from benchmarks.common import percentile, run_server
+from benchmarks.data import count_books, seed_catalog
+
+FIELD_SETS = {
+    "all": None,
+    "id,title,price": ("title", "price", "id"),
+    "id,title,price,category": ("title", "price", "id", "category"),
+}
+
+
+async def measure_local(fields, limit: int, repeat: int) -> dict:
+    page_model = PaginatedResponse[Book] if fields is None else book_fields_page_model(fields)
+    query_ms, serialize_ms, size = [], [], 0
+    async with AsyncSessionLocal() as db:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            books, next_cursor = await crud.find_books(db, limit=limit, fields=fields)
+            query_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            body = page_model.model_validate(
+                {"items": books, "limit": limit, "next_cursor": next_cursor}, from_attributes=True
+            ).model_dump_json()
+            serialize_ms.append((time.perf_counter() - start) * 1000)
+            size = len(body)
+            db.expunge_all()
+    await async_engine.dispose()
+    return {
+        "query_p50_ms": round(percentile(query_ms, 50), 2),
+        "serialize_p50_ms": round(percentile(serialize_ms, 50), 2),
+        "json_bytes": size,
+    }
+
+
+def measure_http(base_url: str, fields: str, limit: int, repeat: int) -> dict:
+    params = {"limit": limit}
+    if fields != "all":
+        params["fields"] = fields
+    latencies, size = [], 0
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get("/books/", params=params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+            size = len(response.content)
+    return {"http_p50_ms": round(percentile(latencies, 50), 2), "wire_bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--limit", type=int, default=1000, help="Размер страницы")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    upgrade_schema()
+    if args.seed:
+        seed_catalog(args.seed, categories=100)
+    print(f"Книг в таблице: {count_books()}")
+
+    results = {}
+    for name, fields in FIELD_SETS.items():
+        results[name] = asyncio.run(measure_local(fields, args.limit, args.repeat))
+    with run_server(app) as base_url:
+        for name in FIELD_SETS:
+            results[name].update(measure_http(base_url, name, args.limit, args.repeat))
+
+    for name, stats in results.items():
+        print(f"{name:26} {stats['wire_bytes'] / 1024:8.1f} КБ  запрос={stats['query_p50_ms']}ms "
+              f"сериализация={stats['serialize_p50_ms']}ms  HTTP={stats['http_p50_ms']}ms")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Планы и задержка типичных сочетаний фильтров и сортировок GET /books (crud.find_books).
+
+Для каждого сочетания печатается, использует ли план индекс (а не полный просмотр books),
+и p50/p95 задержки. Если хоть одно сочетание читает всю таблицу, скрипт завершается с кодом 1.
+
+Запуск (большой каталог, см. benchmarks/generate.py):
+    python -m benchmarks.bench_filters --seed 1000000 --categories 5000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from sqlalchemy import select, text
+
+from app.db import crud, models
+from app.db.db import AsyncSessionLocal, SessionLocal, async_engine, upgrade_schema
+from benchmarks.common import percentile
+from benchmarks.data import count_books, seed_catalog
+
+
+def combinations(rng: random.Random, category_ids) -> dict:
+    """Сочетание -> функция, возвращающая параметры find_books (каждый вызов - новые значения)"""
+    def category():
+        return [rng.choice(category_ids)]
+
+    def price_range():
+        low = rng.uniform(100, 4000)
+        return low, low + 200
+
+    return {
+        "all": lambda: {},
+        "newest": lambda: {"sort": "newest"},
+        "price": lambda: {"sort": "price"},
+        "-price": lambda: {"sort": "-price"},
+        "title": lambda: {"sort": "title"},
+        "price_range": lambda: dict(zip(("price_min", "price_max"), price_range()), sort="price"),
+        "category": lambda: {"category_ids": category()},
+        "category_newest": lambda: {"category_ids": category(), "sort": "newest"},
+        "category_price": lambda: {"category_ids": category(), "sort": "price"},
+        "category_price_range": lambda: dict(
+            zip(("price_min", "price_max"), price_range()), category_ids=category(), sort="-price"
+        ),
+        "categories": lambda: {"category_ids": rng.sample(category_ids, min(3, len(category_ids)))},
+        "search": lambda: {"search": "python"},
+        "search_category_price": lambda: {"search": "python", "category_ids": category(), "price_max": 2500},
+    }
+
+
+def explain(db, stmt) -> str:
+    if db.bind.dialect.name == "postgresql":
+        # Параметры передаются драйверу как есть: у regconfig ('russian') нет literal-рендера
+        compiled = stmt.compile(db.bind, compile_kwargs={"render_postcompile": True})
+        rows = db.connection().exec_driver_sql("EXPLAIN " + str(compiled), compiled.params).all()
+    else:
+        sql = str(stmt.compile(db.bind, compile_kwargs={"literal_binds": True}))
+        rows = db.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def full_scan(plan: str, filtered: bool) -> bool:
+    """План читает books целиком (без индекса)"""
+    for line in plan.splitlines():
+        line = line.strip()
+        if "Seq Scan on books" in line:
+            return True
+        # SQLite: SCAN books без фильтров и без сортировки во временном дереве - это проход
+        # по rowid (id), который останавливается после LIMIT строк
+        if line == "SCAN books" and (filtered or "TEMP B-TREE" in plan):
+            return True
+    return False
+
+
+async def measure(params_list, limit: int) -> list:
+    latencies = []
+    async with AsyncSessionLocal() as db:
+        for params in params_list:
+            start = time.perf_counter()
+            await crud.find_books(db, limit=limit, **params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            db.expunge_all()
+    # Соединения пула привязаны к циклу событий, а каждый замер идёт в своём asyncio.run
+    await async_engine.dispose()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--categories", type=int, default=1000, help="Категорий для --seed")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50, help="Запросов на каждое сочетание")
+    args = parser.parse_args()
+
+    upgrade_schema()
+    if args.seed:
+        seed_catalog(args.seed, args.categories)
+    with SessionLocal() as db:
+        if db.bind.dialect.name == "postgresql":
+            db.execute(text("ANALYZE books"))
+            db.commit()
+        category_ids = list(db.execute(select(models.Category.id)).scalars())
+        dialect = db.bind.dialect.name
+        print(f"БД: {dialect}, книг: {count_books()}, категорий: {len(category_ids)}")
+
+        rng = random.Random(0)
+        results = {}
+        for name, make_params in combinations(rng, category_ids).items():
+            params = make_params()
+            stmt, _ = crud.find_books_statement(dialect, limit=args.limit, **params)
+            plan = explain(db, stmt)
+            filtered = any(key != "sort" for key in params)
+            latencies = asyncio.run(measure([make_params() for _ in range(args.repeat)], args.limit))
+            results[name] = {
+                "index": not full_scan(plan, filtered),
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p95_ms": round(percentile(latencies, 95), 3),
+                "plan": plan,
+            }
+            print(f"{name:22} {'индекс' if results[name]['index'] else 'ПОЛНЫЙ ПРОСМОТР':16} "
+                  f"p50={results[name]['p50_ms']}ms p95={results[name]['p95_ms']}ms")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if not all(result["index"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
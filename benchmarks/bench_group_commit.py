@@ -0,0 +1,54 @@
+"""
+Групповой commit (app/db/group_commit.py): создания книг в секунду и добавленная задержка.
+
+Для каждого уровня параллельности POST /books прогоняется с выключенным и включённым
+групповым commit; печатаются созданий/с, p50/p99 и разница p50 (цена окна ожидания пачки).
+
+Запуск:
+    python -m benchmarks.bench_group_commit --concurrency 1 10 50 200 --duration 10
+    GROUP_COMMIT_WINDOW_MS=2 GROUP_COMMIT_MAX_ROWS=200 python -m benchmarks.bench_group_commit
+"""
+import argparse
+import json
+
+from sqlalchemy import select
+
+from app.db import group_commit, models
+from app.db.db import SessionLocal, upgrade_schema
+from app.main import app
+from benchmarks.common import run_load, run_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд на один замер")
+    args = parser.parse_args()
+
+    upgrade_schema()
+    with SessionLocal() as db:
+        category_ids = list(db.execute(select(models.Category.id).limit(100)).scalars())
+
+    async def make_request(client, i):
+        category_id = category_ids[i % len(category_ids)] if category_ids else None
+        return await client.post("/books/", json={"title": f"Групповая {i}", "price": 100, "category_id": category_id})
+
+    results = {}
+    with run_server(app) as base_url:
+        for concurrency in args.concurrency:
+            results[concurrency] = {}
+            for mode, enabled in (("single", False), ("group", True)):
+                group_commit.set_enabled(enabled)
+                results[concurrency][mode] = run_load(base_url, make_request, concurrency, args.duration)
+            single, group = results[concurrency]["single"], results[concurrency]["group"]
+            print(f"{concurrency:5} клиентов: {single['rps']:>8} -> {group['rps']:<8} созданий/с  "
+                  f"p50 {single['p50_ms']} -> {group['p50_ms']} ms ({group['p50_ms'] - single['p50_ms']:+.2f})  "
+                  f"p99 {single['p99_ms']} -> {group['p99_ms']} ms")
+    group_commit.set_enabled(False)
+    print(f"Окно {group_commit.GROUP_COMMIT_WINDOW_MS} мс, до {group_commit.GROUP_COMMIT_MAX_ROWS} книг; "
+          f"пачек: {group_commit.group_commit.batches}, книг: {group_commit.group_commit.rows}")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Планы и задержка запросов по категории до и после индексов по category_id (миграции 0002, 0003).
+
+Схема откатывается до 0001 (без индексов по category_id), замеряются запросы,
+затем применяются остальные миграции и замер повторяется. Для каждого запроса печатается план
+(EXPLAIN в PostgreSQL, EXPLAIN QUERY PLAN в SQLite) и p50/p95 задержки.
+
+Запуск (каталог в тысячах категорий, см. benchmarks/generate.py):
+    python -m benchmarks.bench_indexes --seed 1000000 --categories 5000
+"""
+import argparse
+import json
+import random
+import time
+
+from sqlalchemy import func, select, text
+
+from app.db import models
+from app.db.db import SessionLocal, downgrade_schema, upgrade_schema
+from benchmarks.common import percentile
+from benchmarks.data import count_books, seed_catalog
+
+Book = models.Book
+
+
+def queries(category_id: int, limit: int) -> dict:
+    """Запросы, которым нужны индексы (category_id, id) и (category_id, price, id)"""
+    return {
+        # get_books_by_category: страница книг категории по порядку id
+        "books_by_category": select(Book.id, Book.title).where(Book.category_id == category_id)
+        .order_by(Book.id).limit(limit),
+        # Самые дешёвые книги категории
+        "category_by_price": select(Book.id, Book.price).where(Book.category_id == category_id)
+        .order_by(Book.price, Book.id).limit(limit),
+        # Проверка перед удалением категории (count_books_by_category)
+        "count_by_category": select(func.count()).select_from(Book).where(Book.category_id == category_id),
+    }
+
+
+def explain(db, stmt) -> str:
+    sql = str(stmt.compile(db.bind, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN " if db.bind.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+    rows = db.execute(text(prefix + sql)).all()
+    # В SQLite план - в последней колонке, в PostgreSQL - единственная колонка
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def measure(category_ids, limit: int, repeat: int) -> dict:
+    results = {}
+    with SessionLocal() as db:
+        if db.bind.dialect.name == "postgresql":
+            # Свежая статистика, чтобы планировщик видел реальный размер таблицы
+            db.execute(text("ANALYZE books"))
+            db.commit()
+        plans = queries(category_ids[0], limit)
+        for name in plans:
+            latencies = []
+            for i in range(repeat):
+                stmt = queries(category_ids[i % len(category_ids)], limit)[name]
+                start = time.perf_counter()
+                db.execute(stmt).all()
+                latencies.append((time.perf_counter() - start) * 1000)
+            results[name] = {
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p95_ms": round(percentile(latencies, 95), 3),
+                "plan": explain(db, plans[name]),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--categories", type=int, default=1000, help="Категорий для --seed")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200, help="Запросов на каждый замер")
+    args = parser.parse_args()
+
+    upgrade_schema()
+    if args.seed:
+        seed_catalog(args.seed, args.categories)
+    with SessionLocal() as db:
+        ids = list(db.execute(select(models.Category.id)).scalars())
+    category_ids = random.Random(0).sample(ids, min(len(ids), args.repeat))
+    print(f"Книг: {count_books()}, категорий: {len(ids)}")
+
+    downgrade_schema("0001")
+    try:
+        before = measure(category_ids, args.limit, args.repeat)
+    finally:
+        upgrade_schema()
+    after = measure(category_ids, args.limit, args.repeat)
+
+    for name in before:
+        print(f"\n{name}: p50 {before[name]['p50_ms']} -> {after[name]['p50_ms']} мс, "
+              f"p95 {before[name]['p95_ms']} -> {after[name]['p95_ms']} мс")
+        print("  до:    " + before[name]["plan"].replace("\n", "\n         "))
+        print("  после: " + after[name]["plan"].replace("\n", "\n         "))
+    print(json.dumps({"before": before, "after": after}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
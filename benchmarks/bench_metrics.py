@@ -0,0 +1,70 @@
+"""
+Накладные расходы на сбор метрик (app/metrics.py).
+
+Одна и та же смесь запросов (страница книг, книга по id, health) прогоняется
+с выключенным и включённым сбором метрик несколько раз попеременно,
+чтобы дрейф нагрузки машины не попал в разницу. Цель - не больше нескольких процентов.
+
+Запуск (БД должна быть заполнена, см. app/init_db.py или --seed):
+    python -m benchmarks.bench_metrics --duration 10 --concurrency 50 --rounds 3
+"""
+import argparse
+import json
+import statistics
+
+from app import metrics
+from app.main import app
+from benchmarks.common import run_load, run_server
+from benchmarks.data import seed_books
+
+
+async def make_request(client, i):
+    kind = i % 4
+    if kind == 0:
+        return await client.get("/books/", params={"limit": 20})
+    if kind == 3:
+        return await client.get("/health")
+    return await client.get(f"/books/{i % 100 + 1}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд на один замер")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3, help="Сколько пар замеров выкл/вкл")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_books(args.seed)
+
+    runs = {"off": [], "on": []}
+    with run_server(app) as base_url:
+        # Прогрев: пул соединений, кэш, JIT-ы драйверов
+        run_load(base_url, make_request, args.concurrency, min(args.duration, 2.0))
+        for _ in range(args.rounds):
+            for mode in ("off", "on"):
+                metrics.set_enabled(mode == "on")
+                stats = run_load(base_url, make_request, args.concurrency, args.duration)
+                stats["metrics"] = mode
+                runs[mode].append(stats)
+                print(f"metrics={mode:3} rps={stats['rps']:<9} p50={stats['p50_ms']}ms "
+                      f"p99={stats['p99_ms']}ms errors={stats['errors']}")
+    metrics.set_enabled(True)
+
+    rps_off = statistics.median(run["rps"] for run in runs["off"])
+    rps_on = statistics.median(run["rps"] for run in runs["on"])
+    p50_off = statistics.median(run["p50_ms"] for run in runs["off"])
+    p50_on = statistics.median(run["p50_ms"] for run in runs["on"])
+    summary = {
+        "rps_off": rps_off,
+        "rps_on": rps_on,
+        "rps_overhead_pct": round((rps_off - rps_on) / rps_off * 100, 2) if rps_off else None,
+        "p50_overhead_pct": round((p50_on - p50_off) / p50_off * 100, 2) if p50_off else None,
+        "runs": runs["off"] + runs["on"],
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Задержка страницы N: keyset-пагинация (курсор) против OFFSET/LIMIT.
+
+Курсор для страницы N строится напрямую из id последней книги предыдущей страницы,
+поэтому не нужно проходить все страницы по очереди.
+
+Запуск:
+    python -m benchmarks.bench_pagination --seed 1000000 --pages 1 10 100 1000 10000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import select
+
+from app.db import crud, models
+from app.db.db import AsyncSessionLocal, async_engine
+from app.db.pagination import encode_cursor
+from benchmarks.common import percentile
+from benchmarks.data import seed_books
+
+
+async def measure(pages, limit: int, repeat: int) -> list:
+    results = []
+    async with AsyncSessionLocal() as db:
+        for page in pages:
+            offset = (page - 1) * limit
+            # id последней книги предыдущей страницы -> курсор страницы N
+            last_id = (await db.execute(
+                select(models.Book.id).order_by(models.Book.id).offset(offset - 1).limit(1)
+            )).scalar() if offset else None
+            cursor = encode_cursor([last_id]) if last_id is not None else None
+
+            keyset, plain = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                await crud.get_books(db, limit=limit, cursor=cursor)
+                keyset.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                await db.execute(select(models.Book).order_by(models.Book.id).offset(offset).limit(limit))
+                plain.append((time.perf_counter() - start) * 1000)
+                db.expunge_all()
+
+            results.append({
+                "page": page,
+                "keyset_p50_ms": round(percentile(keyset, 50), 2),
+                "keyset_p99_ms": round(percentile(keyset, 99), 2),
+                "offset_p50_ms": round(percentile(plain, 50), 2),
+                "offset_p99_ms": round(percentile(plain, 99), 2),
+            })
+            print(results[-1])
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_books(args.seed)
+    results = asyncio.run(measure(args.pages, args.limit, args.repeat))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Задержка поиска GET /books?search= в зависимости от размера каталога.
+
+Каталог наращивается до каждого из размеров --sizes, после чего замеряется
+crud.search_books на наборе типичных запросов (целые слова, префиксы, два слова).
+
+Запуск:
+    python -m benchmarks.bench_search --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.db import crud
+from app.db.db import AsyncSessionLocal, async_engine, upgrade_schema
+from benchmarks.common import percentile
+from benchmarks.data import count_books, seed_books
+
+QUERIES = ["python", "алгор", "война мир", "архитектура сервер", "kot", "эконом"]
+
+
+async def measure(repeat: int, limit: int) -> dict:
+    latencies = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(repeat):
+            for query in QUERIES:
+                start = time.perf_counter()
+                await crud.search_books(db, search_term=query, limit=limit)
+                latencies.append((time.perf_counter() - start) * 1000)
+                db.expunge_all()
+    return {
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def run(sizes, repeat: int, limit: int) -> list:
+    upgrade_schema()
+    results = []
+    for size in sizes:
+        missing = size - count_books()
+        if missing > 0:
+            seed_books(missing, seed=size)
+        stats = await measure(repeat, limit)
+        stats["books"] = count_books()
+        results.append(stats)
+        print(stats)
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sizes, args.repeat, args.limit))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
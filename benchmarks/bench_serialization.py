@@ -0,0 +1,138 @@
+"""
+Быстрая сериализация GET /books (app/serialization.py) против ORM + pydantic.
+
+1. Контракт: для набора фильтров и сортировок ответ GET /books с быстрым путём и без него
+   должен совпадать побайтно (и ETag тоже). При расхождении скрипт завершается с кодом 1.
+2. Пропускная способность: строк в секунду на одно ядро (по процессорному времени процесса)
+   - только сериализация страницы и запрос + сериализация.
+
+Запуск:
+    python -m benchmarks.bench_serialization --seed 100000 --limit 1000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+from sqlalchemy import select
+
+from app import serialization
+from app.db import crud, models
+from app.db.db import AsyncSessionLocal, SessionLocal, async_engine, upgrade_schema
+from app.db.pagination import encode_cursor
+from app.main import app
+from app.schemas import Book, PaginatedResponse
+from benchmarks.common import run_server
+from benchmarks.data import count_books, seed_catalog
+
+
+def contract_params(category_ids, middle_id: int, limit: int) -> dict:
+    return {
+        "all": {"limit": limit},
+        "page": {"limit": limit, "cursor": encode_cursor([middle_id])},
+        "category": {"limit": limit, "category_id": category_ids[:1]},
+        "categories_newest": {"limit": limit, "category_id": category_ids[:3], "sort": "newest"},
+        "price_range": {"limit": limit, "price_min": 500, "price_max": 1500, "sort": "price"},
+        "-price": {"limit": limit, "sort": "-price"},
+        "title": {"limit": limit, "sort": "title"},
+        "-title": {"limit": limit, "sort": "-title"},
+        "search": {"limit": limit, "search": "python"},
+        "search_price": {"limit": limit, "search": "python", "sort": "price", "price_max": 3000},
+        "empty": {"limit": limit, "price_min": 10 ** 9},
+    }
+
+
+def check_contract(base_url: str, params: dict) -> list:
+    """Имена сочетаний, на которых быстрый путь отличается от pydantic"""
+    mismatches = []
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        for name, query in params.items():
+            responses = []
+            for enabled in (False, True):
+                serialization.set_enabled(enabled)
+                response = client.get("/books/", params=query)
+                response.raise_for_status()
+                responses.append(response)
+            slow, fast = responses
+            same = slow.content == fast.content and slow.headers["etag"] == fast.headers["etag"]
+            items = len(fast.json()["items"])
+            print(f"{name:18} {items:5} книг  {'совпадает' if same else 'РАСХОЖДЕНИЕ'}")
+            if not same:
+                mismatches.append(name)
+    serialization.set_enabled(True)
+    return mismatches
+
+
+async def measure(limit: int, repeat: int) -> dict:
+    """Строк в секунду на ядро: ORM + PaginatedResponse[Book] против кортежей + orjson"""
+    page_model = PaginatedResponse[Book]
+    cpu = {"orm_query": 0.0, "orm_serialize": 0.0, "rows_query": 0.0, "rows_serialize": 0.0}
+    rows_total = 0
+    async with AsyncSessionLocal() as db:
+        for _ in range(repeat):
+            start = time.process_time()
+            books, next_cursor = await crud.find_books(db, limit=limit)
+            cpu["orm_query"] += time.process_time() - start
+            start = time.process_time()
+            page_model.model_validate(
+                {"items": books, "limit": limit, "next_cursor": next_cursor}, from_attributes=True
+            ).model_dump_json()
+            cpu["orm_serialize"] += time.process_time() - start
+            db.expunge_all()
+
+            start = time.process_time()
+            rows, next_cursor = await crud.find_book_rows(db, limit=limit)
+            cpu["rows_query"] += time.process_time() - start
+            start = time.process_time()
+            serialization.books_page_response(rows, limit, next_cursor, {})
+            cpu["rows_serialize"] += time.process_time() - start
+            rows_total += len(rows)
+    await async_engine.dispose()
+
+    def rate(seconds: float) -> int:
+        return round(rows_total / seconds) if seconds else 0
+
+    return {
+        "rows": rows_total,
+        "orm_serialize_rows_per_cpu_s": rate(cpu["orm_serialize"]),
+        "fast_serialize_rows_per_cpu_s": rate(cpu["rows_serialize"]),
+        "orm_total_rows_per_cpu_s": rate(cpu["orm_query"] + cpu["orm_serialize"]),
+        "fast_total_rows_per_cpu_s": rate(cpu["rows_query"] + cpu["rows_serialize"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--limit", type=int, default=1000, help="Размер страницы")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    upgrade_schema()
+    if args.seed:
+        seed_catalog(args.seed, categories=100)
+    with SessionLocal() as db:
+        category_ids = list(db.execute(select(models.Category.id).limit(3)).scalars())
+        book_ids = list(db.execute(select(models.Book.id).order_by(models.Book.id)).scalars())
+    if not book_ids:
+        raise SystemExit("Каталог пуст - сначала заполните его: --seed или python -m benchmarks.generate")
+    print(f"Книг в таблице: {count_books()}, кодировщик: {'orjson' if serialization.orjson else 'json'}")
+
+    with run_server(app) as base_url:
+        mismatches = check_contract(base_url, contract_params(category_ids, book_ids[len(book_ids) // 2], args.limit))
+
+    results = asyncio.run(measure(args.limit, args.repeat))
+    print(f"Сериализация:        {results['orm_serialize_rows_per_cpu_s']:>9} -> "
+          f"{results['fast_serialize_rows_per_cpu_s']} строк/с на ядро")
+    print(f"Запрос+сериализация: {results['orm_total_rows_per_cpu_s']:>9} -> "
+          f"{results['fast_total_rows_per_cpu_s']} строк/с на ядро")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if mismatches:
+        print(f"Ответы расходятся: {', '.join(mismatches)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Снимок каталога (app/snapshot.py) против SQL: задержка GET /books с фильтрами и сортировками.
+
+Для каждого сочетания фильтров страница запрашивается со снимком и без него (CATALOG_SNAPSHOT
+переключается на лету, сервер тот же); категории и курсоры выбираются случайно, одинаково для
+обоих путей. Первые страницы обоих путей сравниваются побайтно - при расхождении выход с кодом 1.
+
+Запуск:
+    python -m benchmarks.bench_snapshot --seed 1000000 --categories 5000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import httpx
+from sqlalchemy import select
+
+from app import snapshot
+from app.db import models
+from app.db.db import SessionLocal, upgrade_schema
+from app.main import app
+from benchmarks.common import percentile, run_server
+from benchmarks.data import count_books, seed_catalog
+
+# Сочетания фильтров и сортировок GET /books; "category" - одна или три случайные категории
+SHAPES = {
+    "category_price": {"category": 1, "sort": "price"},
+    "category_newest": {"category": 1, "sort": "newest"},
+    "categories_-price": {"category": 3, "sort": "-price"},
+    "price_range_newest": {"price_min": 500, "price_max": 700, "sort": "newest"},
+    "category_price_range": {"category": 1, "price_min": 1000, "price_max": 3000, "sort": "price"},
+    "all_-price": {"sort": "-price"},
+    "all_id": {},
+}
+
+
+def make_params(shape: dict, rng: random.Random, category_ids: list) -> dict:
+    params = {key: value for key, value in shape.items() if key != "category"}
+    if shape.get("category"):
+        params["category_id"] = rng.sample(category_ids, shape["category"])
+    return params
+
+
+def fetch(client: httpx.Client, params: dict, enabled: bool) -> httpx.Response:
+    snapshot.set_enabled(enabled)
+    response = client.get("/books/", params=params)
+    response.raise_for_status()
+    return response
+
+
+def measure(client: httpx.Client, requests: list, enabled: bool) -> dict:
+    latencies = []
+    for params in requests:
+        start = time.perf_counter()
+        response = fetch(client, params, enabled)
+        latencies.append((time.perf_counter() - start) * 1000)
+    expected = "snapshot" if enabled else "database"
+    return {
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "source_ok": response.headers.get("X-Books-Source") == expected,
+    }
+
+
+def wait_ready(client: httpx.Client, timeout: float = 600) -> dict:
+    """Дождаться снимка с порядками и индекса подсказок: его построение при старте занимает цикл событий"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        stats = client.get("/snapshot/stats").json()
+        suggest = client.get("/suggest/stats").json()
+        if stats["ready"] and stats["sorted"] and (suggest["ready"] or not suggest["enabled"]):
+            return stats
+        time.sleep(0.5)
+    raise SystemExit("Снимок каталога не построился (установлен ли numpy?)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--categories", type=int, default=100, help="Категорий при --seed")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    upgrade_schema()
+    if args.seed:
+        seed_catalog(args.seed, categories=args.categories)
+    print(f"Книг в таблице: {count_books()}")
+    with SessionLocal() as db:
+        category_ids = list(db.execute(select(models.Category.id)).scalars())
+
+    results = {}
+    mismatches = []
+    # Снимок строится при старте приложения, только если включён
+    snapshot.set_enabled(True)
+    with run_server(app) as base_url, httpx.Client(base_url=base_url, timeout=120) as client:
+        stats = wait_ready(client)
+        results["snapshot"] = {
+            "books": stats["books"],
+            "build_seconds": stats["build_seconds"],
+            "memory_mb": round(stats["memory_bytes"] / 2**20, 1),
+        }
+        print(f"Снимок: {stats['books']} книг за {stats['build_seconds']} с, {results['snapshot']['memory_mb']} МБ")
+        for name, shape in SHAPES.items():
+            rng = random.Random(name)
+            requests = []
+            for _ in range(args.rounds):
+                params = {**make_params(shape, rng, category_ids), "limit": args.limit}
+                if rng.random() < 0.5:
+                    # Следующая страница - с курсором первой
+                    next_cursor = fetch(client, params, False).json()["next_cursor"]
+                    if next_cursor:
+                        params["cursor"] = next_cursor
+                requests.append(params)
+            for params in requests[:10]:
+                if fetch(client, params, True).content != fetch(client, params, False).content:
+                    mismatches.append(name)
+            results[name] = {"sql": measure(client, requests, False), "snapshot": measure(client, requests, True)}
+            sql, columnar = results[name]["sql"], results[name]["snapshot"]
+            print(f"{name:22} SQL p50={sql['p50_ms']}ms p99={sql['p99_ms']}ms  "
+                  f"снимок p50={columnar['p50_ms']}ms p99={columnar['p99_ms']}ms")
+    snapshot.set_enabled(False)
+
+    sources_ok = all(results[name][path]["source_ok"] for name in SHAPES for path in ("sql", "snapshot"))
+    results["contract_ok"] = not mismatches and sources_ok
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if mismatches:
+        print(f"Ответы снимка и SQL расходятся: {', '.join(sorted(set(mismatches)))}")
+    if not sources_ok:
+        print("Не тот источник страницы в X-Books-Source")
+    if not results["contract_ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
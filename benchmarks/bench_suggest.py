@@ -0,0 +1,110 @@
+"""
+Индекс подсказок (app/suggest.py): время построения, память и задержка подсказки на N названиях.
+
+Названия генерируются так же, как в benchmarks/data.py (без БД). Замеряются:
+- время построения индекса и память, которую он занимает (tracemalloc);
+- p50/p99/max подсказки для префиксов из 1-6 символов реальных названий: первый запрос
+  префикса (cold) и повторный (warm);
+- p50/p99 изменения названия и удаления (put/remove).
+Проверяется, что подсказки совпадают с перебором всех названий, иначе выход с кодом 1.
+
+Запуск:
+    python -m benchmarks.bench_suggest --titles 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from app.suggest import SuggestIndex, normalize
+from benchmarks.common import percentile
+from benchmarks.data import random_text
+
+
+def timings(latencies) -> dict:
+    return {
+        "p50_us": round(percentile(latencies, 50), 1),
+        "p99_us": round(percentile(latencies, 99), 1),
+        "max_us": round(max(latencies), 1),
+    }
+
+
+def timed(call, arguments) -> list:
+    latencies = []
+    for args in arguments:
+        start = time.perf_counter()
+        call(*args)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titles", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    titles = [f"{random_text(rng, 3).capitalize()} {i}" for i in range(args.titles)]
+
+    index = SuggestIndex()
+    start = time.perf_counter()
+    index.load(enumerate(titles, start=1))
+    build_seconds = time.perf_counter() - start
+
+    # Память - отдельным построением: tracemalloc замедляет выделения в разы
+    gc.collect()
+    tracemalloc.start()
+    traced = SuggestIndex()
+    traced.load(enumerate(titles, start=1))
+    gc.collect()
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced
+    print(f"Построение: {build_seconds:.1f} с, память индекса {memory / 2**20:.0f} МБ "
+          f"({memory / args.titles:.0f} байт на название), пик {peak / 2**20:.0f} МБ")
+
+    queries = []
+    for _ in range(args.queries):
+        title = rng.choice(titles)
+        queries.append((title[:rng.randint(1, 6)].swapcase(), args.limit))
+    results = {
+        "titles": args.titles,
+        "build_seconds": round(build_seconds, 2),
+        "memory_mb": round(memory / 2**20, 1),
+        "bytes_per_title": round(memory / args.titles),
+        "cold": timings(timed(index.suggest, queries)),
+        "warm": timings(timed(index.suggest, queries)),
+    }
+
+    book_ids = [(rng.randint(1, args.titles),) for _ in range(2000)]
+    renames = [(book_id, f"{random_text(rng, 3)} {book_id}") for (book_id,) in book_ids]
+    results["put"] = timings(timed(index.put, renames))
+    results["remove"] = timings(timed(index.remove, book_ids))
+    for (book_id,) in book_ids:
+        titles[book_id - 1] = None
+    for name in ("cold", "warm", "put", "remove"):
+        stats = results[name]
+        print(f"{name:6} p50={stats['p50_us']}us p99={stats['p99_us']}us max={stats['max_us']}us")
+
+    # Сверка с перебором на части запросов (после изменений и удалений)
+    normalized = [(normalize(title), book_id) for book_id, title in enumerate(titles, start=1) if title is not None]
+    mismatches = 0
+    for query, limit in queries[:200]:
+        prefix = normalize(query)
+        expected = sorted((book_id for title, book_id in normalized if title.startswith(prefix)), reverse=True)[:limit]
+        if [book_id for book_id, _ in index.suggest(query, limit)] != expected:
+            mismatches += 1
+    results["contract_ok"] = mismatches == 0
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if mismatches:
+        print(f"Подсказки не совпали с перебором в {mismatches} запросах")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Потолок скорости записей из-за строки catalog_versions (crud._bump_versions).
+
+Каждая запись книги первой командой транзакции поднимает версию списка в одной строке catalog_versions
+и держит её блокировку до commit: так версии выдаются в порядке commit, и на этом держится курсор
+журнала изменений. Поэтому записи разных книг выполняются друг за другом, а не параллельно.
+Бенчмарк сравнивает две транзакции на разных книгах при нескольких уровнях параллельности:
+- row_only - UPDATE одной книги и COMMIT (без версии списка; так писали бы без журнала изменений);
+- with_version - UPDATE catalog_versions ... RETURNING, UPDATE книги с catalog_version и COMMIT (как crud).
+Отношение with_version к row_only при росте параллельности - цена единого порядка commit.
+
+Запуск (БД должна быть заполнена):
+    python -m benchmarks.bench_version_row --concurrency 1 4 16 64 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import select, update
+
+from app.db import models
+from app.db.db import AsyncSessionLocal, SessionLocal, async_engine
+from benchmarks.common import summarize
+
+
+async def _write(book_id: int, price: float, with_version: bool):
+    async with AsyncSessionLocal() as db:
+        values = {"price": price}
+        if with_version:
+            result = await db.execute(
+                update(models.CatalogVersion)
+                .where(models.CatalogVersion.name == models.BOOKS_VERSION)
+                .values(version=models.CatalogVersion.version + 1)
+                .returning(models.CatalogVersion.version)
+            )
+            values["catalog_version"] = result.scalar()
+        await db.execute(
+            update(models.Book).where(models.Book.id == book_id).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+
+async def _run(book_ids: list, concurrency: int, duration: float, with_version: bool) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int):
+        nonlocal errors
+        # У каждого клиента свои книги: конфликтов по строкам books нет
+        own = book_ids[n::concurrency]
+        i = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await _write(own[i % len(own)], 100 + i % 900, with_version)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                print(f"Ошибка записи: {e!r}")
+            i += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await async_engine.dispose()
+    return summarize(latencies, errors, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд на один замер")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        book_ids = list(db.execute(select(models.Book.id).order_by(models.Book.id).limit(10000)).scalars())
+    if len(book_ids) < max(args.concurrency):
+        raise SystemExit("Книг меньше, чем клиентов - сначала заполните каталог: python -m benchmarks.generate")
+
+    results = {}
+    for concurrency in args.concurrency:
+        results[concurrency] = {}
+        for mode in ("row_only", "with_version"):
+            stats = asyncio.run(_run(book_ids, concurrency, args.duration, mode == "with_version"))
+            results[concurrency][mode] = stats
+            print(f"clients={concurrency:<4} {mode:12} {stats['rps']:>8} записей/с  "
+                  f"p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms errors={stats['errors']}")
+        row_only, with_version = results[concurrency]["row_only"]["rps"], results[concurrency]["with_version"]["rps"]
+        results[concurrency]["ratio"] = round(with_version / row_only, 2) if row_only else None
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Пропускная способность записей книг (записей/с) и число SQL-запросов на одну запись.
+
+Запись книги - один INSERT/UPDATE/DELETE ... RETURNING (см. crud.update_book):
+существование, If-Match и категория проверяются тем же запросом.
+Операции: PUT и PATCH цены, PUT с If-Match, смена категории, создание и удаление книг.
+
+Запуск (БД должна быть заполнена):
+    python -m benchmarks.bench_writes --seed 10000 --duration 10 --concurrency 20
+"""
+import argparse
+import json
+
+from sqlalchemy import func, select
+
+from app.db import models
+from app.db.db import SessionLocal
+from app.main import app
+from benchmarks.common import run_load, run_server
+from benchmarks.data import count_books, seed_catalog
+
+
+def make_operations(book_ids, category_ids) -> dict:
+    created = []
+
+    def book_id(i):
+        return book_ids[i % len(book_ids)]
+
+    async def put(client, i):
+        return await client.put(f"/books/{book_id(i)}", json={"price": 100 + i % 900})
+
+    async def patch(client, i):
+        return await client.patch(f"/books/{book_id(i)}", json={"price": 100 + i % 900, "url": None})
+
+    async def put_if_match(client, i):
+        # ETag "b<id>.*" не совпадёт - проверяется путь 412 (один UPDATE и одна проверка существования)
+        return await client.put(f"/books/{book_id(i)}", json={"price": 1}, headers={"If-Match": '"b0.0.-"'})
+
+    async def move(client, i):
+        return await client.put(f"/books/{book_id(i)}", json={"category_id": category_ids[i % len(category_ids)]})
+
+    async def create_delete(client, i):
+        if i % 2 or not created:
+            response = await client.post("/books/", json={"title": f"Запись {i}", "price": 100, "category_id": category_ids[0]})
+            if response.status_code == 201:
+                created.append(response.json()["id"])
+            return response
+        return await client.delete(f"/books/{created.pop()}")
+
+    return {"put": put, "patch": patch, "put_if_match": put_if_match, "move": move, "create_delete": create_delete}
+
+
+def measure(base_url: str, operation, concurrency: int, duration: float) -> dict:
+    queries = []
+
+    async def make_request(client, i):
+        response = await operation(client, i)
+        queries.append(int(response.headers.get("x-query-count", 0)))
+        return response
+
+    stats = run_load(base_url, make_request, concurrency, duration)
+    stats["sql_per_request"] = round(sum(queries) / len(queries), 2) if queries else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Сначала добавить N синтетических книг")
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд на одну операцию")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_catalog(args.seed, categories=100)
+    with SessionLocal() as db:
+        book_ids = list(db.execute(select(models.Book.id).order_by(func.random()).limit(1000)).scalars())
+        category_ids = list(db.execute(select(models.Category.id).limit(100)).scalars())
+    if not book_ids or not category_ids:
+        raise SystemExit("Каталог пуст - сначала заполните его: --seed или python -m benchmarks.generate")
+    print(f"Книг в таблице: {count_books()}")
+
+    results = {}
+    with run_server(app) as base_url:
+        for name, operation in make_operations(book_ids, category_ids).items():
+            results[name] = measure(base_url, operation, args.concurrency, args.duration)
+            stats = results[name]
+            print(f"{name:14} {stats['rps']:>8} записей/с  p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms "
+                  f"SQL={stats['sql_per_request']} errors={stats['errors']}")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Общие утилиты для бенчмарков: запуск сервера в фоне и нагрузка через httpx
+"""
+import asyncio
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import uvicorn
+
+
+@contextmanager
+def run_server(app, host: str = "127.0.0.1", port: int = 8099):
+    """Запустить uvicorn в отдельном потоке на время бенчмарка"""
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def percentile(values, p: float) -> float:
+    """Перцентиль по отсортированному списку (p от 0 до 100)"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    """Свести замеры в словарь: rps и перцентили задержки в миллисекундах"""
+    ms = [x * 1000 for x in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(ms), 2) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+    }
+
+
+async def _load(base_url: str, make_request, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(n: int):
+            nonlocal errors
+            i = n
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await make_request(client, i)
+                    if response.status_code >= 500:
+                        errors += 1
+                    else:
+                        latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+                i += concurrency
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, errors, elapsed)
+
+
+def run_load(base_url: str, make_request, concurrency: int, duration: float = 10.0) -> dict:
+    """
+    Держать concurrency одновременных клиентов в течение duration секунд.
+    make_request(client, i) - корутина, отправляющая i-й запрос
+    """
+    return asyncio.run(_load(base_url, make_request, concurrency, duration))
+
+
+async def _mix(base_url: str, operations: dict, weights, concurrency: int, duration: float, seed: int) -> dict:
+    names = list(operations)
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+
+        async def worker(n: int):
+            rng = random.Random(seed + n)
+            while time.perf_counter() < deadline:
+                current = weights(time.perf_counter() - started) if callable(weights) else weights
+                name = rng.choices(names, [current.get(name, 0) for name in names])[0]
+                start = time.perf_counter()
+                try:
+                    response = await operations[name](client, rng)
+                    if response.status_code >= 500:
+                        errors[name] += 1
+                    else:
+                        latencies[name].append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors[name] += 1
+
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = summarize([x for values in latencies.values() for x in values], sum(errors.values()), elapsed)
+    total["operations"] = {
+        name: summarize(latencies[name], errors[name], elapsed)
+        for name in names if latencies[name] or errors[name]
+    }
+    return total
+
+
+def run_mix(base_url: str, operations: dict, weights, concurrency: int,
+            duration: float = 10.0, seed: int = 0) -> dict:
+    """
+    Смешанная нагрузка: каждый клиент выбирает операцию случайно по весам.
+    operations - {имя: корутина(client, rng)}, weights - {имя: вес}
+    или функция от прошедших секунд, возвращающая такой словарь (для всплесков записи).
+    Итог - общая статистика и отдельно по каждой операции
+    """
+    return asyncio.run(_mix(base_url, operations, weights, concurrency, duration, seed))
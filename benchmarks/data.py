@@ -0,0 +1,147 @@
+"""
+Генерация синтетического каталога для бенчмарков
+"""
+import csv
+import io
+import random
+
+from sqlalchemy import func, insert, select, update
+
+from app.db import models
+from app.db.db import SessionLocal, upgrade_schema
+
+WORDS = [
+    "война", "мир", "python", "алгоритмы", "данные", "история", "код", "сеть", "машина",
+    "обучение", "роман", "поэзия", "физика", "математика", "базы", "архитектура", "сервер",
+    "город", "море", "звезда", "время", "жизнь", "система", "теория", "практика", "игра",
+    "linux", "kotlin", "rust", "golang", "java", "дизайн", "экономика", "психология",
+]
+
+
+# Словарь из нескольких тысяч псевдослов: у реального каталога слова распределены
+# неравномерно, и большинство поисковых запросов селективны
+_SYLLABLES = ["ка", "ро", "ми", "ла", "то", "не", "ва", "ри", "со", "ду", "ге", "пы", "зо", "ха", "че"]
+VOCABULARY = WORDS + [
+    a + b + c for a in _SYLLABLES for b in _SYLLABLES for c in _SYLLABLES
+]
+
+
+def random_text(rng: random.Random, words: int) -> str:
+    # Известные слова встречаются часто, остальной словарь - редко
+    return " ".join(
+        rng.choice(WORDS) if rng.random() < 0.1 else rng.choice(VOCABULARY)
+        for _ in range(words)
+    )
+
+
+def seed_books(total: int, chunk: int = 10000, seed: int = 42):
+    """Добавить total синтетических книг (вставка пачками по chunk строк)"""
+    upgrade_schema()
+    rng = random.Random(seed)
+    with SessionLocal() as db:
+        category = db.execute(select(models.Category).limit(1)).scalars().first()
+        if category is None:
+            category = models.Category(title="Бенчмарк")
+            db.add(category)
+            db.commit()
+        for start in range(0, total, chunk):
+            rows = [
+                {
+                    "title": f"{random_text(rng, 3).capitalize()} {i}",
+                    "description": random_text(rng, 20),
+                    "price": round(rng.uniform(100, 5000), 2),
+                    "category_id": category.id,
+                }
+                for i in range(start, min(total, start + chunk))
+            ]
+            db.execute(insert(models.Book), rows)
+            db.commit()
+
+
+def count_books() -> int:
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).select_from(models.Book)).scalar_one()
+
+
+def count_categories() -> int:
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).select_from(models.Category)).scalar_one()
+
+
+def _copy_books(db, rows):
+    """COPY ... FROM STDIN через psycopg2 - самый быстрый способ загрузки в PostgreSQL"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            row["title"], row["description"], row["price"], row["url"], row["category_id"], row["catalog_version"]
+        ])
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    cursor.copy_expert(
+        "COPY books (title, description, price, url, category_id, catalog_version) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+
+def _bump_version(db, name: str) -> int:
+    """
+    Поднять версию списка в транзакции загрузки: ETag списков сменится, а новые строки
+    получат эту версию в catalog_version и попадут в журнал изменений (см. crud._bump_versions)
+    """
+    return db.execute(
+        update(models.CatalogVersion)
+        .where(models.CatalogVersion.name == name)
+        .values(version=models.CatalogVersion.version + 1)
+        .returning(models.CatalogVersion.version)
+    ).scalar_one()
+
+
+def seed_catalog(books: int, categories: int, chunk: int = 50000, seed: int = 42):
+    """
+    Добавить categories категорий и books книг, распределённых по ним неравномерно
+    (несколько больших категорий и длинный хвост маленьких, как в реальном каталоге).
+    В PostgreSQL книги загружаются через COPY, в остальных БД - многострочным INSERT.
+    """
+    upgrade_schema()
+    rng = random.Random(seed)
+    with SessionLocal() as db:
+        # Номера продолжают существующие, чтобы названия категорий оставались уникальными
+        offset = count_categories()
+        category_ids = []
+        if categories:
+            version = _bump_version(db, models.CATEGORIES_VERSION)
+            category_ids = list(db.execute(
+                insert(models.Category).returning(models.Category.id),
+                [
+                    {"title": f"{rng.choice(WORDS).capitalize()} {offset + i}", "catalog_version": version}
+                    for i in range(categories)
+                ]
+            ).scalars())
+        if not category_ids:
+            category_ids = list(db.execute(select(models.Category.id)).scalars())
+        db.commit()
+
+        # Вес категории ~ 1/ранг (закон Ципфа)
+        weights = [1 / (rank + 1) for rank in range(len(category_ids))]
+        use_copy = db.bind.dialect.name == "postgresql"
+        for start in range(0, books, chunk):
+            size = min(books, start + chunk) - start
+            version = _bump_version(db, models.BOOKS_VERSION)
+            rows = [
+                {
+                    "title": f"{random_text(rng, 3).capitalize()} {start + i}",
+                    "description": random_text(rng, 20),
+                    "price": round(rng.uniform(100, 5000), 2),
+                    "url": None,
+                    "category_id": category_id,
+                    "catalog_version": version,
+                }
+                for i, category_id in enumerate(rng.choices(category_ids, weights, k=size))
+            ]
+            if use_copy:
+                _copy_books(db, rows)
+            else:
+                db.execute(insert(models.Book), rows)
+            db.commit()
+            print(f"Загружено книг: {start + size}/{books}")
@@ -0,0 +1,33 @@
+"""
+Генератор синтетического каталога: от 10^3 до 10^7 книг в тысячах категорий.
+
+Работает с БД из DATABASE_URL (SQLite или локальный PostgreSQL),
+в PostgreSQL книги загружаются через COPY.
+
+Запуск:
+    python -m benchmarks.generate --books 1000000 --categories 5000
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.generate --books 100000 --categories 1000
+"""
+import argparse
+import time
+
+from benchmarks.data import count_books, count_categories, seed_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=100000, help="Сколько книг добавить")
+    parser.add_argument("--categories", type=int, default=1000, help="Сколько категорий добавить")
+    parser.add_argument("--chunk", type=int, default=50000, help="Книг в одной транзакции")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора (одинаковое - одинаковые данные)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    seed_catalog(args.books, args.categories, chunk=args.chunk, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Готово за {elapsed:.1f} с ({args.books / elapsed:.0f} книг/с). "
+          f"Всего книг: {count_books()}, категорий: {count_categories()}")
+
+
+if __name__ == "__main__":
+    main()
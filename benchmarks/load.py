@@ -0,0 +1,266 @@
+"""
+Нагрузочный прогон всех маршрутов /books и /categories смесями запросов.
+
+Смеси (--mixes):
+- read_heavy   - в основном чтение: списки, страницы по курсору, книга/категория по id, выгрузка
+- search_heavy - большая часть запросов - поиск GET /books?search=
+- write_burst  - фон как у read_heavy, но каждые 10 секунд 2 секунды почти одни записи
+                 (создание/изменение/удаление книг и категорий, массовая загрузка)
+
+Для каждой смеси сохраняются rps и p50/p95/p99 - общие и по каждой операции.
+Результат пишется в JSON (--output); с --baseline новый прогон сравнивается с сохранённым.
+
+Сервер запускается в этом же процессе на БД из DATABASE_URL. Каталог нужно заранее заполнить:
+    python -m benchmarks.generate --books 1000000 --categories 5000
+    python -m benchmarks.load --duration 30 --concurrency 50 --output results.json
+    python -m benchmarks.load --duration 30 --concurrency 50 --baseline results.json
+"""
+import argparse
+import json
+import platform
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app.db import models
+from app.db.db import SessionLocal
+from app.db.pagination import encode_cursor
+from app.main import app
+from benchmarks.common import run_mix, run_server
+from benchmarks.data import VOCABULARY, WORDS, random_text
+
+READ = {
+    "books_list": 15, "books_page": 10, "books_by_category": 15, "book_get": 30,
+    "categories_list": 5, "category_get": 10, "export": 1,
+}
+SEARCH = {"books_search": 1}
+WRITE = {
+    "book_create": 10, "book_update": 10, "book_delete": 5, "bulk": 1,
+    "category_create": 2, "category_update": 2, "category_delete": 1,
+}
+
+
+def _combine(*parts) -> dict:
+    """Смешать группы операций: _combine((READ, 0.9), (WRITE, 0.1))"""
+    weights = {}
+    for group, share in parts:
+        total = sum(group.values())
+        for name, weight in group.items():
+            weights[name] = weights.get(name, 0) + share * weight / total
+    return weights
+
+
+READ_HEAVY = _combine((READ, 0.90), (SEARCH, 0.05), (WRITE, 0.05))
+SEARCH_HEAVY = _combine((SEARCH, 0.60), (READ, 0.35), (WRITE, 0.05))
+BURST = _combine((WRITE, 0.80), (READ, 0.20))
+
+
+def write_burst(elapsed: float) -> dict:
+    return BURST if elapsed % 10 < 2 else READ_HEAVY
+
+
+MIXES = {
+    "read_heavy": READ_HEAVY,
+    "search_heavy": SEARCH_HEAVY,
+    "write_burst": write_burst,
+}
+
+
+def catalog_bounds() -> dict:
+    with SessionLocal() as db:
+        books = db.execute(select(func.min(models.Book.id), func.max(models.Book.id), func.count())).one()
+        categories = db.execute(select(func.min(models.Category.id), func.max(models.Category.id))).one()
+        dialect = db.bind.dialect.name
+    if books[2] == 0 or categories[0] is None:
+        raise SystemExit("Каталог пуст - сначала заполните его: python -m benchmarks.generate")
+    return {
+        "dialect": dialect,
+        "books": books[2],
+        "book_ids": (books[0], books[1]),
+        "category_ids": (categories[0], categories[1]),
+    }
+
+
+def make_operations(bounds: dict, limit: int) -> dict:
+    book_ids = bounds["book_ids"]
+    category_ids = bounds["category_ids"]
+    # Книги и категории, созданные самим прогоном, - их и удаляем
+    created_books, created_categories = [], []
+
+    def book_id(rng):
+        return rng.randint(*book_ids)
+
+    def category_id(rng):
+        # Маленькие категории из хвоста встречаются так же часто, как крупные
+        return rng.randint(*category_ids)
+
+    def new_book(rng):
+        return {
+            "title": random_text(rng, 3).capitalize(),
+            "description": random_text(rng, 20),
+            "price": round(rng.uniform(100, 5000), 2),
+            "category_id": category_id(rng),
+        }
+
+    async def books_list(client, rng):
+        return await client.get("/books/", params={"limit": limit})
+
+    async def books_page(client, rng):
+        cursor = encode_cursor([book_id(rng)])
+        return await client.get("/books/", params={"limit": limit, "cursor": cursor})
+
+    async def books_by_category(client, rng):
+        return await client.get("/books/", params={"limit": limit, "category_id": category_id(rng)})
+
+    async def books_search(client, rng):
+        if rng.random() < 0.5:
+            term = rng.choice(WORDS)
+        elif rng.random() < 0.5:
+            term = rng.choice(VOCABULARY)[:4]
+        else:
+            term = f"{rng.choice(WORDS)} {rng.choice(VOCABULARY)}"
+        return await client.get("/books/", params={"limit": limit, "search": term})
+
+    async def book_get(client, rng):
+        return await client.get(f"/books/{book_id(rng)}")
+
+    async def categories_list(client, rng):
+        cursor = encode_cursor([category_id(rng)]) if rng.random() < 0.5 else None
+        params = {"limit": limit, "cursor": cursor} if cursor else {"limit": limit}
+        return await client.get("/categories/", params=params)
+
+    async def category_get(client, rng):
+        return await client.get(f"/categories/{category_id(rng)}")
+
+    async def export(client, rng):
+        # Выгрузка одной категории целиком (читаем тело до конца)
+        async with client.stream("GET", "/books/export", params={"category_id": category_id(rng)}) as response:
+            async for _ in response.aiter_bytes():
+                pass
+        return response
+
+    async def book_create(client, rng):
+        response = await client.post("/books/", json=new_book(rng))
+        if response.status_code == 201:
+            created_books.append(response.json()["id"])
+        return response
+
+    async def book_update(client, rng):
+        return await client.put(f"/books/{book_id(rng)}", json={"price": round(rng.uniform(100, 5000), 2)})
+
+    async def book_delete(client, rng):
+        if not created_books:
+            return await book_create(client, rng)
+        return await client.delete(f"/books/{created_books.pop()}")
+
+    async def bulk(client, rng):
+        body = "".join(json.dumps(new_book(rng), ensure_ascii=False) + "\n" for _ in range(100))
+        return await client.post(
+            "/books/bulk", content=body.encode("utf-8"), headers={"Content-Type": "application/x-ndjson"}
+        )
+
+    async def category_create(client, rng):
+        response = await client.post("/categories/", json={"title": f"Нагрузка {rng.getrandbits(48):x}"})
+        if response.status_code == 201:
+            created_categories.append(response.json()["id"])
+        return response
+
+    async def category_update(client, rng):
+        if not created_categories:
+            return await category_create(client, rng)
+        category = rng.choice(created_categories)
+        return await client.put(f"/categories/{category}", json={"title": f"Нагрузка {rng.getrandbits(48):x}"})
+
+    async def category_delete(client, rng):
+        if not created_categories:
+            return await category_create(client, rng)
+        return await client.delete(f"/categories/{created_categories.pop()}")
+
+    return {
+        "books_list": books_list, "books_page": books_page, "books_by_category": books_by_category,
+        "books_search": books_search, "book_get": book_get, "categories_list": categories_list,
+        "category_get": category_get, "export": export, "book_create": book_create,
+        "book_update": book_update, "book_delete": book_delete, "bulk": bulk,
+        "category_create": category_create, "category_update": category_update,
+        "category_delete": category_delete,
+    }
+
+
+def _change(new: float, old: float) -> str:
+    if not old:
+        return "-"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """Напечатать изменение rps и p99 относительно сохранённого прогона"""
+    regressions = []
+    for mix, stats in results["mixes"].items():
+        old = baseline.get("mixes", {}).get(mix)
+        if not old:
+            continue
+        rows = [("всего", stats, old)] + [
+            (name, op, old["operations"][name])
+            for name, op in stats["operations"].items() if name in old.get("operations", {})
+        ]
+        print(f"\n{mix}:")
+        for name, new_stats, old_stats in rows:
+            print(f"  {name:18} rps {old_stats['rps']:>9} -> {new_stats['rps']:<9} ({_change(new_stats['rps'], old_stats['rps'])})  "
+                  f"p99 {old_stats['p99_ms']:>8} -> {new_stats['p99_ms']:<8} ({_change(new_stats['p99_ms'], old_stats['p99_ms'])})")
+            if old_stats["p99_ms"] and new_stats["p99_ms"] > old_stats["p99_ms"] * (1 + threshold / 100):
+                regressions.append(f"{mix}/{name}: p99 {old_stats['p99_ms']} -> {new_stats['p99_ms']} мс")
+    if regressions:
+        print(f"\nУхудшение p99 больше {threshold}%:")
+        for line in regressions:
+            print(f"  {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mixes", nargs="+", choices=list(MIXES), default=list(MIXES))
+    parser.add_argument("--duration", type=float, default=30.0, help="Секунд на одну смесь")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20, help="Размер страницы")
+    parser.add_argument("--seed", type=int, default=0, help="Зерно выбора операций")
+    parser.add_argument("--output", help="Сохранить результат в JSON")
+    parser.add_argument("--baseline", help="Сравнить с сохранённым результатом")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Порог ухудшения p99 в процентах")
+    args = parser.parse_args()
+
+    bounds = catalog_bounds()
+    print(f"БД: {bounds['dialect']}, книг: {bounds['books']}")
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "dialect": bounds["dialect"],
+            "books": bounds["books"],
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "limit": args.limit,
+        },
+        "mixes": {},
+    }
+    with run_server(app) as base_url:
+        for mix in args.mixes:
+            operations = make_operations(bounds, args.limit)
+            start = time.perf_counter()
+            stats = run_mix(base_url, operations, MIXES[mix], args.concurrency, args.duration, args.seed)
+            results["mixes"][mix] = stats
+            print(f"{mix:13} rps={stats['rps']:<9} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                  f"p99={stats['p99_ms']}ms errors={stats['errors']} ({time.perf_counter() - start:.0f} с)")
+            for name, op in sorted(stats["operations"].items()):
+                print(f"    {name:18} n={op['requests']:<7} p50={op['p50_ms']}ms p99={op['p99_ms']}ms errors={op['errors']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Результат сохранён в {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
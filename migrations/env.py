@@ -0,0 +1,65 @@
+"""
+Окружение Alembic: схема берётся из моделей app/db/models.py,
+подключение - из app/db/db.py (или готовое соединение из config.attributes["connection"],
+так миграции запускает app.db.db.upgrade_schema()).
+"""
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.db import models  # noqa: F401  регистрирует таблицы в Base.metadata
+from app.db.db import DATABASE_URL, Base, engine
+
+config = context.config
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Объекты поиска создаются миграциями вручную и в моделях не описаны
+SEARCH_OBJECTS = {"books_fts", "search_vector"}
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    if name in SEARCH_OBJECTS or (name or "").startswith("books_fts_"):
+        return False
+    return True
+
+
+def run_migrations_offline():
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # ALTER TABLE в SQLite делается пересозданием таблицы
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
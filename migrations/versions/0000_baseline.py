@@ -0,0 +1,46 @@
+"""Схема, которую создавал Base.metadata.create_all до перехода на Alembic: категории и книги
+
+Только таблицы categories и books без версий, отметок времени и объектов поиска - их добавляет 0001.
+БД, созданную раньше через create_all, нужно один раз пометить этой версией:
+alembic stamp 0000, затем alembic upgrade head
+
+Revision ID: 0000
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0000"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "categories",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(length=100), nullable=False),
+        sa.UniqueConstraint("title"),
+    )
+    op.create_index("ix_categories_id", "categories", ["id"])
+
+    op.create_table(
+        "books",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("url", sa.String(length=500)),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id")),
+    )
+    op.create_index("ix_books_id", "books", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_books_id", table_name="books")
+    op.drop_table("books")
+    op.drop_index("ix_categories_id", table_name="categories")
+    op.drop_table("categories")
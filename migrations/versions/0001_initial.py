@@ -0,0 +1,132 @@
+"""Версии и отметки времени книг и категорий, счётчики версий каталога и объекты поиска
+
+Поверх исходной схемы 0000: колонки version, created_at и updated_at (если их ещё нет),
+таблица catalog_versions и объекты полнотекстового поиска (см. app/db/search.py).
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = "0000"
+branch_labels = None
+depends_on = None
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_books_description_trgm ON books USING gin (description gin_trgm_ops)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, description,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, description ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO books_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def _versioning():
+    return [
+        sa.Column("version", sa.Integer(), server_default=sa.text("1"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    ]
+
+
+def _suspend_sqlite_foreign_keys():
+    """
+    Пересоздание categories (batch) удаляет строки, на которые ссылаются книги.
+    Вне транзакции внешние ключи выключаются (внутри неё PRAGMA foreign_keys не действует),
+    внутри - их проверка откладывается до commit, когда таблица уже заполнена снова
+    """
+    op.execute("PRAGMA foreign_keys = OFF")
+    op.execute("PRAGMA defer_foreign_keys = ON")
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if bind.dialect.name == "sqlite":
+        _suspend_sqlite_foreign_keys()
+    # БД, созданная create_all после появления ETag, уже может содержать часть колонок
+    for table in ("categories", "books"):
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        missing = [column for column in _versioning() if column.name not in existing]
+        if missing:
+            # SQLite не добавляет колонку с DEFAULT now() через ALTER TABLE - таблица пересоздаётся
+            with op.batch_alter_table(table) as batch:
+                for column in missing:
+                    batch.add_column(column)
+
+    if not inspector.has_table("catalog_versions"):
+        catalog_versions = op.create_table(
+            "catalog_versions",
+            sa.Column("name", sa.String(length=50), primary_key=True),
+            sa.Column("version", sa.Integer(), nullable=False),
+        )
+        op.bulk_insert(catalog_versions, [{"name": "books", "version": 0}, {"name": "categories", "version": 0}])
+
+    if bind.dialect.name == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            op.execute(statement)
+    elif bind.dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        # Книги, добавленные до появления триггеров, - в индекс
+        op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+        op.execute("PRAGMA foreign_keys = ON")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        for name in ("ix_books_description_trgm", "ix_books_title_trgm", "ix_books_search_vector"):
+            op.drop_index(name, table_name="books", if_exists=True)
+        op.execute("ALTER TABLE books DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        for trigger in ("books_fts_ai", "books_fts_ad", "books_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS books_fts")
+    op.drop_table("catalog_versions")
+    if dialect == "sqlite":
+        _suspend_sqlite_foreign_keys()
+    for table in ("books", "categories"):
+        with op.batch_alter_table(table) as batch:
+            for column in reversed(_versioning()):
+                batch.drop_column(column.name)
+    if dialect == "sqlite":
+        op.execute("PRAGMA foreign_keys = ON")
@@ -0,0 +1,46 @@
+"""Индексы книг по категории: (category_id, id) и (category_id, price)
+
+Без них выборка книг категории (get_books_by_category), проверка перед удалением
+категории (count_books_by_category) и сортировка категории по цене читают всю таблицу books.
+Отдельный индекс только по category_id не нужен: его заменяет первая колонка составных.
+Триграммный индекс по title (ix_books_title_trgm) создан в 0001 вместе с остальными объектами поиска.
+
+В PostgreSQL индексы строятся CONCURRENTLY - без блокировки записи в books.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_books_category_id_id", ["category_id", "id"]),
+    ("ix_books_category_id_price", ["category_id", "price"]),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.create_index(name, "books", columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, columns in INDEXES:
+            op.create_index(name, "books", columns, if_not_exists=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, _ in INDEXES:
+                op.drop_index(name, table_name="books", postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, _ in INDEXES:
+            op.drop_index(name, table_name="books", if_exists=True)
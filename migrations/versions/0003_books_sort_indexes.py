@@ -0,0 +1,57 @@
+"""Индексы под фильтры и сортировки списка книг (crud.find_books)
+
+Ключ keyset-пагинации - (поле сортировки, id), поэтому индексы заканчиваются на id:
+- (price, id) - сортировка и диапазон цены по всему каталогу
+- (title, id) - сортировка по названию
+- (category_id, price, id) заменяет (category_id, price) из 0002 - категория + сортировка/диапазон цены
+Категория + сортировка по id/newest использует (category_id, id) из 0002.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+NEW_INDEXES = [
+    ("ix_books_price_id", ["price", "id"]),
+    ("ix_books_title_id", ["title", "id"]),
+    ("ix_books_category_id_price_id", ["category_id", "price", "id"]),
+]
+REPLACED_INDEX = ("ix_books_category_id_price", ["category_id", "price"])
+
+
+def _create(indexes, concurrently: bool):
+    for name, columns in indexes:
+        op.create_index(name, "books", columns, postgresql_concurrently=concurrently, if_not_exists=True)
+
+
+def _drop(indexes, concurrently: bool):
+    for name, _ in indexes:
+        op.drop_index(name, table_name="books", postgresql_concurrently=concurrently, if_exists=True)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        # CREATE/DROP INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+        with op.get_context().autocommit_block():
+            _create(NEW_INDEXES, True)
+            _drop([REPLACED_INDEX], True)
+    else:
+        _create(NEW_INDEXES, False)
+        _drop([REPLACED_INDEX], False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            _create([REPLACED_INDEX], True)
+            _drop(NEW_INDEXES, True)
+    else:
+        _create([REPLACED_INDEX], False)
+        _drop(NEW_INDEXES, False)
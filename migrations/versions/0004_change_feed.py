@@ -0,0 +1,59 @@
+"""Журнал изменений каталога (GET /books/changes, /categories/changes)
+
+- catalog_version у книг и категорий: версия списка из catalog_versions, при которой строка
+  изменилась последний раз; существующие строки получают 0 (попадают в первую полную синхронизацию)
+- индексы (catalog_version, id) - ключ курсора журнала
+- catalog_deletions - записи об удалённых книгах и категориях
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_books_catalog_version_id", "books"),
+    ("ix_categories_catalog_version_id", "categories"),
+]
+
+
+def upgrade():
+    # ADD COLUMN с постоянным DEFAULT не переписывает таблицу (PostgreSQL 11+, SQLite)
+    for _, table in INDEXES:
+        op.add_column(table, sa.Column("catalog_version", sa.Integer(), server_default=sa.text("0"), nullable=False))
+    op.create_table(
+        "catalog_deletions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("entity", sa.String(length=20), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index(
+        "ix_catalog_deletions_entity_version_entity_id", "catalog_deletions", ["entity", "version", "entity_id"]
+    )
+
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    if concurrently:
+        # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции (см. 0002)
+        with op.get_context().autocommit_block():
+            for name, table in INDEXES:
+                op.create_index(name, table, ["catalog_version", "id"], postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table in INDEXES:
+            op.create_index(name, table, ["catalog_version", "id"], if_not_exists=True)
+
+
+def downgrade():
+    for name, table in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
+    op.drop_table("catalog_deletions")
+    for _, table in INDEXES:
+        op.drop_column(table, "catalog_version")
@@ -0,0 +1,179 @@
+"""Счётчики книг по категориям (GET /categories/stats, GET /books/facets)
+
+- category_stats - число книг, сумма, минимум и максимум цены по каждой категории
+- category_price_buckets - число книг категории в каждом ценовом диапазоне (нижние границы - PRICE_BUCKETS)
+Обе таблицы заполняются по текущим книгам и дальше поддерживаются триггерами на books,
+поэтому учитывают любые записи: API, COPY, sync_crud. Минимум и максимум пересчитываются
+для затронутых категорий по индексу (category_id, price, id) из 0003.
+PostgreSQL: триггеры уровня оператора с таблицами переходов (одно обновление счётчиков
+на весь UPDATE/DELETE пачки); SQLite: триггеры уровня строки.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# Нижние границы ценовых диапазонов (совпадают с models.PRICE_BUCKETS на момент миграции)
+PRICE_BUCKETS = (0, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _bucket(price: str) -> str:
+    """SQL-выражение: нижняя граница диапазона, в который попадает цена"""
+    branches = " ".join(f"WHEN {price} >= {bound} THEN {bound}" for bound in reversed(PRICE_BUCKETS[1:]))
+    return f"CASE {branches} ELSE 0 END"
+
+
+BACKFILL = [
+    """
+    INSERT INTO category_stats (category_id, book_count, price_sum, price_min, price_max)
+    SELECT category_id, count(*), sum(price), min(price), max(price)
+    FROM books WHERE category_id IS NOT NULL GROUP BY category_id
+    """,
+    f"""
+    INSERT INTO category_price_buckets (category_id, bucket, book_count)
+    SELECT category_id, {_bucket("price")}, count(*)
+    FROM books WHERE category_id IS NOT NULL GROUP BY 1, 2
+    """,
+]
+
+# Изменения книг (category_id, price, знак) для каждого вида триггера
+POSTGRES_DELTAS = {
+    "insert": "SELECT category_id, price, 1 AS sign FROM new_rows",
+    "delete": "SELECT category_id, price, -1 AS sign FROM old_rows",
+    "update": "SELECT category_id, price, 1 AS sign FROM new_rows "
+              "UNION ALL SELECT category_id, price, -1 FROM old_rows",
+}
+
+
+def _postgres_function(kind: str) -> str:
+    delta = f"WITH delta AS ({POSTGRES_DELTAS[kind]}) "
+    return f"""
+    CREATE OR REPLACE FUNCTION books_category_stats_{kind}() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        {delta}
+        INSERT INTO category_stats AS s (category_id, book_count, price_sum)
+        SELECT category_id, sum(sign), sum(sign * price) FROM delta
+        WHERE category_id IS NOT NULL GROUP BY category_id
+        ON CONFLICT (category_id) DO UPDATE
+        SET book_count = s.book_count + excluded.book_count, price_sum = s.price_sum + excluded.price_sum;
+
+        {delta}
+        INSERT INTO category_price_buckets AS b (category_id, bucket, book_count)
+        SELECT category_id, {_bucket("price")}, sum(sign) FROM delta
+        WHERE category_id IS NOT NULL GROUP BY 1, 2
+        ON CONFLICT (category_id, bucket) DO UPDATE SET book_count = b.book_count + excluded.book_count;
+
+        {delta}
+        UPDATE category_stats s
+        SET price_min = (SELECT min(price) FROM books WHERE books.category_id = s.category_id),
+            price_max = (SELECT max(price) FROM books WHERE books.category_id = s.category_id)
+        WHERE s.category_id IN (SELECT category_id FROM delta);
+        RETURN NULL;
+    END
+    $$
+    """
+
+
+POSTGRES_TRIGGERS = {
+    "insert": "AFTER INSERT ON books REFERENCING NEW TABLE AS new_rows",
+    "delete": "AFTER DELETE ON books REFERENCING OLD TABLE AS old_rows",
+    "update": "AFTER UPDATE ON books REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+}
+
+
+def _sqlite_add(row: str) -> str:
+    return f"""
+        INSERT INTO category_stats (category_id, book_count, price_sum)
+        SELECT {row}.category_id, 1, {row}.price WHERE {row}.category_id IS NOT NULL
+        ON CONFLICT (category_id) DO UPDATE
+        SET book_count = book_count + 1, price_sum = price_sum + excluded.price_sum;
+        INSERT INTO category_price_buckets (category_id, bucket, book_count)
+        SELECT {row}.category_id, {_bucket(f"{row}.price")}, 1 WHERE {row}.category_id IS NOT NULL
+        ON CONFLICT (category_id, bucket) DO UPDATE SET book_count = book_count + 1;
+    """
+
+
+def _sqlite_remove(row: str) -> str:
+    return f"""
+        UPDATE category_stats SET book_count = book_count - 1, price_sum = price_sum - {row}.price
+        WHERE category_id = {row}.category_id;
+        UPDATE category_price_buckets SET book_count = book_count - 1
+        WHERE category_id = {row}.category_id AND bucket = {_bucket(f"{row}.price")};
+    """
+
+
+def _sqlite_min_max(row: str) -> str:
+    return f"""
+        UPDATE category_stats
+        SET price_min = (SELECT min(price) FROM books WHERE category_id = {row}.category_id),
+            price_max = (SELECT max(price) FROM books WHERE category_id = {row}.category_id)
+        WHERE category_id = {row}.category_id;
+    """
+
+
+SQLITE_TRIGGERS = {
+    "books_category_stats_ai": ("AFTER INSERT ON books", _sqlite_add("new") + _sqlite_min_max("new")),
+    "books_category_stats_ad": ("AFTER DELETE ON books", _sqlite_remove("old") + _sqlite_min_max("old")),
+    "books_category_stats_au": (
+        "AFTER UPDATE OF price, category_id ON books",
+        _sqlite_remove("old") + _sqlite_add("new") + _sqlite_min_max("old") + _sqlite_min_max("new"),
+    ),
+}
+
+
+def upgrade():
+    op.create_table(
+        "category_stats",
+        sa.Column(
+            "category_id", sa.Integer(), sa.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("book_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("price_sum", sa.Float(), server_default=sa.text("0"), nullable=False),
+        sa.Column("price_min", sa.Float()),
+        sa.Column("price_max", sa.Float()),
+    )
+    op.create_table(
+        "category_price_buckets",
+        sa.Column(
+            "category_id", sa.Integer(), sa.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("bucket", sa.Integer(), primary_key=True),
+        sa.Column("book_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+    )
+
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        # Счётчики заполняются под блокировкой записи в books, чтобы триггеры не разошлись с начальным подсчётом
+        op.execute("LOCK TABLE books IN SHARE MODE")
+        for kind, event in POSTGRES_TRIGGERS.items():
+            op.execute(_postgres_function(kind))
+            op.execute(
+                f"CREATE TRIGGER books_category_stats_{kind} {event} "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION books_category_stats_{kind}()"
+            )
+    elif dialect == "sqlite":
+        for name, (event, body) in SQLITE_TRIGGERS.items():
+            op.execute(f"CREATE TRIGGER {name} {event} FOR EACH ROW BEGIN {body} END")
+    for statement in BACKFILL:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        for kind in POSTGRES_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS books_category_stats_{kind} ON books")
+            op.execute(f"DROP FUNCTION IF EXISTS books_category_stats_{kind}()")
+    elif dialect == "sqlite":
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_table("category_price_buckets")
+    op.drop_table("category_stats")
@@ -0,0 +1,77 @@
+"""
+Общая настройка тестов: приложение работает с отдельным файлом SQLite во временной папке.
+
+DATABASE_URL задаётся до импорта app - движки создаются при импорте app.db.db.
+Нужны pytest, httpx и aiosqlite: pip install pytest httpx aiosqlite
+"""
+import asyncio
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="bookstore-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("REPLICA_DATABASE_URLS", None)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db.db import AsyncSessionLocal, async_engine, upgrade_schema  # noqa: E402
+
+upgrade_schema()
+
+
+def run(coro):
+    """Выполнить корутину в новом цикле событий; соединения пула привязаны к циклу - закрываем их"""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(main())
+
+
+def interleaved(after: int, action):
+    """
+    Фабрика сессий вместо AsyncSessionLocal: сразу после after-го запроса через её сессии
+    выполняется корутина action() - так запись другой сессии попадает между двумя чтениями
+    """
+    calls = 0
+
+    def factory():
+        session = AsyncSessionLocal()
+        execute = session.execute
+
+        async def execute_then_act(*args, **kwargs):
+            nonlocal calls
+            result = await execute(*args, **kwargs)
+            calls += 1
+            if calls == after:
+                await action()
+            return result
+
+        session.execute = execute_then_act
+        return session
+
+    return factory
+
+
+async def _background_done():
+    """Дождаться фоновых построения и догона индекса подсказок"""
+    from app import suggest
+
+    tasks = [task for task in (suggest.index._task, suggest.index._catch_up) if task is not None]
+    if tasks:
+        await asyncio.wait(tasks)
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+        # Выключение отменяет фоновые задачи; отмена посреди запроса aiosqlite оставляет соединение
+        # с открытой транзакцией чтения, и следующие тесты получают "database is locked"
+        test_client.portal.call(_background_done)
@@ -0,0 +1,53 @@
+"""Допуск запросов (app/admission.py): отмена ожидания возвращает место, только если оно было выдано"""
+import asyncio
+
+import pytest
+
+from app.admission import READ, AdmissionControl
+from tests.conftest import run
+
+
+async def _queued_waiter(control: AdmissionControl):
+    """Место занято, второй запрос ждёт в очереди: (задача ожидания, её future)"""
+    assert await control.acquire(READ) is None
+    task = asyncio.create_task(control.acquire(READ))
+    await asyncio.sleep(0)
+    lane = control.lanes[READ]
+    assert len(lane.waiters) == 1
+    return task, lane.waiters[0]
+
+
+def test_cancel_after_expire_keeps_counters():
+    control = AdmissionControl(capacity=1, read_limit=1, write_limit=1, timeout_ms=10000)
+
+    async def scenario():
+        task, future = await _queued_waiter(control)
+        # Таймаут сработал, но задача отменена раньше, чем успела получить отказ
+        control._expire(control.lanes[READ], future)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert control.active == 1
+        control.release(READ, 0.01)
+
+    run(scenario())
+    assert control.active == 0
+    assert control.lanes[READ].active == 0
+
+
+def test_cancel_after_admission_returns_slot():
+    control = AdmissionControl(capacity=1, read_limit=1, write_limit=1, timeout_ms=10000)
+
+    async def scenario():
+        task, future = await _queued_waiter(control)
+        # Место передано ждущему, но задача отменена до того, как её обработчик начал работу
+        control.release(READ, 0.01)
+        assert future.result() is True
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    run(scenario())
+    assert control.active == 0
+    assert control.lanes[READ].active == 0
+    assert not control.lanes[READ].waiters
@@ -0,0 +1,18 @@
+"""Обработчики сравнения sync/async (benchmarks/bench_async.py) отвечают одной и той же страницей"""
+from fastapi.testclient import TestClient
+
+from benchmarks.bench_async import bench_app
+
+
+def test_sync_and_async_endpoints_return_same_page(client):
+    for i in range(3):
+        assert client.post("/books/", json={"title": f"Sync/async {i}", "price": 100}).status_code == 201
+
+    with TestClient(bench_app) as bench:
+        pages = []
+        for path in ("/sync/books", "/async/books"):
+            response = bench.get(path, params={"limit": 3})
+            assert response.status_code == 200
+            pages.append(response.json())
+    assert len(pages[0]) == 3
+    assert pages[0] == pages[1]
@@ -0,0 +1,20 @@
+"""Массовая загрузка POST /books/bulk: ошибочные строки не прерывают загрузку, список ошибок ограничен"""
+import json
+
+from app.schemas import BULK_MAX_ERRORS
+
+
+def _ndjson(records: list) -> bytes:
+    return "\n".join(json.dumps(record, ensure_ascii=False) for record in records).encode("utf-8")
+
+
+def test_errors_are_capped(client):
+    bad = BULK_MAX_ERRORS * 3
+    records = [{"title": "", "price": 100}] * bad + [{"title": "Массовая загрузка", "price": 100}]
+    response = client.post(
+        "/books/bulk", content=_ndjson(records), headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["received"], result["created"], result["failed"]) == (bad + 1, 1, bad)
+    assert [error["row"] for error in result["errors"]] == list(range(1, BULK_MAX_ERRORS + 1))
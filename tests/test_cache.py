@@ -0,0 +1,57 @@
+"""Статистика кэша чтения (app/cache.py): одинаковые ключи у хранилищ и счётчики в /metrics"""
+import fakeredis
+import pytest
+
+from app import metrics
+from app.cache import MemoryCache, NullCache, ReadThroughCache, RedisCache
+from tests.conftest import run
+
+
+def _redis_cache() -> RedisCache:
+    client = fakeredis.FakeAsyncRedis()
+
+    async def info(section=None):
+        # fakeredis не знает INFO: отвечаем как сервер, вытеснивший 3 ключа
+        return {"evicted_keys": 3, "expired_keys": 5}
+
+    client.info = info
+    return RedisCache(client=client)
+
+
+async def _load(value):
+    return value
+
+
+async def _exercise(cache: ReadThroughCache) -> dict:
+    await cache.get_or_load("book:1", lambda: _load({"id": 1}))
+    await cache.get_or_load("book:1", lambda: _load({"id": 1}))
+    await cache.get_many_or_load([1, 2], lambda i: f"book:{i}", lambda ids: _load({i: {"id": i} for i in ids}))
+    return await cache.stats()
+
+
+def test_backends_report_same_keys():
+    stats = {
+        backend.__name__: run(_exercise(ReadThroughCache(make())))
+        for backend, make in ((MemoryCache, MemoryCache), (RedisCache, _redis_cache), (NullCache, NullCache))
+    }
+    assert len({frozenset(values) for values in stats.values()}) == 1
+
+    redis = stats["RedisCache"]
+    assert (redis["hits"], redis["misses"]) == (2, 2)
+    assert (redis["size"], redis["evictions"], redis["expirations"]) == (2, 3, 5)
+    assert stats["MemoryCache"]["hits"] == 2
+
+
+@pytest.mark.parametrize("make", [MemoryCache, _redis_cache])
+def test_cache_counters_in_metrics(make):
+    text = metrics.render(run(_exercise(ReadThroughCache(make()))))
+    backend = type(make()).__name__
+
+    assert f'cache_hits_total{{backend="{backend}"}} 2' in text
+    assert f'cache_misses_total{{backend="{backend}"}} 2' in text
+    assert f'cache_size{{backend="{backend}"}} 2' in text
+    assert f'cache_evictions_total{{backend="{backend}"}}' in text
+
+
+def test_metrics_endpoint_includes_cache(client):
+    assert "# TYPE cache_hits_total counter" in client.get("/metrics").text
@@ -0,0 +1,69 @@
+"""Журнал изменений GET /books/changes (crud.get_changes)"""
+import pytest
+
+from app.db import crud
+from app.db.db import AsyncSessionLocal
+from tests.conftest import interleaved, run
+
+
+async def _create_book(title: str) -> int:
+    async with AsyncSessionLocal() as db:
+        row = await crud.create_book(db, {"title": title, "price": 100.0})
+    return row.id
+
+
+async def _read_all(cursor):
+    """Пройти журнал от курсора до конца"""
+    changes = []
+    while True:
+        async with AsyncSessionLocal() as db:
+            page, cursor, has_more = await crud.get_changes(db, "book", cursor, limit=1000)
+        changes += [(op, book_id, version) for op, (version, book_id), _ in page]
+        if not has_more:
+            return changes, cursor
+
+
+@pytest.mark.parametrize("interleave_after", [1, 2])
+def test_write_between_reads_is_not_skipped(interleave_after):
+    """Изменение и удаление, закоммиченные между запросами get_changes, приходят в следующих страницах"""
+    async def scenario():
+        updated = await _create_book("Изменяемая")
+        deleted = await _create_book("Удаляемая")
+        _, cursor = await _read_all(None)
+
+        async def write_and_delete():
+            # Запись получает меньшую версию, удаление - большую
+            async with AsyncSessionLocal() as writer:
+                await crud.update_book(writer, updated, {"price": 200.0})
+            async with AsyncSessionLocal() as writer:
+                await crud.delete_book(writer, deleted)
+
+        async with interleaved(interleave_after, write_and_delete)() as reader:
+            page, cursor, _ = await crud.get_changes(reader, "book", cursor)
+        first = [(op, book_id) for op, (version, book_id), _ in page]
+        rest, _ = await _read_all(cursor)
+        return first + [(op, book_id) for op, book_id, _ in rest], updated, deleted
+
+    changes, updated, deleted = run(scenario())
+    assert ("upsert", updated) in changes
+    assert ("delete", deleted) in changes
+
+
+def test_changes_follow_commit_order():
+    async def scenario():
+        _, cursor = await _read_all(None)
+        first = await _create_book("Первая")
+        second = await _create_book("Вторая")
+        async with AsyncSessionLocal() as db:
+            await crud.update_book(db, first, {"title": "Первая, исправленная"})
+        async with AsyncSessionLocal() as db:
+            await crud.delete_book(db, second)
+        changes, next_cursor = await _read_all(cursor)
+        again, _ = await _read_all(next_cursor)
+        return changes, again, first, second
+
+    changes, again, first, second = run(scenario())
+    assert [(op, book_id) for op, book_id, _ in changes] == [("upsert", first), ("delete", second)]
+    versions = [version for _, _, version in changes]
+    assert versions == sorted(versions)
+    assert again == []
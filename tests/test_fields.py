@@ -0,0 +1,28 @@
+"""Выборочные поля (fields=) в GET /books и GET /books/{id} и их схема в OpenAPI"""
+from app.schemas import BookPartial, PaginatedResponse
+
+
+def _schema_refs(openapi: dict, path: str) -> list:
+    schema = openapi["paths"][path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    name = schema["$ref"].rsplit("/", 1)[-1]
+    return [option["$ref"].rsplit("/", 1)[-1] for option in openapi["components"]["schemas"][name]["anyOf"]]
+
+
+def test_openapi_declares_partial_responses(client):
+    openapi = client.get("/openapi.json").json()
+
+    assert _schema_refs(openapi, "/books/") == ["PaginatedResponse_Book_", "PaginatedResponse_BookPartial_"]
+    assert _schema_refs(openapi, "/books/{book_id}") == ["Book", "BookPartial"]
+    assert openapi["components"]["schemas"]["BookPartial"]["required"] == ["id"]
+
+
+def test_trimmed_responses_match_partial_schema(client):
+    book_id = client.post("/books/", json={"title": "Выборочные поля", "price": 150}).json()["id"]
+
+    page = client.get("/books/", params={"fields": "title,price", "limit": 5}).json()
+    assert all(set(book) == {"id", "title", "price"} for book in page["items"])
+    PaginatedResponse[BookPartial].model_validate(page)
+
+    book = client.get(f"/books/{book_id}", params={"fields": "price"}).json()
+    assert book == {"price": 150.0, "id": book_id}
+    BookPartial.model_validate(book)
@@ -0,0 +1,56 @@
+"""Групповой commit (app/db/group_commit.py): ошибки отдельных книг и метрики пачек"""
+import asyncio
+
+from sqlalchemy.exc import IntegrityError
+
+from app import metrics
+from app.db import crud
+from app.db.db import AsyncSessionLocal
+from app.db.group_commit import GroupCommit
+from tests.conftest import run
+
+
+def test_only_foreign_key_violation_is_category_not_found():
+    """Нет категории -> CategoryNotFound, NOT NULL -> IntegrityError этой книги, остальные книги записаны"""
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            return await crud.create_books(db, [
+                {"title": "Групповой commit: без ошибок", "price": 100.0},
+                {"title": "Групповой commit: нет категории", "price": 100.0, "category_id": 10 ** 9},
+                {"title": "Групповой commit: без цены", "price": None},
+            ])
+
+    saved, missing_category, not_null = run(scenario())
+
+    assert saved.title == "Групповой commit: без ошибок"
+    assert isinstance(missing_category, crud.CategoryNotFound)
+    assert isinstance(not_null, IntegrityError)
+
+
+def _histogram_count(histogram: metrics.Histogram) -> int:
+    series = histogram._series.get(())
+    return sum(series[0]) if series else 0
+
+
+def test_batches_are_exported_to_metrics():
+    group = GroupCommit(window_ms=50, max_rows=10)
+
+    async def scenario():
+        try:
+            return await asyncio.gather(
+                *(group.create_book({"title": f"Групповой commit {i}", "price": 100.0}) for i in range(4)),
+                return_exceptions=True,
+            )
+        finally:
+            await group.stop()
+
+    batches = _histogram_count(metrics.group_commit_batch_rows)
+    waits = _histogram_count(metrics.group_commit_wait)
+    rows = run(scenario())
+
+    assert not [row for row in rows if isinstance(row, Exception)]
+    assert group.batches == 1
+    assert _histogram_count(metrics.group_commit_batch_rows) == batches + 1
+    assert _histogram_count(metrics.group_commit_wait) == waits + 4
+    assert "group_commit_wait_seconds_count" in metrics.render()
+
@@ -0,0 +1,69 @@
+"""Миграции: БД, созданная create_all до перехода на Alembic, обновляется до head (alembic stamp 0000)"""
+import sqlalchemy as sa
+from alembic import command
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from app.db.db import alembic_config, enable_sqlite_foreign_keys
+
+
+def _baseline_metadata() -> sa.MetaData:
+    """Таблицы, как их создавал Base.metadata.create_all в исходной версии app/db/models.py"""
+    metadata = sa.MetaData()
+    sa.Table(
+        "categories", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("title", sa.String(100), unique=True, nullable=False),
+    )
+    sa.Table(
+        "books", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("title", sa.String(200), nullable=False),
+        sa.Column("description", sa.Text),
+        sa.Column("price", sa.Float, nullable=False),
+        sa.Column("url", sa.String(500)),
+        sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id")),
+    )
+    return metadata
+
+
+def _migrate(engine, action, revision: str):
+    config = alembic_config()
+    with engine.connect() as conn:
+        config.attributes["connection"] = conn
+        action(config, revision)
+        conn.commit()
+
+
+def test_create_all_database_upgrades_to_head(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    enable_sqlite_foreign_keys(engine)
+    metadata = _baseline_metadata()
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(metadata.tables["categories"].insert(), [{"id": 1, "title": "Фантастика"}])
+        conn.execute(metadata.tables["books"].insert(), [
+            {"id": 1, "title": "Солярис", "description": "Океан", "price": 350.0, "category_id": 1},
+            {"id": 2, "title": "Пикник на обочине", "description": None, "price": 290.0, "category_id": None},
+        ])
+
+    _migrate(engine, command.stamp, "0000")
+    _migrate(engine, command.upgrade, "head")
+
+    head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+    with engine.connect() as conn:
+        assert MigrationContext.configure(conn).get_current_revision() == head
+        books = conn.execute(sa.text(
+            "SELECT id, title, category_id, version, created_at IS NOT NULL, catalog_version FROM books ORDER BY id"
+        )).all()
+        assert books == [(1, "Солярис", 1, 1, 1, 0), (2, "Пикник на обочине", None, 1, 1, 0)]
+        assert conn.execute(sa.text("SELECT version FROM catalog_versions WHERE name = 'books'")).scalar() == 0
+        # Книги, которые были до миграции, находятся полнотекстовым поиском
+        found = conn.execute(sa.text("SELECT rowid FROM books_fts WHERE books_fts MATCH '\"солярис\"*'")).scalars()
+        assert list(found) == [1]
+
+    _migrate(engine, command.downgrade, "0000")
+    with engine.connect() as conn:
+        columns = {column["name"] for column in sa.inspect(conn).get_columns("books")}
+        assert columns == {"id", "title", "description", "price", "url", "category_id"}
+        assert conn.execute(sa.text("SELECT count(*) FROM books")).scalar() == 2
@@ -0,0 +1,74 @@
+"""Число SQL-запросов на HTTP-запрос (X-Query-Count) не зависит от размера страницы"""
+import itertools
+
+import pytest
+from sqlalchemy import text
+
+from app.db.db import AsyncSessionLocal
+from app.db.query_counter import count_queries
+from tests.conftest import run
+
+
+_catalogs = itertools.count()
+
+
+@pytest.fixture
+def catalog(client):
+    """Две категории и по 30 книг в каждой"""
+    category_ids = []
+    number = next(_catalogs)
+    for title in (f"Счётчик запросов А{number}", f"Счётчик запросов Б{number}"):
+        response = client.post("/categories/", json={"title": title})
+        assert response.status_code == 201
+        category_ids.append(response.json()["id"])
+    for i in range(60):
+        response = client.post(
+            "/books/", json={"title": f"Книга счётчика {i}", "price": 100 + i, "category_id": category_ids[i % 2]}
+        )
+        assert response.status_code == 201
+    return category_ids
+
+
+def _query_counts(client, path: str, params: dict, limits=(1, 10, 50)) -> list:
+    counts = []
+    for limit in limits:
+        response = client.get(path, params={**params, "limit": limit})
+        assert response.status_code == 200
+        counts.append(int(response.headers["X-Query-Count"]))
+    return counts
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"sort": "-price"},
+    {"fields": "id,title,category"},
+    {"search": "счётчика"},
+])
+def test_book_list_query_count_is_constant(client, catalog, params):
+    counts = _query_counts(client, "/books/", params)
+    assert len(set(counts)) == 1, counts
+
+
+def test_book_list_by_category_query_count_is_constant(client, catalog):
+    counts = _query_counts(client, "/books/", {"category_id": catalog[0]})
+    assert len(set(counts)) == 1, counts
+
+
+def test_category_is_loaded_with_the_page(client, catalog):
+    response = client.get("/books/", params={"category_id": catalog[1], "limit": 50})
+    books = response.json()["items"]
+    assert books and all(book["category"]["id"] == catalog[1] for book in books)
+
+
+def test_statements_are_kept_only_on_request():
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            with count_queries() as counter:
+                await db.execute(text("SELECT 1"))
+            with count_queries(statements=True) as debug:
+                await db.execute(text("SELECT 1"))
+        return counter, debug
+
+    counter, debug = run(scenario())
+    assert counter.count == 1 and counter.statements is None
+    assert debug.count == 1 and debug.statements == ["SELECT 1"]
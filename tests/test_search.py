@@ -0,0 +1,111 @@
+"""Поиск книг в SQLite (FTS5 books_fts и bm25, app/db/search.py) и запасной поиск через ILIKE"""
+import itertools
+
+import pytest
+
+from app.db import models
+from app.db.db import AsyncSessionLocal
+from app.db.search import search_books_statement
+from tests.conftest import run
+
+
+_words = itertools.count()
+
+
+@pytest.fixture
+def word():
+    """Слово, которого нет в книгах других тестов (база общая на все тесты)"""
+    return f"квазар{next(_words)}ц"
+
+
+def _create(client, title: str, description: str = None) -> int:
+    response = client.post("/books/", json={"title": title, "description": description, "price": 100})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _search(client, search: str, **params) -> list:
+    response = client.get("/books/", params={"search": search, **params})
+    assert response.status_code == 200
+    return [book["id"] for book in response.json()["items"]]
+
+
+def test_title_match_ranks_above_description(client, word):
+    in_description = _create(client, "Про звёзды", f"Книга, где упоминается {word}")
+    in_title = _create(client, f"Всё про {word}", "Про звёзды")
+
+    assert _search(client, word) == [in_title, in_description]
+
+
+def test_last_word_matches_as_prefix(client, word):
+    book_id = _create(client, f"Гравитационные {word}волны")
+
+    assert _search(client, f"гравитационные {word}вол") == [book_id]
+    assert _search(client, f"гравитационные {word}волнистые") == []
+
+
+def test_triggers_follow_update_and_delete(client, word):
+    book_id = _create(client, f"Старое {word}название")
+    assert _search(client, f"{word}название") == [book_id]
+
+    response = client.patch(f"/books/{book_id}", json={"title": f"Новое {word}имя"})
+    assert response.status_code == 200
+    assert _search(client, f"{word}название") == []
+    assert _search(client, f"{word}имя") == [book_id]
+
+    response = client.patch(f"/books/{book_id}", json={"description": f"Теперь и {word}описание"})
+    assert response.status_code == 200
+    assert _search(client, f"{word}описание") == [book_id]
+
+    assert client.delete(f"/books/{book_id}").status_code in (200, 204)
+    assert _search(client, f"{word}имя") == []
+    assert _search(client, f"{word}описание") == []
+
+
+def test_keyset_pagination_over_rank(client, word):
+    # Разная релевантность и повторы с одинаковым rank - порядок при равенстве задаёт id
+    books = [
+        (f"{word}", None),
+        (f"{word} {word}", None),
+        ("Заголовок", f"{word}"),
+        ("Заголовок", f"{word}"),
+        (f"{word} и ещё слова в названии", None),
+        (f"{word}", f"{word} {word}"),
+        ("Заголовок", f"{word} {word}"),
+    ]
+    ids = {_create(client, title, description) for title, description in books}
+
+    full = client.get("/books/", params={"search": word, "sort": "relevance", "limit": 100}).json()
+    assert {book["id"] for book in full["items"]} == ids
+    assert full["next_cursor"] is None
+
+    paged = []
+    cursor = None
+    while True:
+        params = {"search": word, "sort": "relevance", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/books/", params=params).json()
+        assert len(page["items"]) <= 2
+        paged += [book["id"] for book in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert paged == [book["id"] for book in full["items"]]
+
+
+def test_ilike_fallback_matches_words_literally(client, word):
+    """Для прочих СУБД: _ и % в запросе - обычные символы, а не шаблоны LIKE"""
+    exact = _create(client, f"{word} snake_case")
+    _create(client, f"{word} snakeXcase")
+    _create(client, f"{word} 100 процентов")
+
+    async def search(term: str) -> list:
+        stmt, _ = search_books_statement("other", term)
+        async with AsyncSessionLocal() as db:
+            return list((await db.execute(stmt.with_only_columns(models.Book.id).order_by(models.Book.id))).scalars())
+
+    assert run(search(f"{word} snake_case")) == [exact]
+    assert run(search(f"{word} 100%")) == [exact + 2]
+    assert run(search(f"case {word}")) == [exact, exact + 1]
+    assert run(search("%")) == []
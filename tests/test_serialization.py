@@ -0,0 +1,123 @@
+"""Быстрая сериализация (app/serialization.py): orjson и json из стандартной библиотеки дают те же байты, что pydantic"""
+import itertools
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from app import serialization
+from app.schemas import Book, PaginatedResponse
+
+
+UTC = datetime(2024, 3, 1, 12, 30, 5, 123456, tzinfo=timezone.utc)
+MOSCOW = datetime(2024, 3, 1, 15, 30, 5, tzinfo=timezone(timedelta(hours=3)))
+NAIVE = datetime(2024, 3, 1, 12, 30)
+
+
+def _category(number: int, created_at: datetime) -> dict:
+    return dict(zip(serialization.CATEGORY_KEYS, (f"Категория «{number}»", number, 1, created_at, created_at)))
+
+
+def _book(number: int, price, created_at: datetime, updated_at: datetime, category) -> dict:
+    values = (f"Книга {number} \"с кавычками\" и \\", "Описание\nв две строки ✓", price,
+              None, category and category["id"], number, 2, created_at, updated_at)
+    data = dict(zip(serialization.BOOK_KEYS, values))
+    data["category"] = category
+    return data
+
+
+def _page() -> dict:
+    books = [
+        _book(1, 199.9, UTC, UTC, _category(1, UTC)),
+        _book(2, 100.0, MOSCOW, NAIVE, _category(2, MOSCOW)),
+        _book(3, 0.1, NAIVE, UTC, None),
+        _book(4, 0.0001, UTC, MOSCOW, _category(3, NAIVE)),
+        _book(5, 12345678.125, None, None, None),
+    ]
+    return {"items": books, "limit": 5, "next_cursor": "eyJrIjpbNV19"}
+
+
+def _with_decimals(page: dict) -> dict:
+    """Та же страница, но цены - Decimal, как у Numeric-колонок"""
+    items = [{**book, "price": Decimal(repr(book["price"]))} for book in page["items"]]
+    return {**page, "items": items}
+
+
+def _pydantic(page: dict) -> bytes:
+    return PaginatedResponse[Book].model_validate(page).model_dump_json().encode("utf-8")
+
+
+@pytest.fixture
+def stdlib_json(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason="orjson не установлен")
+def test_orjson_matches_pydantic():
+    page = _page()
+    assert serialization.dumps(page) == _pydantic(page)
+    assert serialization.dumps(_with_decimals(page)) == _pydantic(page)
+
+
+def test_stdlib_json_matches_pydantic(stdlib_json):
+    page = _page()
+    assert serialization.dumps(page) == _pydantic(page)
+    assert serialization.dumps(_with_decimals(page)) == _pydantic(page)
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason="orjson не установлен")
+def test_orjson_matches_stdlib_json(monkeypatch):
+    page = _with_decimals(_page())
+    fast = serialization.dumps(page)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.dumps(page) == fast
+
+
+@pytest.mark.parametrize("encoder", ["orjson", "json"])
+@pytest.mark.parametrize("price", [1e-7, 9.99e-5, 1e16, 1.5e20])
+def test_page_with_extreme_price_matches_pydantic(monkeypatch, encoder, price):
+    """Цены, которые orjson или json записали бы иначе, чем pydantic"""
+    if encoder == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson не установлен")
+    page = _page()
+    page["items"].append(_book(6, Decimal(repr(price)), UTC, UTC, None))
+    body = serialization.books_page_body(page["items"], page["limit"], page["next_cursor"])
+    assert body == _pydantic(page)
+
+
+def test_unsupported_type_is_rejected(stdlib_json):
+    with pytest.raises(TypeError):
+        serialization.dumps({"value": object()})
+
+
+_catalogs = itertools.count()
+
+
+@pytest.mark.parametrize("encoder", ["orjson", "json"])
+def test_books_response_matches_pydantic(client, monkeypatch, encoder):
+    """GET /books с быстрым путём и без него совпадает побайтно, вместе с ETag"""
+    if encoder == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson не установлен")
+    number = next(_catalogs)
+    category_id = client.post("/categories/", json={"title": f"Сериализация {number}"}).json()["id"]
+    for i, price in enumerate((199.9, 100, 0.1, 1e-7)):
+        response = client.post("/books/", json={
+            "title": f"Сериализация {number}-{i} «ё»", "description": "строка\nвторая", "price": price,
+            "category_id": category_id if i % 2 else None,
+        })
+        assert response.status_code == 201
+
+    for params in ({"limit": 50}, {"limit": 3, "sort": "-price"}, {"category_id": category_id, "sort": "newest"}):
+        responses = []
+        for enabled in (False, True):
+            monkeypatch.setattr(serialization, "FAST_SERIALIZATION", enabled)
+            response = client.get("/books/", params=params)
+            assert response.status_code == 200
+            responses.append(response)
+        slow, fast = responses
+        assert fast.content == slow.content
+        assert fast.headers["etag"] == slow.headers["etag"]
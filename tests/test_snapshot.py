@@ -0,0 +1,57 @@
+"""Снимок каталога (app/snapshot.py): догон журнала изменений"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sqlalchemy import select  # noqa: E402
+
+from app import snapshot  # noqa: E402
+from app.db import crud, models  # noqa: E402
+from app.db.db import AsyncSessionLocal  # noqa: E402
+from tests.conftest import interleaved, run  # noqa: E402
+
+
+@pytest.fixture
+def enabled():
+    snapshot.set_enabled(True)
+    yield
+    snapshot.set_enabled(False)
+
+
+async def _by_price_from_db():
+    async with AsyncSessionLocal() as db:
+        version = await crud.get_catalog_version(db, models.BOOKS_VERSION)
+        result = await db.execute(select(models.Book.id).order_by(models.Book.price, models.Book.id))
+        return version, list(result.scalars())
+
+
+@pytest.mark.parametrize("interleave_after", [1, 2])
+def test_catch_up_does_not_skip_write_between_reads(enabled, monkeypatch, interleave_after):
+    """Изменение и удаление между запросами catch_up не теряются и порядок по цене совпадает с БД"""
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            moved = (await crud.create_book(db, {"title": "Подорожает", "price": 1.0})).id
+        async with AsyncSessionLocal() as db:
+            deleted = (await crud.create_book(db, {"title": "Исчезнет", "price": 2.0})).id
+        catalog = snapshot.CatalogSnapshot()
+        await catalog.build()
+        async with AsyncSessionLocal() as db:
+            await crud.create_book(db, {"title": "Новая", "price": 3.0})
+
+        async def update_and_delete():
+            async with AsyncSessionLocal() as writer:
+                await crud.update_book(writer, moved, {"price": 100000.0})
+            async with AsyncSessionLocal() as writer:
+                await crud.delete_book(writer, deleted)
+
+        monkeypatch.setattr(snapshot, "AsyncSessionLocal", interleaved(interleave_after, update_and_delete))
+        await catalog.catch_up()
+        monkeypatch.setattr(snapshot, "AsyncSessionLocal", AsyncSessionLocal)
+        await catalog.catch_up()
+        catalog.sort_orders()
+        version, expected = await _by_price_from_db()
+        await catalog.stop()
+        return catalog.find_ids(version, sort="price", limit=len(expected) + 10), expected
+
+    found, expected = run(scenario())
+    assert found == expected
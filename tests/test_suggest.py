@@ -0,0 +1,158 @@
+"""Индекс подсказок (app/suggest.py): пакетное применение изменений и догон журнала"""
+import asyncio
+import random
+
+import pytest
+
+from app import suggest
+from app.db import crud, models
+from app.db.db import AsyncSessionLocal
+from app.suggest import BATCH_MIN_CHANGES, SuggestIndex, normalize
+from tests.conftest import interleaved, run
+
+
+def _expected(titles: dict, query: str, limit: int = 10) -> list:
+    prefix = normalize(query)
+    ids = sorted((book_id for book_id, title in titles.items() if normalize(title).startswith(prefix)), reverse=True)
+    return [(book_id, titles[book_id]) for book_id in ids[:limit]]
+
+
+@pytest.mark.parametrize("changes", [10, 3000])
+def test_apply_matches_brute_force(changes):
+    """По одной книге (меньше BATCH_MIN_CHANGES) и пересборкой - тот же результат, что перебор"""
+    rng = random.Random(changes)
+    words = ["Питон", "Пушкин", "Программирование", "Ёлка", "елки", "Война", "Мир"]
+    titles = {book_id: f"{rng.choice(words)} {book_id}" for book_id in range(1, 5001)}
+    index = SuggestIndex()
+    index.load(titles.items())
+
+    batch = {}
+    for _ in range(changes):
+        book_id = rng.randint(1, 6000)
+        batch[book_id] = None if rng.random() < 0.3 else f"{rng.choice(words)} {rng.random():.3f}"
+    index.suggest("п", 5)  # кэш первых id длинного диапазона тоже должен обновиться
+    run(index.apply(batch))
+    for book_id, title in batch.items():
+        if title is None:
+            titles.pop(book_id, None)
+        else:
+            titles[book_id] = title
+
+    assert len(index) == len(titles)
+    for query in ("п", "пи", "ел", "ёлк", "война 1", "мир", "x"):
+        assert index.suggest(query, 10) == _expected(titles, query)
+
+
+def test_bulk_apply_does_not_block_event_loop():
+    """Пересборка большой пачки идёт в потоке: цикл событий тем временем обрабатывает другие задачи"""
+    index = SuggestIndex()
+    index.load((book_id, f"Книга {book_id}") for book_id in range(1, 20001))
+    batch = {book_id: f"Переименованная {book_id}" for book_id in range(1, BATCH_MIN_CHANGES + 1)}
+
+    async def scenario():
+        ticks = 0
+        done = False
+
+        async def ticker():
+            nonlocal ticks
+            while not done:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await index.apply(batch)
+        done = True
+        await task
+        return ticks
+
+    assert run(scenario()) > 0
+    assert len(index) == 20000
+    assert index.suggest("переименованная 1000", 10) == [(1000, "Переименованная 1000")]
+
+
+def test_sparse_ids():
+    """Ключи по id - словарь: большой id не раздувает индекс"""
+    index = SuggestIndex()
+    index.load([(1, "Первая"), (10 ** 12, "Далёкая")])
+    index.put(10 ** 15, "Ещё дальше")
+    index.remove(1)
+
+    assert len(index._by_id) == 2
+    assert index.suggest("дал", 10) == [(10 ** 12, "Далёкая")]
+    assert index.suggest("еще", 10) == [(10 ** 15, "Ещё дальше")]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """Свой индекс вместо общего: crud обновляет suggest.index"""
+    fresh = SuggestIndex()
+    monkeypatch.setattr(suggest, "index", fresh)
+    yield fresh
+    run(fresh.stop())
+
+
+async def _build(index: SuggestIndex):
+    await index.build()
+    await index._catch_up
+
+
+def test_local_writes_do_not_catch_up(index, monkeypatch):
+    """Записи через crud применяются к индексу сразу и не запускают догон журнала"""
+    async def scenario():
+        await _build(index)
+        scheduled = []
+        monkeypatch.setattr(index, "schedule_catch_up", lambda: scheduled.append(True))
+        async with AsyncSessionLocal() as db:
+            book_id = (await crud.create_book(db, {"title": "Локальная запись", "price": 1.0})).id
+        async with AsyncSessionLocal() as db:
+            await crud.update_book(db, book_id, {"title": "Локальная правка"})
+        async with AsyncSessionLocal() as db:
+            await crud.update_book(db, book_id, {"price": 2.0})
+        async with AsyncSessionLocal() as db:
+            version = await crud.get_catalog_version(db, models.BOOKS_VERSION)
+        return scheduled, book_id, version
+
+    scheduled, book_id, version = run(scenario())
+    assert scheduled == []
+    assert index.version == version
+    assert index.suggest("локальная", 10) == [(book_id, "Локальная правка")]
+
+
+@pytest.mark.parametrize("interleave_after", [1, 2])
+def test_catch_up_does_not_skip_write_between_reads(index, monkeypatch, interleave_after):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            renamed = (await crud.create_book(db, {"title": "Старое название", "price": 1.0})).id
+        async with AsyncSessionLocal() as db:
+            deleted = (await crud.create_book(db, {"title": "Удаляемая книга", "price": 1.0})).id
+        await _build(index)
+
+        async def unseen(write):
+            # Запись мимо индекса: он узнает о ней только из журнала изменений
+            suggest.index = SuggestIndex()
+            try:
+                await write()
+            finally:
+                suggest.index = index
+
+        async def create_other():
+            async with AsyncSessionLocal() as db:
+                await crud.create_book(db, {"title": "Другая книга", "price": 1.0})
+
+        async def rename_and_delete():
+            async with AsyncSessionLocal() as writer:
+                await crud.update_book(writer, renamed, {"title": "Новое название"})
+            async with AsyncSessionLocal() as writer:
+                await crud.delete_book(writer, deleted)
+
+        await unseen(create_other)
+        monkeypatch.setattr(suggest, "AsyncSessionLocal", interleaved(interleave_after, lambda: unseen(rename_and_delete)))
+        await index.catch_up()
+        monkeypatch.setattr(suggest, "AsyncSessionLocal", AsyncSessionLocal)
+        await index.catch_up()
+        return renamed, deleted
+
+    renamed, deleted = run(scenario())
+    assert index.suggest("новое название", 10)[0] == (renamed, "Новое название")
+    assert all(book_id != renamed for book_id, _ in index.suggest("старое название", 10))
+    assert all(book_id != deleted for book_id, _ in index.suggest("удаляемая", 10))